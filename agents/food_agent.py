@@ -14,10 +14,10 @@ class FoodIntakeAgent:
         
         # Use real-time UTC timestamp
         ts = datetime.now(timezone.utc).isoformat()
-        insert_food(user_id, description, ts)
         
-        # Analyze nutrition using LLM
+        # Analyze nutrition using LLM; the numbers are stored with the log
         nutrition_analysis = self._analyze_nutrition(description)
+        insert_food(user_id, description, ts, nutrition_analysis)
         
         response = f"🍽️ Food logged: {description}"
         
@@ -79,7 +79,8 @@ Respond only with valid JSON, no additional text."""
                 "protein": "20-40g",
                 "fat": "10-25g",
                 "benefits": "Good source of essential nutrients",
-                "concerns": "Consider portion sizes and preparation methods"
+                "concerns": "Consider portion sizes and preparation methods",
+                "error": str(e)
             }
     
     def _parse_text_nutrition(self, text: str) -> Dict[str, Any]:
@@ -7,9 +7,10 @@ project_root = Path(__file__).resolve().parents[1]
 sys.path.append(str(project_root))
 
 from agno_base import Agent
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import sqlite3
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from backend.services import cgm_alerts, cgm_forecast, cgm_index, cgm_quality, cgm_stats, push
 
 class CGMAgent(Agent):
     """CGM Agent: Logs Continuous Glucose Monitor readings (range 80–300 mg/dL)"""
@@ -30,13 +31,14 @@ class CGMAgent(Agent):
         )
         self.db_path = Path(__file__).resolve().parents[1] / "data" / "healthcare.db"
     
-    def log_reading(self, user_id: int, glucose_level: float) -> Dict[str, Any]:
+    def log_reading(self, user_id: int, glucose_level: float, conn: Optional[sqlite3.Connection] = None) -> Dict[str, Any]:
         """
         Log glucose reading with validation and health alerts
         
         Args:
             user_id: User ID
             glucose_level: Glucose reading in mg/dL
+            conn: Optional open connection; the caller then owns the commit
             
         Returns:
             Dict with validation, alerts, and health guidance
@@ -55,13 +57,26 @@ class CGMAgent(Agent):
             alert_level = self._get_alert_level(glucose_level)
             
             # Store in database
-            with sqlite3.connect(self.db_path) as conn:
-                cur = conn.cursor()
-                cur.execute("""
-                    INSERT INTO cgm_logs (user_id, glucose_level, alert_level, timestamp)
-                    VALUES (?, ?, ?, ?)
-                """, (user_id, glucose_level, alert_level, timestamp))
-                conn.commit()
+            predicted = []
+            with self.db_session(conn) as db:
+                # Sensor artifacts are stored but kept out of stats and trend alerts
+                quality = cgm_quality.check(db, user_id, glucose_level, timestamp)
+                db.execute("""
+                    INSERT INTO cgm_logs (user_id, glucose_level, alert_level, timestamp, quality)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (user_id, glucose_level, alert_level, timestamp, quality["quality"]))
+                if quality["quality"] == "ok":
+                    # Running TIR/GMI/CV/MAGE aggregates commit with the reading
+                    cgm_stats.record_reading(db, user_id, glucose_level, timestamp)
+                    cgm_index.record_reading(db, user_id, glucose_level, timestamp)
+                    forecast = cgm_forecast.record_reading(db, user_id, glucose_level, timestamp)
+                    predicted = cgm_alerts.observe(db, user_id, glucose_level, timestamp, forecast)
+                else:
+                    # Kept out of the trend, but a suspect low is still alerted
+                    predicted = cgm_alerts.observe_flagged(db, user_id, glucose_level, timestamp)
+            deferred = self.publish_events(
+                user_id, push.reading_events(glucose_level, timestamp, alert_level, predicted, quality["quality"]), conn
+            )
             
             # Provide detailed feedback based on glucose level
             if glucose_level < 70:
@@ -77,8 +92,18 @@ class CGMAgent(Agent):
             else:
                 response = f"🆘 CRITICAL: Your glucose is {glucose_level} mg/dL (dangerously high). Please seek immediate medical attention if you feel unwell."
             
+            note = cgm_quality.describe(quality["quality"])
+            if note:
+                response += f"\n{note}"
+            if quality["gap"]:
+                response += f"\n📡 No readings arrived for {quality['gap']['minutes']:.0f} minutes before this one."
+            
+            # Trend-based warnings from the predictive alert engine
+            for alert in predicted:
+                response += f"\n{alert['message']}"
+            
             # Get 7-day average
-            avg_reading = self.get_average_reading(user_id, days=7)
+            avg_reading = self.get_average_reading(user_id, days=7, conn=conn)
             if avg_reading:
                 response += f"\n📊 Your 7-day average: {avg_reading:.1f} mg/dL"
             
@@ -87,8 +112,11 @@ class CGMAgent(Agent):
                 "message": f"{response}\n\n🍽️ Next step: Let's log your recent meal! What did you eat?",
                 "glucose_level": glucose_level,
                 "alert_level": alert_level,
+                "quality": quality["quality"],
+                "predicted_alerts": predicted,
                 "average_reading": avg_reading,
-                "next_step": "food_logging"
+                "next_step": "food_logging",
+                **deferred
             }
             
         except Exception as e:
@@ -108,24 +136,24 @@ class CGMAgent(Agent):
         else:
             return "elevated"
     
-    def get_average_reading(self, user_id: int, days: int = 7) -> float:
+    def get_average_reading(self, user_id: int, days: int = 7, conn: Optional[sqlite3.Connection] = None) -> float:
         """Get average glucose reading for past N days"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cur = conn.cursor()
-                cur.execute("""
-                    SELECT AVG(glucose_level) FROM cgm_logs 
-                    WHERE user_id = ? AND date(timestamp) >= date('now', '-{} days')
-                """.format(days), (user_id,))
-                result = cur.fetchone()[0]
-                return float(result) if result else 0.0
+            with self.db_session(conn) as db:
+                now = datetime.now(timezone.utc)
+                start = datetime.combine((now - timedelta(days=days)).date(), datetime.min.time(), timezone.utc)
+                if conn is None:
+                    # Never build the index inside a borrowed (pipeline) transaction
+                    cgm_index.ensure(db, user_id)
+                moments = cgm_index.range_moments(db, user_id, start.timestamp(), now.timestamp() + 1)
+                return float(moments.mean) if moments.n else 0.0
         except:
             return 0.0
     
     def get_history(self, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
         """Get CGM history for charts"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.db_session() as conn:
                 cur = conn.cursor()
                 cur.execute("""
                     SELECT glucose_level, alert_level, timestamp FROM cgm_logs 
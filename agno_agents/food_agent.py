@@ -11,6 +11,7 @@ from typing import Dict, Any, List, Optional
 import sqlite3
 from datetime import datetime, timezone
 import json
+from backend.services import nutrition, push
 
 class FoodIntakeAgent(Agent):
     """Food Intake Agent: Records meals/snacks with timestamps and nutritional analysis"""
@@ -27,7 +28,20 @@ class FoodIntakeAgent(Agent):
         )
         self.db_path = Path(__file__).resolve().parents[1] / "data" / "healthcare.db"
     
-    def log_food(self, user_id: int, meal_description: str, timestamp: Optional[str] = None) -> Dict[str, Any]:
+    def prepare_log(self, user_id: int, meal_description: str) -> Dict[str, Any]:
+        """Run the LLM nutrition analysis ahead of log_food (no database access)"""
+        if not meal_description or not meal_description.strip():
+            return {}
+        return {"nutrition_analysis": self._analyze_nutrition(meal_description)}
+    
+    def log_food(
+        self,
+        user_id: int,
+        meal_description: str,
+        timestamp: Optional[str] = None,
+        nutrition_analysis: Optional[Dict[str, Any]] = None,
+        conn: Optional[sqlite3.Connection] = None
+    ) -> Dict[str, Any]:
         """
         Log food intake with nutritional analysis
         
@@ -35,6 +49,8 @@ class FoodIntakeAgent(Agent):
             user_id: User ID
             meal_description: Free-text meal description
             timestamp: Optional timestamp (uses current time if not provided)
+            nutrition_analysis: Analysis from prepare_log; computed here if omitted
+            conn: Optional open connection; the caller then owns the commit
             
         Returns:
             Dict with logging confirmation and nutrition analysis
@@ -51,16 +67,25 @@ class FoodIntakeAgent(Agent):
                 timestamp = datetime.now(timezone.utc).isoformat()
             
             # Analyze nutrition using LLM
-            nutrition_analysis = self._analyze_nutrition(meal_description)
+            if nutrition_analysis is None:
+                nutrition_analysis = self._analyze_nutrition(meal_description)
             
-            # Store in database
-            with sqlite3.connect(self.db_path) as conn:
-                cur = conn.cursor()
-                cur.execute("""
-                    INSERT INTO food_logs (user_id, meal_description, nutrition_analysis, timestamp)
-                    VALUES (?, ?, ?, ?)
-                """, (user_id, meal_description, json.dumps(nutrition_analysis), timestamp))
-                conn.commit()
+            # Store in database with numeric macros; the daily rollup moves in the same transaction
+            macros = nutrition.extract(nutrition_analysis)
+            with self.db_session(conn) as db:
+                db.execute("""
+                    INSERT INTO food_logs (user_id, meal_description, nutrition_analysis, timestamp,
+                                           carbs_g, protein_g, fat_g, calories)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (user_id, meal_description, json.dumps(nutrition_analysis), timestamp,
+                      *(macros[c] for c in nutrition.MACROS)))
+                nutrition.record(db, user_id, macros, timestamp)
+            deferred = self.publish_events(user_id, [("food", {
+                "meal_description": meal_description,
+                "nutrition_analysis": nutrition_analysis,
+                "timestamp": timestamp,
+                **macros
+            })], conn)
             
             # Create response message
             response_msg = f"🍽️ Food logged: {meal_description}"
@@ -76,8 +101,10 @@ class FoodIntakeAgent(Agent):
                 "message": response_msg,
                 "meal_description": meal_description,
                 "nutrition_analysis": nutrition_analysis,
+                "macros": macros,
                 "timestamp": timestamp,
-                "next_step": "meal_planning"
+                "next_step": "meal_planning",
+                **deferred
             }
             
         except Exception as e:
@@ -102,6 +129,8 @@ class FoodIntakeAgent(Agent):
             
             Keep the response concise and practical for someone tracking their health.
             Format as plain text, not JSON.
+            End with one line in exactly this form, using your best single estimates:
+            Totals: carbs 45g, protein 20g, fat 12g, 420 calories
             """
             
             analysis = generate_text(prompt)
@@ -112,6 +141,7 @@ class FoodIntakeAgent(Agent):
                 "analysis": analysis,
                 "estimated_calories": self._extract_calories(analysis),
                 "primary_macros": self._extract_macros(analysis),
+                **nutrition.extract({"analysis": analysis}),
                 "analyzed_at": datetime.now(timezone.utc).isoformat()
             }
             
@@ -153,7 +183,7 @@ class FoodIntakeAgent(Agent):
     def get_history(self, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
         """Get food history for charts"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.db_session() as conn:
                 cur = conn.cursor()
                 cur.execute("""
                     SELECT meal_description, nutrition_analysis, timestamp FROM food_logs 
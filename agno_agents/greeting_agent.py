@@ -37,7 +37,7 @@ class GreetingAgent(Agent):
         """
         try:
             # Validate user ID against dataset
-            with sqlite3.connect(self.db_path) as conn:
+            with self.db_session() as conn:
                 cur = conn.cursor()
                 cur.execute("""
                     SELECT first_name, last_name, city, dietary_preference, medical_conditions
@@ -7,6 +7,8 @@ project_root = Path(__file__).resolve().parents[1]
 sys.path.append(str(project_root))
 
 from agno_base import Agent
+from backend.services import emergency
+from backend.services.intents import KEYWORD_GROUPS, Intent, classify
 from typing import Dict, Any
 import sqlite3
 from datetime import datetime, timezone
@@ -14,16 +16,9 @@ from datetime import datetime, timezone
 class InterruptAgent(Agent):
     """Interrupt Agent (General Q&A Assistant): Handles unrelated questions and gracefully routes back to main flow"""
     
-    EMERGENCY_KEYWORDS = [
-        "emergency", "urgent", "help", "911", "ambulance", "chest pain", 
-        "heart attack", "stroke", "bleeding", "unconscious", "severe pain",
-        "difficulty breathing", "choking"
-    ]
-    
-    HEALTH_KEYWORDS = [
-        "diabetes", "glucose", "insulin", "blood sugar", "medication", "doctor",
-        "symptoms", "side effects", "dosage", "prescription", "medical"
-    ]
+    # Keyword lists are compiled into the shared intent engine (backend/services/intents.py)
+    EMERGENCY_KEYWORDS = ["help", *KEYWORD_GROUPS["emergency"]]
+    HEALTH_KEYWORDS = list(KEYWORD_GROUPS["health"])
     
     def __init__(self):
         super().__init__(
@@ -59,9 +54,10 @@ class InterruptAgent(Agent):
         
         try:
             query_lower = query.lower().strip()
+            intent = classify(query_lower)
             
             # Check for emergency situations first
-            emergency_response = self._handle_emergency_keywords(query_lower)
+            emergency_response = self._handle_emergency_keywords(query_lower, intent)
             if emergency_response:
                 return emergency_response
             
@@ -72,13 +68,13 @@ class InterruptAgent(Agent):
             llm_response = self._generate_response(query, user_context, current_context)
             
             # Determine appropriate routing back to main flow
-            routing_suggestion = self._get_routing_suggestion(query_lower, current_context)
+            routing_suggestion = self._get_routing_suggestion(intent, current_context)
             
             return {
                 "success": True,
                 "message": llm_response,
                 "routing_suggestion": routing_suggestion,
-                "query_type": self._classify_query(query_lower),
+                "query_type": self._classify_query(intent),
                 "user_context": user_context,
                 "next_step": "return_to_flow",
                 "timestamp": datetime.now(timezone.utc).isoformat()
@@ -91,17 +87,10 @@ class InterruptAgent(Agent):
         """Legacy method for backward compatibility"""
         return self.handle_query(user_id, query)
     
-    def _handle_emergency_keywords(self, query: str) -> Dict[str, Any]:
-        """Handle emergency keywords with immediate response"""
-        for keyword in self.EMERGENCY_KEYWORDS:
-            if keyword in query:
-                return {
-                    "success": True,
-                    "message": f"🚨 EMERGENCY DETECTED: {query}\n\n⚠️ IMMEDIATE ACTION REQUIRED:\n• Call emergency services (911) immediately\n• Do not delay seeking medical attention\n• Stay calm and follow emergency protocols\n\nThis is a serious situation requiring immediate professional medical care.",
-                    "query_type": "emergency",
-                    "priority": "critical",
-                    "timestamp": datetime.now(timezone.utc).isoformat()
-                }
+    def _handle_emergency_keywords(self, query: str, intent: Intent) -> Dict[str, Any]:
+        """Handle emergency keywords with immediate response (routes answer these earlier via the fast lane)"""
+        if self._classify_query(intent) == "emergency":
+            return emergency.response(query)
         return None
     
     def _get_user_context(self, user_id: int) -> Dict[str, Any]:
@@ -114,7 +103,7 @@ class InterruptAgent(Agent):
         }
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.db_session() as conn:
                 cur = conn.cursor()
                 
                 # Get user profile
@@ -193,31 +182,23 @@ RESPONSE FORMAT:
         except Exception as e:
             return f"I understand you're asking about: {query}\n\nLet me help you with that, and then we can continue with your health tracking journey."
     
-    def _get_routing_suggestion(self, query: str, current_context: str) -> str:
+    def _get_routing_suggestion(self, intent: Intent, current_context: str) -> str:
         """Get routing suggestion based on query and current context"""
-        if "mood" in query or "feeling" in query:
+        labels = intent.labels
+        if "mood" in labels or "feeling" in labels:
             return "Let's log your mood first to track your emotional well-being."
-        elif "glucose" in query or "blood sugar" in query or "cgm" in query:
+        elif "cgm" in labels:
             return "How about checking your glucose levels? Please share your latest CGM reading."
-        elif "food" in query or "meal" in query or "eat" in query:
+        elif "food" in labels:
             return "Would you like to log your recent meal? Tell me what you ate."
-        elif "plan" in query or "diet" in query:
+        elif "plan" in labels or "diet" in labels:
             return "Ready to generate your personalized meal plan?"
         else:
             return "Let's continue with your health tracking. What would you like to log next?"
     
-    def _classify_query(self, query: str) -> str:
+    def _classify_query(self, intent: Intent) -> str:
         """Classify the type of query"""
-        if any(keyword in query for keyword in self.EMERGENCY_KEYWORDS):
-            return "emergency"
-        elif any(keyword in query for keyword in self.HEALTH_KEYWORDS):
-            return "health_question"
-        elif any(word in query for word in ["how", "what", "why", "when", "where"]):
-            return "information_request"
-        elif any(word in query for word in ["help", "support", "assist"]):
-            return "help_request"
-        else:
-            return "general_query"
+        return intent.query_type
     
     def _fallback_response(self, query: str, current_context: str) -> Dict[str, Any]:
         """Fallback response when LLM is unavailable"""
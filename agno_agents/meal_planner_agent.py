@@ -11,6 +11,8 @@ from typing import Dict, Any, List, Optional
 import sqlite3
 from datetime import datetime, timezone, timedelta
 import json
+from backend.services import cgm_forecast, postprandial
+from backend.services.deadlines import DeadlineExceeded, expired
 
 class MealPlannerAgent(Agent):
     """Meal Planner Agent: Generates adaptive meal plans respecting dietary preferences and medical constraints"""
@@ -59,6 +61,7 @@ class MealPlannerAgent(Agent):
             print(f"   Dietary: {user_context['user_profile']['dietary_preference']}")
             print(f"   Conditions: {user_context['user_profile']['medical_conditions']}")
             print(f"   CGM: {user_context['latest_cgm']}")
+            print(f"   Forecast: {self._forecast_summary(user_context.get('glucose_forecast'))}")
             print(f"   Mood: {user_context['recent_mood']}")
             
             # Create detailed meal plan prompt
@@ -102,11 +105,13 @@ class MealPlannerAgent(Agent):
             "user_profile": None,
             "latest_cgm": None,
             "recent_mood": None,
-            "recent_foods": []
+            "recent_foods": [],
+            "meal_responses": {"steady": [], "spiky": []},
+            "glucose_forecast": None
         }
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.db_session() as conn:
                 cur = conn.cursor()
                 
                 # Get user profile
@@ -157,6 +162,19 @@ class MealPlannerAgent(Agent):
                 food_rows = cur.fetchall()
                 context["recent_foods"] = [row[0] for row in food_rows]
                 
+                # How past meals moved this user's glucose (computed in one batch for pending meals)
+                try:
+                    postprandial.refresh(conn, [user_id])
+                    context["meal_responses"] = postprandial.meal_ranking(conn, user_id)
+                except sqlite3.Error as e:
+                    print(f"Postprandial responses unavailable: {e}")
+                
+                # Where glucose is heading over the next two hours (per-user incremental model)
+                try:
+                    context["glucose_forecast"] = cgm_forecast.projections(cgm_forecast.load(conn, user_id))
+                except sqlite3.Error as e:
+                    print(f"Glucose forecast unavailable: {e}")
+                
         except Exception as e:
             print(f"Error gathering user context: {e}")
         
@@ -173,6 +191,10 @@ class MealPlannerAgent(Agent):
         conditions = user["medical_conditions"]
         cgm = context["latest_cgm"]
         mood = context["recent_mood"]
+        responses = context.get("meal_responses") or {}
+        steady = ", ".join(f"{m['meal']} (+{m['mean_rise']:.0f} mg/dL)" for m in responses.get("steady", [])) or "Not available"
+        spiky = ", ".join(f"{m['meal']} (+{m['mean_rise']:.0f} mg/dL)" for m in responses.get("spiky", [])) or "Not available"
+        outlook = self._forecast_summary(context.get("glucose_forecast")) or "Not available"
         
         # Simplified but effective prompt
         prompt = f"""Create a personalized meal plan for {name}.
@@ -181,13 +203,18 @@ User Profile:
 - Dietary: {dietary_pref}
 - Medical Conditions: {', '.join(conditions) if conditions else 'None'}
 - Glucose Level: {cgm if cgm else 'Not available'} mg/dL
+- Glucose Outlook: {outlook}
 - Mood: {mood if mood else 'Not available'}
+- Past meals that kept glucose steady: {steady}
+- Past meals that spiked glucose: {spiky}
 
 Requirements:
 1. Create 3 meals (breakfast, lunch, dinner)
 2. Respect {dietary_pref} diet
 3. Consider medical conditions: {', '.join(conditions) if conditions else 'None'}
 4. Include specific ingredients and macros
+5. Prefer meals like the steady ones; avoid or rebalance the ones that spiked glucose
+6. If glucose is projected above 180 mg/dL, make the next meal lower in carbs; if projected below 80 mg/dL, include a quick carb source
 
 Return ONLY valid JSON:
 {{
@@ -225,6 +252,10 @@ Return ONLY valid JSON:
         max_retries = 3
         
         for attempt in range(max_retries):
+            # Retries only spend what is left of the request's time budget
+            if expired():
+                print(f"Attempt {attempt + 1}: request deadline reached, skipping LLM")
+                break
             try:
                 from backend.services.llm import generate_text
                 response = generate_text(prompt)
@@ -252,6 +283,9 @@ Return ONLY valid JSON:
                         print(f"Attempt {attempt + 1}: Cleaned response still invalid")
                         continue
                         
+            except DeadlineExceeded as e:
+                print(f"Attempt {attempt + 1}: {e}")
+                break
             except Exception as e:
                 print(f"Attempt {attempt + 1}: LLM generation failed: {e}")
                 if attempt == max_retries - 1:
@@ -265,6 +299,10 @@ Return ONLY valid JSON:
         max_retries = 3
         
         for attempt in range(max_retries):
+            # Retries only spend what is left of the request's time budget
+            if expired():
+                print(f"Attempt {attempt + 1}: request deadline reached, skipping LLM")
+                break
             try:
                 from backend.services.llm import generate_text
                 response = generate_text(prompt)
@@ -292,6 +330,9 @@ Return ONLY valid JSON:
                         print(f"Attempt {attempt + 1}: Cleaned response still invalid")
                         continue
                         
+            except DeadlineExceeded as e:
+                print(f"Attempt {attempt + 1}: {e}")
+                break
             except Exception as e:
                 print(f"Attempt {attempt + 1}: LLM generation failed: {e}")
                 if attempt == max_retries - 1:
@@ -332,10 +373,13 @@ Return ONLY valid JSON:
         
         # Generate personalized meals based on dietary preference and conditions
         meals = self._get_personalized_meals(dietary_pref, conditions)
+        meals = self._prefer_proven_meals(meals, user_context.get("meal_responses"))
+        outlook = self._forecast_summary(user_context.get("glucose_forecast"))
         
         return json.dumps({
             "personalized_message": f"Hello {name}, here's your personalized meal plan based on your {dietary_pref} diet and health conditions!",
-            "glucose_analysis": f"⚠️ **LLM Quota Exceeded**: Unable to generate AI-powered meal plans. Using personalized fallback meals based on your health profile ({', '.join(conditions) if conditions else 'general wellness'}). These meals are designed to support your specific needs.",
+            "glucose_analysis": f"⚠️ **LLM Quota Exceeded**: Unable to generate AI-powered meal plans. Using personalized fallback meals based on your health profile ({', '.join(conditions) if conditions else 'general wellness'}). These meals are designed to support your specific needs."
+                                + (f" Glucose outlook: {outlook}." if outlook else ""),
             "suggestions": meals
         })
     
@@ -440,6 +484,34 @@ Return ONLY valid JSON:
             }
         ]
     
+    def _prefer_proven_meals(self, meals: list, responses: Optional[Dict[str, Any]]) -> list:
+        """Swap in the user's own meals that kept glucose steady, in the slot they usually eat them"""
+        proven = {}
+        for meal in (responses or {}).get("steady", []):
+            minute = meal["usual_minute"]
+            slot = "Breakfast" if minute < 11 * 60 else "Lunch" if minute < 16 * 60 else "Dinner"
+            proven.setdefault(slot, meal)
+        result = []
+        for suggestion in meals:
+            meal = proven.get(suggestion["meal_type"])
+            if meal:
+                times = "once" if meal["times"] == 1 else f"{meal['times']} times"
+                suggestion = {
+                    "meal_type": suggestion["meal_type"],
+                    "meal": meal["meal"],
+                    "benefits": f"Your glucose rose only {meal['mean_rise']:.0f} mg/dL after this meal (logged {times})",
+                    "timing": suggestion["timing"]
+                }
+            result.append(suggestion)
+        return result
+    
+    def _forecast_summary(self, forecast: Optional[Dict[str, Any]]) -> Optional[str]:
+        """One line describing the projected glucose, e.g. for the prompt"""
+        if not forecast:
+            return None
+        points = ", ".join(f"{p['minutes']} min ~{p['glucose']:.0f}" for p in forecast["projections"])
+        return f"{points} mg/dL (trend {forecast['trend_per_min']:+.1f} mg/dL/min)"
+    
     def _generate_generic_fallback(self) -> str:
         """Generate generic fallback meals"""
         return json.dumps({
@@ -7,25 +7,16 @@ project_root = Path(__file__).resolve().parents[1]
 sys.path.append(str(project_root))
 
 from agno_base import Agent
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import sqlite3
 from datetime import datetime, timezone
+from backend.services import mood_lexicon, mood_score, push
+from backend.services.mood_lexicon import MoodMatch
 
 class MoodTrackerAgent(Agent):
     """Mood Tracker Agent: Captures user mood for each session"""
     
-    VALID_MOODS = {
-        "happy": 5,
-        "excited": 5, 
-        "content": 4,
-        "calm": 4,
-        "neutral": 3,
-        "tired": 2,
-        "sad": 2,
-        "stressed": 1,
-        "anxious": 1,
-        "angry": 1
-    }
+    VALID_MOODS = mood_score.SCALE
     
     def __init__(self):
         super().__init__(
@@ -39,40 +30,59 @@ class MoodTrackerAgent(Agent):
         )
         self.db_path = Path(__file__).resolve().parents[1] / "data" / "healthcare.db"
     
-    def log_mood(self, user_id: int, mood: str) -> Dict[str, Any]:
+    def prepare_log(self, user_id: int, mood: str) -> Dict[str, Any]:
+        """Recognize the mood ahead of log_mood; may call the LLM (no database access)"""
+        return {"match": mood_lexicon.resolve(mood or ""), "resolved": True}
+    
+    def log_mood(
+        self,
+        user_id: int,
+        mood: str,
+        match: Optional[MoodMatch] = None,
+        resolved: bool = False,
+        conn: Optional[sqlite3.Connection] = None
+    ) -> Dict[str, Any]:
         """
         Log user mood and provide feedback
         
         Args:
             user_id: User ID
-            mood: Mood label (happy, sad, excited, etc.)
+            mood: Mood label or free text ("exhausted", "happyy", "feeling kinda down")
+            match: Recognition from prepare_log; looked up here if not resolved yet
+            resolved: True when prepare_log already ran (a None match then means unrecognized)
+            conn: Optional open connection; the caller then owns the commit
             
         Returns:
             Dict with success status and encouragement
         """
-        mood_lower = mood.lower().strip()
+        if not resolved:
+            match = mood_lexicon.resolve(mood or "")
         
-        if mood_lower not in self.VALID_MOODS:
+        if match is None:
             valid_moods = ", ".join(self.VALID_MOODS.keys())
             return {
                 "success": False,
-                "message": f"❌ Invalid mood '{mood}'. Please choose from: {valid_moods}",
+                "message": f"❌ I couldn't tell which mood '{mood}' is. Try a word like: {valid_moods}",
                 "valid_moods": list(self.VALID_MOODS.keys())
             }
+        mood_lower = match.label
         
         try:
-            score = self.VALID_MOODS[mood_lower]
+            score = match.score
             # Use real-time UTC timestamp
             timestamp = datetime.now(timezone.utc).isoformat()
             
-            # Store in database
-            with sqlite3.connect(self.db_path) as conn:
-                cur = conn.cursor()
-                cur.execute("""
+            # Store in database; the daily sums and EWMA move in the same transaction
+            with self.db_session(conn) as db:
+                db.execute("""
                     INSERT INTO mood_logs (user_id, mood, score, timestamp)
                     VALUES (?, ?, ?, ?)
                 """, (user_id, mood_lower, score, timestamp))
-                conn.commit()
+                mood_score.record(db, user_id, score, timestamp)
+                trend = mood_score.summary(db, user_id, days=7)
+            deferred = self.publish_events(
+                user_id, [("mood", {"mood": mood_lower, "score": score, "timestamp": timestamp})], conn
+            )
             
             # Get encouraging response based on mood
             if score >= 4:
@@ -82,17 +92,25 @@ class MoodTrackerAgent(Agent):
             else:
                 response = f"💙 I understand you're feeling {mood_lower}. Remember, taking care of your health can help improve your mood. You've got this!"
             
-            # Get rolling average
-            rolling_avg = self.get_rolling_average(user_id, days=7)
+            if match.method != "exact":
+                response += f" (I read '{mood.strip()}' as {mood_lower}.)"
+            
+            rolling_avg = trend["average"] or 0.0
             if rolling_avg:
                 response += f"\n📊 Your 7-day mood average: {rolling_avg:.1f}/5.0"
+                if trend["trend"] != "steady":
+                    response += f" (recently {trend['trend']})"
             
             return {
                 "success": True,
                 "message": f"{response}\n\n🩸 Next step: Let's check your glucose levels! Please share your latest CGM reading.",
                 "mood_score": score,
+                "mood_logged": mood_lower,
+                "recognized_by": match.method,
                 "rolling_average": rolling_avg,
-                "next_step": "cgm_logging"
+                "trend": trend,
+                "next_step": "cgm_logging",
+                **deferred
             }
             
         except Exception as e:
@@ -101,24 +119,18 @@ class MoodTrackerAgent(Agent):
                 "message": f"❌ Error logging mood: {str(e)}"
             }
     
-    def get_rolling_average(self, user_id: int, days: int = 7) -> float:
-        """Get rolling average mood score"""
+    def get_rolling_average(self, user_id: int, days: int = 7, conn: Optional[sqlite3.Connection] = None) -> float:
+        """Get rolling average mood score from the per-day sums"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cur = conn.cursor()
-                cur.execute("""
-                    SELECT AVG(score) FROM mood_logs 
-                    WHERE user_id = ? AND date(timestamp) >= date('now', '-{} days')
-                """.format(days), (user_id,))
-                result = cur.fetchone()[0]
-                return float(result) if result else 0.0
+            with self.db_session(conn) as db:
+                return mood_score.window_average(db, user_id, days)["average"] or 0.0
         except:
             return 0.0
     
     def get_history(self, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
         """Get mood history for charts"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.db_session() as conn:
                 cur = conn.cursor()
                 cur.execute("""
                     SELECT mood, score, timestamp FROM mood_logs 
@@ -2,6 +2,11 @@
 Simple Agent base class to replace Agno framework dependency
 This provides the basic structure needed for the multi-agent system
 """
+import sqlite3
+from contextlib import contextmanager
+from typing import Any, Dict, List, Tuple
+
+from backend.services import deadlines, push
 
 class Agent:
     """Base Agent class for the multi-agent system"""
@@ -11,6 +16,31 @@ class Agent:
         self.description = description
         self.instructions = instructions or []
     
+    @contextmanager
+    def db_session(self, conn: sqlite3.Connection = None):
+        """Yield the caller's connection (its transaction, its commit) or a
+        short-lived connection to self.db_path that commits on exit. Both
+        respect the current request deadline."""
+        if conn is not None:
+            yield conn
+            return
+        own = deadlines.guard(sqlite3.connect(self.db_path, timeout=deadlines.budget(5.0)))
+        try:
+            with own:
+                yield own
+        finally:
+            own.close()
+    
+    def publish_events(self, user_id: int, events: List[Tuple[str, Dict[str, Any]]],
+                       conn: sqlite3.Connection = None) -> Dict[str, Any]:
+        """Publish push events for writes db_session(conn) just committed. On a
+        borrowed connection nothing is committed yet, so the events are returned
+        (as push_events) for the connection's owner to publish after its commit."""
+        if conn is not None:
+            return {"push_events": events}
+        push.publish_all(user_id, events)
+        return {}
+    
     def __str__(self):
         return f"Agent({self.name}: {self.description})"
     
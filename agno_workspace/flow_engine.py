@@ -0,0 +1,310 @@
+"""
+Declarative flow engine for the Agno workspace
+
+Compiles the agents and flows declared in agno.yaml into lookup tables at
+startup: intent kind -> step, (flow, agent) -> next step. Agent instances
+come from the shared AgentRegistry (created on first use), and every step
+execution is timed.
+
+Several tracking commands in one message run as a pipeline: each step's
+`prepare` hook (LLM work, no database access) runs concurrently, then every
+step writes through one shared connection and commits once. The message is
+all or nothing: if a step fails, every step's writes are rolled back and
+the session is left where it was (and the CGM alert engine forgets the
+user, so it is rebuilt from committed readings). Push events the steps hand
+back are published only after the commit.
+"""
+import contextvars
+import copy
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from backend.services import cgm_alerts, db, push
+from backend.services.intents import Intent
+from agno_workspace.registry import AgentRegistry
+
+# Reserved `next` values in flow steps
+COMPLETE = "complete"
+RETURN_TO_PREVIOUS = "return_to_previous"
+
+# Threads for concurrent prepare hooks in multi-command messages
+CHAT_PIPELINE_WORKERS = int(os.getenv("CHAT_PIPELINE_WORKERS", "4"))
+
+
+@dataclass
+class AgentResult:
+    """Result from agent execution"""
+    success: bool
+    data: Dict[str, Any]
+    message: str
+    next_step: Optional[str] = None
+    duration_ms: Optional[float] = None
+
+
+class Binding(NamedTuple):
+    """One agent input bound to an Intent field"""
+    param: str
+    field: str
+    required: bool
+
+
+class Step(NamedTuple):
+    """A compiled agent declaration"""
+    agent: str
+    entrypoint: str
+    prepare: Optional[str]
+    bindings: Tuple[Binding, ...]
+    messages: Dict[str, str]
+
+
+class FlowEngine:
+    """Runs agno.yaml flows through precomputed dispatch and transition tables"""
+
+    def __init__(self, config: Dict[str, Any], registry: Optional[AgentRegistry] = None):
+        self.registry = registry or AgentRegistry.from_config(config)
+        self.steps: Dict[str, Step] = {}
+        self.routes: Dict[str, Step] = {}
+        self.transitions: Dict[Tuple[str, str], str] = {}
+        self.home_flow: Dict[str, str] = {}
+        self._compile(config)
+        self._timings: Dict[str, Dict[str, float]] = {}
+        self._timings_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    # --- compilation -----------------------------------------------------
+
+    def _compile(self, config: Dict[str, Any]) -> None:
+        for spec in config.get("agents", []):
+            name = spec["name"]
+            bindings = tuple(
+                Binding(item["name"], item["from"], item.get("required", True))
+                for item in spec.get("inputs", [])
+                if "from" in item
+            )
+            for field in bindings:
+                if field.field not in Intent._fields:
+                    raise ValueError(f"Agent {name}: unknown intent field '{field.field}'")
+            if name not in self.registry:
+                raise ValueError(f"Agent {name} is not in the agent registry")
+            step = Step(name, spec["entrypoint"], spec.get("prepare"), bindings, spec.get("messages", {}))
+            self.steps[name] = step
+            for kind in spec.get("intents", []):
+                if kind in self.routes:
+                    raise ValueError(f"Intent '{kind}' is routed to both {self.routes[kind].agent} and {name}")
+                self.routes[kind] = step
+
+        for flow in config.get("flows", []):
+            for item in flow.get("steps", []):
+                agent, nxt = item["agent"], item["next"]
+                if agent not in self.steps:
+                    raise ValueError(f"Flow {flow['name']}: undeclared agent '{agent}'")
+                if nxt not in self.steps and nxt not in (COMPLETE, RETURN_TO_PREVIOUS):
+                    raise ValueError(f"Flow {flow['name']}: unknown next step '{nxt}'")
+                self.transitions[(flow["name"], agent)] = nxt
+                self.home_flow.setdefault(agent, flow["name"])
+
+    # --- agents ----------------------------------------------------------
+
+    def agent(self, name: str) -> Any:
+        """The shared agent instance for a step"""
+        return self.registry.get(name)
+
+    def loaded_agents(self) -> List[str]:
+        return self.registry.loaded()
+
+    # --- execution -------------------------------------------------------
+
+    def run(self, kind: str, user_id: int, intent: Intent, state: Dict[str, Any]) -> AgentResult:
+        """Execute the step routed for `kind` and advance the session state"""
+        step = self.routes.get(kind) or self.routes["general"]
+        started = time.perf_counter()
+        result = self._execute(step, user_id, intent, state)
+        result.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+        self._record(step.agent, result)
+        return result
+
+    def _execute(self, step: Step, user_id: int, intent: Intent, state: Dict[str, Any]) -> AgentResult:
+        kwargs, invalid = self._bind(step, intent)
+        if invalid is not None:
+            return invalid
+        return self._call(step, user_id, kwargs, state)
+
+    def _call(self, step: Step, user_id: int, kwargs: Dict[str, Any], state: Dict[str, Any]) -> AgentResult:
+        """Invoke the step's entrypoint and advance the session on success"""
+        try:
+            result = getattr(self.agent(step.agent), step.entrypoint)(user_id, **kwargs)
+        except Exception as e:
+            return self._failed(step, state, {"error": str(e)}, step.messages.get("error", f"Error in {step.agent}"))
+
+        # Agents catch their own errors and report them as success=False
+        if not result.get("success", True):
+            return self._failed(step, state, result, result.get("message") or step.messages.get("error", f"Error in {step.agent}"))
+
+        return AgentResult(
+            success=True,
+            data=result,
+            message=result.get("message", step.messages.get("success", "")),
+            next_step=self._advance(step, user_id, state)
+        )
+
+    def _failed(self, step: Step, state: Dict[str, Any], data: Dict[str, Any], message: str) -> AgentResult:
+        """A failed step leaves the session where it was"""
+        _, nxt = self._next(step.agent, state)
+        return AgentResult(
+            success=False,
+            data=data,
+            message=message,
+            # Failed steps are retried; interrupts hand back to where the user was
+            next_step=state["current_step"] if nxt == RETURN_TO_PREVIOUS else step.agent
+        )
+
+    def _bind(self, step: Step, intent: Intent) -> Tuple[Dict[str, Any], Optional[AgentResult]]:
+        """Map intent fields onto the step's inputs; a missing required input yields an invalid result"""
+        kwargs = {}
+        for binding in step.bindings:
+            value = getattr(intent, binding.field)
+            if value is None and binding.required:
+                return kwargs, AgentResult(
+                    success=False,
+                    data={"error": f"invalid_{binding.param}"},
+                    message=step.messages.get("invalid", f"Please provide {binding.param}."),
+                    next_step=step.agent
+                )
+            kwargs[binding.param] = value
+        return kwargs, None
+
+    def _advance(self, step: Step, user_id: int, state: Dict[str, Any]) -> str:
+        """Move the session past a successful step and return the next step"""
+        state["user_context"].setdefault("user_id", user_id)
+        flow, nxt = self._next(step.agent, state)
+        if nxt == RETURN_TO_PREVIOUS:
+            return state["current_step"]
+        state["current_flow"] = flow
+        state["current_step"] = nxt
+        return nxt
+
+    def run_pipeline(self, intents: List[Intent], user_id: int, state: Dict[str, Any]) -> AgentResult:
+        """Execute several commands from one message with one commit and combine their replies"""
+        started = time.perf_counter()
+        steps = [self.routes.get(intent.kind) or self.routes["general"] for intent in intents]
+        bound = [self._bind(step, intent) for step, intent in zip(steps, intents)]
+
+        # A command that cannot be bound stops the message before any LLM work or write
+        invalid = [(step, result) for step, (_, result) in zip(steps, bound) if result is not None]
+        if invalid:
+            return self._combine(invalid, state, started, committed=False)
+
+        # LLM work first, concurrently and outside the write transaction
+        prepared: List[Dict[str, Any]] = [{} for _ in steps]
+        hooks = [i for i, step in enumerate(steps) if step.prepare]
+        if len(hooks) == 1:
+            prepared[hooks[0]] = self._prepare(steps[hooks[0]], user_id, bound[hooks[0]][0])
+        elif hooks:
+            executor = self._get_executor()
+            # Each hook runs in a copy of this request's context so its deadline carries over
+            futures = {
+                i: executor.submit(contextvars.copy_context().run, self._prepare, steps[i], user_id, bound[i][0])
+                for i in hooks
+            }
+            for i, future in futures.items():
+                prepared[i] = future.result()
+
+        outcomes: List[Tuple[Step, AgentResult]] = []
+        snapshot = copy.deepcopy(state)
+        committed = False
+        conn = db.get_db()
+        try:
+            for step, (kwargs, _), extra in zip(steps, bound, prepared):
+                step_started = time.perf_counter()
+                outcome = self._call(step, user_id, {**kwargs, **extra, "conn": conn}, state)
+                outcome.duration_ms = round((time.perf_counter() - step_started) * 1000, 3)
+                self._record(step.agent, outcome)
+                outcomes.append((step, outcome))
+                if not outcome.success:
+                    break
+            if all(outcome.success for _, outcome in outcomes):
+                conn.commit()
+                committed = True
+        finally:
+            if not committed:
+                # All or nothing: the other commands' writes and session moves are undone too
+                conn.rollback()
+                # The alert engine saw the rolled-back readings; rebuild it from committed rows
+                cgm_alerts.forget(user_id)
+                state.clear()
+                state.update(snapshot)
+            conn.close()
+        # Push events describe committed writes only, so they wait for the commit
+        for _, outcome in outcomes:
+            events = outcome.data.pop("push_events", [])
+            if committed:
+                push.publish_all(user_id, events)
+        return self._combine(outcomes, state, started, committed)
+
+    def _combine(self, outcomes: List[Tuple[Step, AgentResult]], state: Dict[str, Any], started: float,
+                 committed: bool) -> AgentResult:
+        """One reply for a pipeline; `committed` says whether its writes were kept"""
+        message = "\n\n".join(outcome.message for _, outcome in outcomes if committed or not outcome.success)
+        if not committed:
+            message += "\n\nNothing from this message was saved. Please fix it and send it again."
+        return AgentResult(
+            success=committed,
+            data={
+                "committed": committed,
+                "steps": [
+                    {"agent": step.agent, "success": outcome.success, "result": outcome.data,
+                     "duration_ms": outcome.duration_ms}
+                    for step, outcome in outcomes
+                ]
+            },
+            message=message,
+            next_step=state["current_step"],
+            duration_ms=round((time.perf_counter() - started) * 1000, 3)
+        )
+
+    def _prepare(self, step: Step, user_id: int, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return getattr(self.agent(step.agent), step.prepare)(user_id, **kwargs) or {}
+        except Exception as e:
+            # The entrypoint redoes the work itself when prepare gives nothing back
+            print(f"⚠️ {step.agent}.{step.prepare} failed: {e}")
+            return {}
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=CHAT_PIPELINE_WORKERS, thread_name_prefix="chat-prepare")
+        return self._executor
+
+    def _next(self, agent: str, state: Dict[str, Any]) -> Tuple[str, str]:
+        """Transition for `agent`, preferring the session's current flow"""
+        flow = state.get("current_flow")
+        nxt = self.transitions.get((flow, agent))
+        if nxt is None:
+            flow = self.home_flow.get(agent, flow)
+            nxt = self.transitions.get((flow, agent), agent)
+        return flow, nxt
+
+    # --- timing ----------------------------------------------------------
+
+    def _record(self, agent: str, result: AgentResult) -> None:
+        with self._timings_lock:
+            t = self._timings.setdefault(agent, {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+            t["calls"] += 1
+            t["errors"] += 0 if result.success else 1
+            t["total_ms"] += result.duration_ms
+            t["max_ms"] = max(t["max_ms"], result.duration_ms)
+
+    def step_stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-agent call counts and latency since startup"""
+        with self._timings_lock:
+            return {
+                agent: {**t, "avg_ms": round(t["total_ms"] / t["calls"], 3)}
+                for agent, t in self._timings.items()
+            }
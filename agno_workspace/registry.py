@@ -0,0 +1,108 @@
+"""
+Shared agent registry for the Agno workspace
+
+One registry per process holds every agent declared in agno.yaml. Agents are
+imported from their declared file/class and constructed on first use, then
+shared by the REST routers, the chat flow engine and the legacy orchestrator.
+Load time and the resident-memory growth seen while loading are recorded per
+agent. Memory is attributed to whichever agent first imports a shared module
+(e.g. the Gemini client), so read it as cold-start cost, not steady state.
+"""
+import importlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import yaml
+
+CONFIG_PATH = Path(__file__).parent / "agno.yaml"
+
+
+def _rss_bytes() -> int:
+    """Current resident set size; 0 where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class AgentRegistry:
+    """Lazily constructed, process-wide agent instances keyed by agno.yaml name"""
+
+    def __init__(self, specs: Iterable[Dict[str, Any]]):
+        self.specs: Dict[str, Dict[str, Any]] = {spec["name"]: spec for spec in specs}
+        self._agents: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "AgentRegistry":
+        return cls(config.get("agents", []))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.specs
+
+    def get(self, name: str) -> Any:
+        """Return the shared agent, importing and constructing it on first use"""
+        instance = self._agents.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._agents.get(name)
+                if instance is None:
+                    instance = self._agents[name] = self._load(name)
+        return instance
+
+    def _load(self, name: str) -> Any:
+        spec = self.specs.get(name)
+        if spec is None:
+            raise KeyError(f"Unknown agent: {name}")
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        module = importlib.import_module(".".join(Path(spec["file"]).with_suffix("").parts))
+        instance = getattr(module, spec["class"])()
+        load_ms = round((time.perf_counter() - started) * 1000, 3)
+        rss_kb = max(0, _rss_bytes() - rss_before) // 1024
+        self._stats[name] = {"class": spec["class"], "load_ms": load_ms, "rss_kb": rss_kb}
+        print(f"🤖 Loaded {name} ({spec['class']}) in {load_ms:.1f} ms, +{rss_kb} KB RSS")
+        return instance
+
+    def loaded(self) -> List[str]:
+        return list(self._agents)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-agent load status, load time and RSS growth"""
+        return {
+            name: {"loaded": name in self._stats, **self._stats.get(name, {"class": spec["class"]})}
+            for name, spec in self.specs.items()
+        }
+
+
+_registry: Optional[AgentRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def load_config() -> Dict[str, Any]:
+    """The workspace agno.yaml"""
+    with open(CONFIG_PATH, "r") as f:
+        return yaml.safe_load(f)
+
+
+def get_registry() -> AgentRegistry:
+    """The process-wide registry, built from agno.yaml on first call"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = AgentRegistry.from_config(load_config())
+    return _registry
+
+
+def agent_provider(name: str) -> Callable[[], Any]:
+    """FastAPI dependency for one shared agent, resolved at request time"""
+    def _provide() -> Any:
+        return get_registry().get(name)
+
+    return _provide
@@ -3,17 +3,12 @@ from typing import Any, Dict
 from datetime import datetime
 from backend.services.db import get_db, get_user
 
-# Import all agents
+# Agents come from the shared registry (agno_workspace/agno.yaml)
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
-from agents.greeting_agent import GreetingAgent
-from agents.mood_agent import MoodAgent
-from agents.cgm_agent import CGMAgent
-from agents.food_agent import FoodIntakeAgent
-from agents.meal_planner_agent import MealPlannerAgent
-from agents.interrupt_agent import InterruptAgent
+from agno_workspace.registry import AgentRegistry, get_registry
 
 @dataclass
 class OrchestratorResult:
@@ -22,14 +17,33 @@ class OrchestratorResult:
     prompt: str
 
 class Orchestrator:
-    def __init__(self):
-        # Initialize all agents
-        self.greeting_agent = GreetingAgent()
-        self.mood_agent = MoodAgent()
-        self.cgm_agent = CGMAgent()
-        self.food_agent = FoodIntakeAgent()
-        self.meal_planner_agent = MealPlannerAgent()
-        self.interrupt_agent = InterruptAgent()
+    def __init__(self, registry: AgentRegistry = None):
+        # Same agent instances as the REST routers and the Agno chat flow
+        self.registry = registry or get_registry()
+    
+    @property
+    def greeting_agent(self):
+        return self.registry.get("greeting_agent")
+    
+    @property
+    def mood_agent(self):
+        return self.registry.get("mood_tracker_agent")
+    
+    @property
+    def cgm_agent(self):
+        return self.registry.get("cgm_agent")
+    
+    @property
+    def food_agent(self):
+        return self.registry.get("food_intake_agent")
+    
+    @property
+    def meal_planner_agent(self):
+        return self.registry.get("meal_planner_agent")
+    
+    @property
+    def interrupt_agent(self):
+        return self.registry.get("interrupt_agent")
     
     def process(self, user_id: int, text: str) -> OrchestratorResult:
         text = (text or "").strip()
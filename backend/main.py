@@ -2,8 +2,9 @@
 from __future__ import annotations
 import pathlib
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from datetime import datetime, timezone
 # from backend.routers import agno
 
@@ -11,9 +12,14 @@ from datetime import datetime, timezone
 
 # Import DB module; it runs ensure_tables() on import
 from backend.services import db
+from backend.services import bulkheads
+from backend.services import admission
+from backend.services import emergency
+from backend.services import push
+from backend.services import analytics as analytics_service
 
 # Routers (module style keeps it simple)
-from backend.routers import greet, mood, cgm, food, mealplan, interrupt, history, flow, users, voice
+from backend.routers import greet, mood, cgm, food, mealplan, interrupt, history, flow, users, voice, analytics, stream
 
 # Load .env from project root
 env_path = pathlib.Path(__file__).resolve().parents[1] / ".env"
@@ -69,6 +75,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # History keyset cursors travel in headers so the list responses keep their shape
+    expose_headers=["X-Next-Cursor", "X-Latest-Cursor"],
 )
 
 # (Optional) call again on startup; harmless if already done on import
@@ -82,6 +90,29 @@ def _startup() -> None:
         print(f"⚠️ Database initialization warning: {e}")
         # Don't fail startup, just log the issue
 
+@app.on_event("shutdown")
+def _shutdown() -> None:
+    mealplan.mealplan_jobs.shutdown()
+    bulkheads.shutdown()
+    analytics_service.shutdown()
+    push.HUB.close_all()
+
+@app.exception_handler(bulkheads.BulkheadFull)
+async def _pool_saturated(request: Request, exc: bulkheads.BulkheadFull):
+    return JSONResponse(status_code=503, content={"detail": str(exc), "pool": exc.name}, headers={"Retry-After": "2"})
+
+@app.exception_handler(bulkheads.BulkheadTimeout)
+async def _pool_timeout(request: Request, exc: bulkheads.BulkheadTimeout):
+    return JSONResponse(status_code=504, content={"detail": str(exc), "pool": exc.name})
+
+@app.exception_handler(admission.Overloaded)
+async def _overloaded(request: Request, exc: admission.Overloaded):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "endpoint": exc.name},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 @app.get("/health")
 def health():
     """Health check endpoint with database and LLM status"""
@@ -110,6 +141,26 @@ def health():
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@app.get("/metrics/pools")
+def pool_metrics():
+    """Occupancy, queue wait, rejections and timeouts of the DB/LLM/TTS pools"""
+    return bulkheads.stats()
+
+@app.get("/metrics/admission")
+def admission_metrics():
+    """In-flight, admitted, degraded and rejected counts of the LLM-bound endpoints"""
+    return admission.stats()
+
+@app.get("/metrics/emergency")
+def emergency_metrics():
+    """Latency of the emergency fast lane, recorded apart from the agent steps"""
+    return emergency.stats()
+
+@app.get("/metrics/push")
+def push_metrics():
+    """Stream subscribers, published/delivered events and slow-consumer disconnects"""
+    return push.stats()
+
 @app.get("/")
 def root():
     return {
@@ -131,4 +182,6 @@ app.include_router(history.router)
 app.include_router(flow.router)
 app.include_router(users.router)
 app.include_router(voice.router)
+app.include_router(analytics.router)
+app.include_router(stream.router)
 # app.include_router(agno.router)
\ No newline at end of file
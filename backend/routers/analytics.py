@@ -0,0 +1,48 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from backend.services import analytics, correlation, postprandial
+from backend.services.bulkheads import run_analytics, run_db
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+def _check_bins(bin_minutes: int) -> None:
+    if 1440 % bin_minutes:
+        raise HTTPException(status_code=400, detail="bin_minutes must divide a day (e.g. 5, 10, 15, 30, 60)")
+
+@router.get("/agp/{user_id}")
+async def user_agp(
+    user_id: int,
+    days: int = Query(14, ge=1, le=90, description="Days of readings to include"),
+    bin_minutes: int = Query(analytics.AGP_BIN_MINUTES, ge=5, le=60, description="Time-of-day bin width")
+):
+    """Ambulatory Glucose Profile: 5/25/50/75/95th percentile curves by time of day"""
+    _check_bins(bin_minutes)
+    return await run_analytics(analytics.user_agp, user_id, days, bin_minutes)
+
+@router.get("/cohort")
+async def cohort(
+    condition: Optional[str] = Query(None, description="Medical condition, e.g. 'Type 2 Diabetes'"),
+    diet: Optional[str] = Query(None, description="Dietary preference, e.g. 'vegetarian'"),
+    days: int = Query(14, ge=1, le=90, description="Days of readings to include"),
+    bin_minutes: int = Query(analytics.AGP_BIN_MINUTES, ge=5, le=60, description="Time-of-day bin width")
+):
+    """Cohort AGP and the spread of per-user mean glucose, TIR, CV and GMI"""
+    _check_bins(bin_minutes)
+    return await run_analytics(analytics.cohort_report, condition, diet, days, bin_minutes)
+
+@router.get("/correlation/{user_id}")
+async def user_correlation(
+    user_id: int,
+    days: int = Query(30, ge=1, le=90, description="Days of logs to align")
+):
+    """Lagged mood/glucose cross-correlation and glucose excursions per food category"""
+    return await run_analytics(correlation.user_correlation, user_id, days)
+
+@router.get("/postprandial/{user_id}")
+async def user_postprandial(user_id: int, limit: int = Query(20, ge=1, le=200)):
+    """Baseline, peak, time to peak and iAUC after each meal, plus the steadiest and spikiest meals"""
+    return await run_db(postprandial.get_responses, user_id, limit)
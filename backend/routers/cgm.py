@@ -2,18 +2,46 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[2]))
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Query
 from pydantic import BaseModel
-from agno_agents.cgm_agent import CGMAgent
+from agno_workspace.registry import agent_provider
+from backend.services.bulkheads import run_db
+from backend.services.cgm_stats import get_stats
+from backend.services.cgm_alerts import get_alerts
+from backend.services.cgm_quality import get_quality
+from backend.services.cgm_forecast import get_forecast
 
 router = APIRouter(tags=["cgm"])
-agent = CGMAgent()
 
 class CGMIn(BaseModel):
     user_id: int
     reading: float
 
 @router.post("/cgm")
-def log_cgm(inp: CGMIn):
+def log_cgm(inp: CGMIn, agent=Depends(agent_provider("cgm_agent"))):
     result = agent.log_reading(inp.user_id, inp.reading)
     return result
+
+@router.get("/cgm/stats/{user_id}")
+async def cgm_stats(user_id: int):
+    """Time in/below/above range, GMI, CV and MAGE over 24h, 7d, 14d and 90d"""
+    return await run_db(get_stats, user_id)
+
+@router.get("/cgm/alerts/{user_id}")
+async def cgm_alerts(
+    user_id: int,
+    active: bool = Query(False, description="Only alerts that have not cleared yet"),
+    limit: int = Query(50, ge=1, le=500)
+):
+    """Predicted-low and rapid-rise alerts, newest first"""
+    return await run_db(get_alerts, user_id, active, limit)
+
+@router.get("/cgm/quality/{user_id}")
+async def cgm_quality(user_id: int, days: int = Query(7, ge=1, le=90)):
+    """Readings flagged as sensor artifacts, and gaps in the stream"""
+    return await run_db(get_quality, user_id, days)
+
+@router.get("/cgm/forecast/{user_id}")
+async def cgm_forecast(user_id: int):
+    """Projected glucose 30, 60, 90 and 120 minutes ahead, with approximate 95% bands"""
+    return await run_db(get_forecast, user_id)
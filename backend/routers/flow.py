@@ -2,9 +2,10 @@
 Chat Flow Router using Agno Framework
 Follows exact specifications from assignment instructions
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
+import functools
 import sys
 import os
 from pathlib import Path
@@ -14,6 +15,9 @@ project_root = Path(__file__).resolve().parents[2]
 sys.path.append(str(project_root))
 
 from agno_workspace.orchestrator import AgnoOrchestrator, AgentResult
+from backend.services import admission, emergency
+from backend.services.bulkheads import BulkheadFull, BulkheadTimeout, run_db
+from backend.services.intents import needs_llm
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -24,6 +28,7 @@ class ChatIn(BaseModel):
     """Input model for chat requests"""
     user_id: int
     message: Optional[str] = ""
+    session_id: Optional[str] = None
 
 class ChatResponse(BaseModel):
     """Response model for chat requests"""
@@ -46,11 +51,27 @@ async def chat_endpoint(chat_input: ChatIn):
     - Meal Planner Agent: Inputs: dietary preference + medical conditions + latest mood/CGM, Action: call LLM for 3-meal plan
     - Interrupt Agent: Inputs: free-form user query, Action: intercepts unrelated questions, answers via LLM, routes back
     """
+    # Emergency fast lane: answered before any DB, LLM or pool access
+    urgent = emergency.triage(chat_input.message or "")
+    if urgent is not None:
+        return ChatResponse(
+            step="interrupt_agent",
+            result=urgent,
+            prompt=urgent["message"],
+            message=urgent["message"],
+            next_step=None
+        )
+    
     try:
-        # Process through Agno orchestrator
-        result: AgentResult = agno_orchestrator.process(
+        # Process through Agno orchestrator; only LLM-bound messages go through
+        # admission control, DB-only commands and emergencies are never shed
+        text = chat_input.message or ""
+        run = functools.partial(admission.run, "chat") if needs_llm(text) else run_db
+        result: AgentResult = await run(
+            agno_orchestrator.process,
             user_id=chat_input.user_id,
-            text=chat_input.message or ""
+            text=text,
+            session_id=chat_input.session_id
         )
         
         # Convert to response format
@@ -62,14 +83,21 @@ async def chat_endpoint(chat_input: ChatIn):
             next_step=result.next_step
         )
         
+    except (BulkheadFull, BulkheadTimeout, admission.Overloaded):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in Agno orchestrator: {str(e)}")
 
 @router.get("/status")
-async def get_flow_status():
-    """Get current Agno flow status for debugging"""
+async def get_flow_status(
+    user_id: int = Query(..., description="User whose chat session to inspect"),
+    session_id: Optional[str] = Query(None, description="Client session id, if one was sent to /chat")
+):
+    """Get one chat session's Agno flow status for debugging"""
+    status = await run_db(agno_orchestrator.get_current_flow_status, user_id, session_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="No active chat session for this user/session")
     try:
-        status = agno_orchestrator.get_current_flow_status()
         return {
             "status": "ok",
             "agno_framework": "active",
@@ -79,3 +107,12 @@ async def get_flow_status():
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting flow status: {str(e)}")
+
+@router.get("/metrics")
+async def get_step_metrics():
+    """Per-agent step timings from the flow engine and load cost from the agent registry"""
+    return {
+        "status": "ok",
+        "steps": agno_orchestrator.get_step_timings(),
+        "agents": agno_orchestrator.get_agent_stats()
+    }
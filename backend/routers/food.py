@@ -2,17 +2,29 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[2]))
 
-from fastapi import APIRouter
+from typing import Literal
+from fastapi import APIRouter, Depends, Query
 from pydantic import BaseModel
-from agno_agents.food_agent import FoodIntakeAgent
+from agno_workspace.registry import agent_provider
+from backend.services import admission
+from backend.services.bulkheads import run_db
+from backend.services.nutrition import get_totals
 
 router = APIRouter(tags=["food"])
-agent = FoodIntakeAgent()
 
 class FoodIn(BaseModel):
     user_id: int
     description: str
 
 @router.post("/food")
-def log_food(inp: FoodIn):
-    return agent.log_food(inp.user_id, inp.description)
+async def log_food(inp: FoodIn, agent=Depends(agent_provider("food_intake_agent"))):
+    return await admission.run("food", agent.log_food, inp.user_id, inp.description)
+
+@router.get("/food/nutrition/{user_id}")
+async def nutrition_totals(
+    user_id: int,
+    period: Literal["daily", "weekly"] = Query("daily", description="Totals per UTC day or per week (Monday first)"),
+    days: int = Query(7, ge=1, le=366, description="Days back from today (UTC), today included")
+):
+    """Carbs, protein, fat and calories per day or week, read from the per-user daily rollup"""
+    return await run_db(get_totals, user_id, days, period)
@@ -2,13 +2,12 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[2]))
 
-from fastapi import APIRouter, Path
+from fastapi import APIRouter, Depends, Path
 from pydantic import BaseModel, Field
 from typing import Dict, Any, List
-from agno_agents.greeting_agent import GreetingAgent
+from agno_workspace.registry import agent_provider
 
 router = APIRouter(prefix="/greet", tags=["👋 Greeting Agent"])
-agent = GreetingAgent()
 
 class GreetingResponse(BaseModel):
     """Personalized greeting response"""
@@ -18,7 +17,8 @@ class GreetingResponse(BaseModel):
 
 @router.get("/{user_id}", response_model=GreetingResponse)
 def greet(
-    user_id: int = Path(..., description="User ID to greet", example=1, ge=1, le=100)
+    user_id: int = Path(..., description="User ID to greet", example=1, ge=1, le=100),
+    agent=Depends(agent_provider("greeting_agent"))
 ) -> GreetingResponse:
     """
     👋 **Get Personalized Greeting**
@@ -2,19 +2,109 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[2]))
 
-from fastapi import APIRouter, Query
-from backend.services.db import get_mood_history, get_cgm_history, get_food_history
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Literal, Optional
+from fastapi import APIRouter, HTTPException, Query, Response
+from backend.services.db import get_mood_history, get_cgm_history, get_food_history, encode_cursor, decode_cursor
+from backend.services.bulkheads import run_db
+from backend.services.downsample import cgm_series
+from backend.services.resample import get_resampled
+from backend.services.cgm_index import get_range
 
 router = APIRouter(prefix="/history", tags=["history"])
 
+CURSOR_HELP = "Opaque X-Next-Cursor from the previous page: return the rows before it"
+SINCE_HELP = "X-Latest-Cursor (or an ISO timestamp) from the last fetch: return only rows written since, oldest write first"
+# Longer ranges belong to the downsampled chart series
+RESAMPLED_MAX_DAYS = 31
+
+async def _page(
+    fetch: Callable[..., List[Dict[str, Any]]], response: Response, user_id: int, limit: int,
+    cursor: Optional[str], since: Optional[str]
+) -> List[Dict[str, Any]]:
+    """Keyset page; X-Next-Cursor pages further back, X-Latest-Cursor (the last row written) feeds the next `since`"""
+    if cursor and since:
+        raise HTTPException(status_code=400, detail="Use either `cursor` or `since`, not both")
+    try:
+        before = decode_cursor(cursor) if cursor else None
+        after = decode_cursor(since, after=True) if since else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rows = await run_db(fetch, user_id, limit, before, after)
+    if rows:
+        # `since` keys on id, so the cursor carries the newest write, not the newest timestamp
+        newest = max(rows, key=lambda row: row["id"])
+        response.headers["X-Latest-Cursor"] = encode_cursor(newest["timestamp"], newest["id"])
+        if len(rows) == limit and after is None:
+            response.headers["X-Next-Cursor"] = encode_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+    elif since:
+        response.headers["X-Latest-Cursor"] = since
+    return rows
+
 @router.get("/mood/{user_id}")
-def mood_history(user_id: int, limit: int = Query(50, ge=1, le=500)):
-    return get_mood_history(user_id, limit)
+async def mood_history(
+    user_id: int, response: Response, limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description=CURSOR_HELP), since: Optional[str] = Query(None, description=SINCE_HELP)
+):
+    return await _page(get_mood_history, response, user_id, limit, cursor, since)
 
 @router.get("/cgm/{user_id}")
-def cgm_history(user_id: int, limit: int = Query(50, ge=1, le=500)):
-    return get_cgm_history(user_id, limit)
+async def cgm_history(
+    user_id: int, response: Response, limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description=CURSOR_HELP), since: Optional[str] = Query(None, description=SINCE_HELP)
+):
+    return await _page(get_cgm_history, response, user_id, limit, cursor, since)
+
+@router.get("/cgm/series/{user_id}")
+async def cgm_chart_series(
+    user_id: int,
+    start: Optional[datetime] = Query(None, alias="from", description="ISO start (default: 7 days before `to`)"),
+    end: Optional[datetime] = Query(None, alias="to", description="ISO end (default: now)"),
+    max_points: int = Query(500, ge=10, le=5000),
+    method: Literal["lttb", "minmax"] = Query("lttb", description="lttb line or min/max/mean bands")
+):
+    """Downsampled CGM series for a time range, never more than max_points points"""
+    end = _utc(end) if end else datetime.now(timezone.utc)
+    start = _utc(start) if start else end - timedelta(days=7)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="`from` must be before `to`")
+    return await run_db(cgm_series, user_id, start, end, max_points, method)
+
+@router.get("/cgm/resampled/{user_id}")
+async def cgm_resampled(
+    user_id: int,
+    start: Optional[datetime] = Query(None, alias="from", description="ISO start (default: 24 hours before `to`)"),
+    end: Optional[datetime] = Query(None, alias="to", description="ISO end (default: now)")
+):
+    """CGM on a regular 5-minute grid; null marks points inside gaps too long to interpolate"""
+    end = _utc(end) if end else datetime.now(timezone.utc)
+    start = _utc(start) if start else end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="`from` must be before `to`")
+    if end - start > timedelta(days=RESAMPLED_MAX_DAYS):
+        raise HTTPException(status_code=400, detail=f"Range is limited to {RESAMPLED_MAX_DAYS} days; use /history/cgm/series for longer charts")
+    return await run_db(get_resampled, user_id, start, end)
+
+@router.get("/cgm/summary/{user_id}")
+async def cgm_range_summary(
+    user_id: int,
+    start: Optional[datetime] = Query(None, alias="from", description="ISO start (default: 7 days before `to`)"),
+    end: Optional[datetime] = Query(None, alias="to", description="ISO end (default: now)")
+):
+    """Mean, SD, time in ranges and extremes between any two instants, from the prefix-sum index"""
+    end = _utc(end) if end else datetime.now(timezone.utc)
+    start = _utc(start) if start else end - timedelta(days=7)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="`from` must be before `to`")
+    return await run_db(get_range, user_id, start, end)
+
+def _utc(moment: datetime) -> datetime:
+    """Naive query timestamps are UTC, like the stored ones"""
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
 
 @router.get("/food/{user_id}")
-def food_history(user_id: int, limit: int = Query(50, ge=1, le=500)):
-    return get_food_history(user_id, limit)
+async def food_history(
+    user_id: int, response: Response, limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description=CURSOR_HELP), since: Optional[str] = Query(None, description=SINCE_HELP)
+):
+    return await _page(get_food_history, response, user_id, limit, cursor, since)
@@ -2,17 +2,24 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[2]))
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from pydantic import BaseModel
-from agno_agents.interrupt_agent import InterruptAgent
+from agno_workspace.registry import agent_provider
+from backend.services import emergency
+from backend.services.bulkheads import run_llm
+from backend.services.deadlines import ENDPOINT_DEADLINES, deadline
 
 router = APIRouter(tags=["interrupt"])
-agent = InterruptAgent()
 
 class InterruptIn(BaseModel):
     query: str
 
 @router.post("/interrupt")
-def interrupt(inp: InterruptIn):
+async def interrupt(inp: InterruptIn, agent=Depends(agent_provider("interrupt_agent"))):
+    # Emergency fast lane: no pool, DB or LLM
+    urgent = emergency.triage(inp.query)
+    if urgent is not None:
+        return urgent
     # For now, use a default user_id of 1 since the frontend doesn't send user_id
-    return agent.handle_query(1, inp.query)
+    with deadline(ENDPOINT_DEADLINES["interrupt"]):
+        return await run_llm(agent.handle_query, 1, inp.query)
@@ -2,13 +2,26 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[2]))
 
-from fastapi import APIRouter
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
-from agno_agents.meal_planner_agent import MealPlannerAgent
+from agno_workspace.registry import agent_provider, get_registry
+from backend.services.jobs import JobRunner, JobQueueFull
+from backend.services import admission
 
 router = APIRouter(tags=["🍽️ Meal Planning"])
-agent = MealPlannerAgent()
+
+def _plan(user_id: int) -> Dict[str, Any]:
+    return get_registry().get("meal_planner_agent").plan(user_id)
+
+# Async job mode shares the registry's meal planner with the synchronous endpoint
+mealplan_jobs = JobRunner(
+    "mealplan",
+    _plan,
+    workers=int(os.getenv("MEALPLAN_JOB_WORKERS", "2")),
+    queue_limit=int(os.getenv("MEALPLAN_JOB_QUEUE", "32")),
+)
 
 class MealIn(BaseModel):
     """Meal plan request input"""
@@ -30,8 +43,28 @@ class MealPlanResponse(BaseModel):
     glucose_analysis: str = Field(None, description="Glucose level analysis")
     suggestions: List[MealSuggestion] = Field(default=[], description="Meal suggestions")
 
+class MealPlanJob(BaseModel):
+    """Background meal plan job status"""
+    job_id: str = Field(..., description="Job identifier")
+    status: str = Field(..., description="queued, running, done or failed")
+    user_id: Optional[int] = Field(None, description="User ID")
+    created_at: Optional[str] = Field(None, description="When the job was queued")
+    started_at: Optional[str] = Field(None, description="When generation started")
+    finished_at: Optional[str] = Field(None, description="When generation finished")
+    error: Optional[str] = Field(None, description="Failure reason")
+    result: Optional[MealPlanResponse] = Field(None, description="Meal plan, once done")
+
+def _to_response(result: Dict[str, Any]) -> MealPlanResponse:
+    return MealPlanResponse(
+        ok=result.get("success", False),
+        latest_cgm=result.get("latest_cgm", None),
+        personalized_message=result.get("message", ""),
+        glucose_analysis=result.get("glucose_analysis", ""),
+        suggestions=result.get("suggestions", [])
+    )
+
 @router.post("/mealplan", response_model=MealPlanResponse)
-def mealplan(inp: MealIn) -> MealPlanResponse:
+async def mealplan(inp: MealIn, agent=Depends(agent_provider("meal_planner_agent"))) -> MealPlanResponse:
     """
     🍽️ **Generate Personalized Meal Plan**
     
@@ -48,12 +81,51 @@ def mealplan(inp: MealIn) -> MealPlanResponse:
     - Local cuisine preferences
     
     **Returns:** 3 personalized meal suggestions with nutritional info
+    
+    Under load the plan may come from the rule-based fallback meals, or the
+    request is rejected with `429` and `Retry-After`.
     """
-    result = agent.plan(inp.user_id)
-    return MealPlanResponse(
-        ok=result.get("success", False),
-        latest_cgm=result.get("latest_cgm", None),
-        personalized_message=result.get("message", ""),
-        glucose_analysis=result.get("glucose_analysis", ""),
-        suggestions=result.get("suggestions", [])
+    return _to_response(await admission.run("mealplan", agent.plan, inp.user_id))
+
+@router.post("/mealplan/jobs", response_model=MealPlanJob, status_code=202)
+def submit_mealplan_job(inp: MealIn) -> MealPlanJob:
+    """
+    ⏳ **Queue a Meal Plan Job**
+    
+    Same generation as `POST /mealplan`, but returns `202` immediately with a
+    job id instead of holding the request open for the LLM round trip.
+    Poll `GET /mealplan/jobs/{job_id}` (optionally with `wait`) for the result.
+    
+    Returns `503` with `Retry-After` when the job queue is full.
+    """
+    try:
+        job = mealplan_jobs.submit(inp.user_id)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return MealPlanJob(job_id=job["job_id"], status=job["status"], user_id=inp.user_id)
+
+@router.get("/mealplan/jobs/{job_id}", response_model=MealPlanJob)
+async def get_mealplan_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=60, description="Seconds to long-poll for completion")
+) -> MealPlanJob:
+    """
+    🔎 **Meal Plan Job Status**
+    
+    Returns the job status, and the meal plan once `status` is `done`.
+    With `wait > 0` the request is held until the job finishes or the wait elapses.
+    """
+    job = await mealplan_jobs.wait(job_id, wait)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Unknown meal plan job: {job_id}")
+    result = job.get("result")
+    return MealPlanJob(
+        job_id=job["id"],
+        status=job["status"],
+        user_id=job.get("user_id"),
+        created_at=job.get("created_at"),
+        started_at=job.get("started_at"),
+        finished_at=job.get("finished_at"),
+        error=job.get("error"),
+        result=_to_response(result) if isinstance(result, dict) else None
     )
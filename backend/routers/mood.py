@@ -2,47 +2,66 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[2]))
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Query
 from pydantic import BaseModel, Field
-from typing import Dict, Any
-from agno_agents.mood_agent import MoodTrackerAgent
+from typing import Any, Dict, Optional
+from agno_workspace.registry import agent_provider
+from backend.services import admission, mood_lexicon
+from backend.services.bulkheads import run_db
+from backend.services.mood_score import get_summary
 
 router = APIRouter(tags=["😊 Mood Tracking"])
-agent = MoodTrackerAgent()
 
 class MoodIn(BaseModel):
     """Mood logging input"""
     user_id: int = Field(..., description="User ID", example=1)
-    mood: str = Field(..., description="User's current mood", example="happy")
+    mood: str = Field(..., description="User's current mood: a label, synonym or short phrase; typos are tolerated", example="happy")
 
 class MoodResponse(BaseModel):
     """Mood logging response"""
     ok: bool = Field(..., description="Success status")
     message: str = Field(..., description="Response message")
     mood_logged: str = Field(None, description="Logged mood")
-    mood_score: int = Field(None, description="Mood score (1-4)")
+    mood_score: int = Field(None, description="Mood score (1-5)")
+    trend: Optional[Dict[str, Any]] = Field(None, description="EWMA, 7-day average and direction after this entry")
     next_step: str = Field(None, description="Suggested next action")
 
 @router.post("/mood", response_model=MoodResponse)
-def log_mood(inp: MoodIn) -> MoodResponse:
+async def log_mood(inp: MoodIn, agent=Depends(agent_provider("mood_tracker_agent"))) -> MoodResponse:
     """
     😊 **Log User Mood**
     
     Record the user's current emotional state with validation and scoring.
     
     **Valid Moods:**
-    - **Excellent (4):** happy, great, excellent, amazing, fantastic
-    - **Good (3):** good, ok, okay, fine, neutral, alright  
-    - **Low (2):** sad, down, low, disappointed, upset
-    - **Poor (1):** awful, terrible, depressed, angry, frustrated
+    - **Excellent (5):** happy, excited, great, excellent, amazing, fantastic
+    - **Good (4):** content, calm, good
+    - **Neutral (3):** neutral, ok, okay, fine, alright
+    - **Low (2):** tired, sad, down, low, disappointed, upset
+    - **Poor (1):** stressed, anxious, angry, awful, terrible, depressed, frustrated
+    
+    Synonyms, phrases and typos are recognized ("exhausted", "happyy",
+    "feeling kinda down"); the LLM is only asked for text the lexicon cannot place,
+    and only that text goes through admission control.
     
     **Example:** `{"user_id": 1, "mood": "happy"}`
     """
-    result = agent.log_mood(inp.user_id, inp.mood)
+    if mood_lexicon.needs_llm(inp.mood):
+        result = await admission.run("mood", agent.log_mood, inp.user_id, inp.mood)
+    else:
+        # Recognized (or fallback off): resolved here, so the DB worker never calls the LLM
+        match = mood_lexicon.recognize(inp.mood)
+        result = await run_db(agent.log_mood, inp.user_id, inp.mood, match=match, resolved=True)
     return MoodResponse(
         ok=result.get("success", False),
         message=result.get("message", ""),
-        mood_logged=inp.mood,
+        mood_logged=result.get("mood_logged", inp.mood),
         mood_score=result.get("mood_score", 0),
+        trend=result.get("trend"),
         next_step=result.get("next_step", "")
     )
+
+@router.get("/mood/trend/{user_id}")
+def mood_trend(user_id: int, days: int = Query(7, ge=1, le=90)) -> Dict[str, Any]:
+    """Mood EWMA, average over the last `days` days and its direction, from the stored aggregates"""
+    return get_summary(user_id, days)
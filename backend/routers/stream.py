@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from backend.services import push
+
+router = APIRouter(prefix="/stream", tags=["stream"])
+
+@router.get("/{user_id}")
+async def stream_user(
+    user_id: int,
+    events: Optional[str] = Query(None, description="Comma-separated subset of cgm,mood,food,alert"),
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID")
+):
+    """Server-Sent Events: new readings, mood, food logs and alerts for one user as they are written"""
+    kinds = [kind.strip() for kind in events.split(",") if kind.strip()] if events else None
+    unknown = sorted(set(kinds or ()) - set(push.EVENT_KINDS))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown event types: {', '.join(unknown)}")
+    sub = push.HUB.subscribe(user_id, kinds, last_event_id)
+    return StreamingResponse(
+        push.HUB.stream(sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -6,44 +6,51 @@ import os
 import tempfile
 from pathlib import Path
 
+from backend.services.bulkheads import BulkheadFull, BulkheadTimeout, run_tts
+
 router = APIRouter()
 
 class VoiceRequest(BaseModel):
     text: str
     user_id: int = 1
 
+def _render_greeting(text: str, user_id: int) -> Path:
+    """Render speech to a wav file (blocking; runs on the TTS pool)"""
+    # Initialize text-to-speech engine
+    engine = pyttsx3.init()
+    
+    # Configure voice properties
+    engine.setProperty('rate', 150)  # Speed of speech
+    engine.setProperty('volume', 0.9)  # Volume level
+    
+    # Get available voices and set a pleasant one
+    voices = engine.getProperty('voices')
+    if voices:
+        # Try to find a female voice for better greeting experience
+        for voice in voices:
+            if 'female' in voice.name.lower() or 'zira' in voice.name.lower():
+                engine.setProperty('voice', voice.id)
+                break
+        else:
+            # Fallback to first available voice
+            engine.setProperty('voice', voices[0].id)
+    
+    # Create temporary file for audio
+    temp_dir = Path("temp_audio")
+    temp_dir.mkdir(exist_ok=True)
+    
+    audio_file = temp_dir / f"greeting_{user_id}.wav"
+    
+    # Generate speech
+    engine.save_to_file(text, str(audio_file))
+    engine.runAndWait()
+    return audio_file
+
 @router.post("/generate-greeting")
 async def generate_voice_greeting(request: VoiceRequest):
     """Generate voice greeting for user"""
     try:
-        # Initialize text-to-speech engine
-        engine = pyttsx3.init()
-        
-        # Configure voice properties
-        engine.setProperty('rate', 150)  # Speed of speech
-        engine.setProperty('volume', 0.9)  # Volume level
-        
-        # Get available voices and set a pleasant one
-        voices = engine.getProperty('voices')
-        if voices:
-            # Try to find a female voice for better greeting experience
-            for voice in voices:
-                if 'female' in voice.name.lower() or 'zira' in voice.name.lower():
-                    engine.setProperty('voice', voice.id)
-                    break
-            else:
-                # Fallback to first available voice
-                engine.setProperty('voice', voices[0].id)
-        
-        # Create temporary file for audio
-        temp_dir = Path("temp_audio")
-        temp_dir.mkdir(exist_ok=True)
-        
-        audio_file = temp_dir / f"greeting_{request.user_id}.wav"
-        
-        # Generate speech
-        engine.save_to_file(request.text, str(audio_file))
-        engine.runAndWait()
+        audio_file = await run_tts(_render_greeting, request.text, request.user_id)
         
         # Return the audio file
         if audio_file.exists():
@@ -55,6 +62,8 @@ async def generate_voice_greeting(request: VoiceRequest):
         else:
             raise HTTPException(status_code=500, detail="Failed to generate audio file")
             
+    except (BulkheadFull, BulkheadTimeout):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Voice generation failed: {str(e)}")
 
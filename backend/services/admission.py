@@ -0,0 +1,134 @@
+# backend/services/admission.py
+"""
+Admission control for the LLM-bound endpoints (/chat, /mealplan, /food, and
+/mood for text the mood lexicon cannot place).
+
+Each endpoint has a controller that counts its in-flight requests and looks at
+the LLM pool before letting a request in:
+
+- admit:   normal path, the request runs on the LLM pool;
+- degrade: too many requests in flight, the LLM pool is saturated or its
+           recent queue wait is too long - the request runs on the DB pool
+           with no LLM budget, so agents serve their deterministic fallbacks;
+- reject:  the endpoint is at its hard limit - Overloaded, which main.py maps
+           to 429 with Retry-After.
+
+A degraded request that cannot get a DB worker either is rejected by that pool
+(503 with Retry-After). Requests that never reach the LLM (DB-only chat
+commands, emergency messages) skip admission entirely.
+
+Limits come from the environment, e.g. ADMISSION_CHAT_MAX_IN_FLIGHT,
+ADMISSION_CHAT_DEGRADE_AT and ADMISSION_MAX_QUEUE_WAIT_MS.
+"""
+import math
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+from backend.services import bulkheads, deadlines
+
+# LLM queue wait above which new requests are served their fallback
+ADMISSION_MAX_QUEUE_WAIT_MS = float(os.getenv("ADMISSION_MAX_QUEUE_WAIT_MS", "2000"))
+
+
+class Overloaded(RuntimeError):
+    """Raised when an endpoint already holds its maximum number of requests"""
+
+    def __init__(self, name: str, limit: int, retry_after: int):
+        super().__init__(f"{name} is overloaded ({limit} requests in flight)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Per-endpoint in-flight limit with a degraded (fallback-only) band below it"""
+
+    def __init__(self, name: str, max_in_flight: int, degrade_at: int, pool: str = "llm"):
+        self.name = name
+        self.max_in_flight = max(1, max_in_flight)
+        self.degrade_at = max(0, min(degrade_at, self.max_in_flight))
+        self.pool = bulkheads.BULKHEADS[pool]
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._admitted = 0
+        self._degraded = 0
+        self._rejected = 0
+
+    def _retry_after(self) -> int:
+        """Seconds a client should back off: roughly the current LLM queue wait"""
+        return max(1, math.ceil(self.pool.recent_queue_wait()))
+
+    def _overloaded_pool(self) -> bool:
+        return self.pool.saturated or self.pool.recent_queue_wait() * 1000 >= ADMISSION_MAX_QUEUE_WAIT_MS
+
+    @contextmanager
+    def admit(self) -> Iterator[bool]:
+        """Hold an admission slot for the block; yields True when the request is degraded"""
+        with self._lock:
+            if self._in_flight >= self.max_in_flight:
+                self._rejected += 1
+                raise Overloaded(self.name, self.max_in_flight, self._retry_after())
+            degraded = self._in_flight >= self.degrade_at or self._overloaded_pool()
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+            if degraded:
+                self._degraded += 1
+            else:
+                self._admitted += 1
+
+        try:
+            if degraded:
+                with deadlines.without_llm():
+                    yield True
+            else:
+                yield False
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "degrade_at": self.degrade_at,
+                "in_flight": self._in_flight,
+                "peak_in_flight": self._peak_in_flight,
+                "admitted": self._admitted,
+                "degraded": self._degraded,
+                "rejected": self._rejected,
+                "llm_queue_wait_ms": round(self.pool.recent_queue_wait() * 1000, 3),
+            }
+
+
+def _from_env(name: str, max_in_flight: int, degrade_at: int) -> AdmissionController:
+    prefix = f"ADMISSION_{name.upper()}"
+    return AdmissionController(
+        name,
+        max_in_flight=int(os.getenv(f"{prefix}_MAX_IN_FLIGHT", str(max_in_flight))),
+        degrade_at=int(os.getenv(f"{prefix}_DEGRADE_AT", str(degrade_at))),
+    )
+
+
+# endpoint -> controller; meal plans are the slowest LLM calls, so the tightest limits
+CONTROLLERS: Dict[str, AdmissionController] = {
+    "chat": _from_env("chat", max_in_flight=64, degrade_at=32),
+    "mealplan": _from_env("mealplan", max_in_flight=16, degrade_at=8),
+    "food": _from_env("food", max_in_flight=32, degrade_at=16),
+    # Only moods the lexicon cannot place are admitted here
+    "mood": _from_env("mood", max_in_flight=32, degrade_at=16),
+}
+
+
+async def run(endpoint: str, func, *args: Any, **kwargs: Any) -> Any:
+    """Run an LLM-bound call through `endpoint`'s admission controller"""
+    with CONTROLLERS[endpoint].admit() as degraded:
+        with deadlines.deadline(deadlines.ENDPOINT_DEADLINES[endpoint]):
+            if degraded:
+                return await bulkheads.run_db(func, *args, **kwargs)
+            return await bulkheads.run_llm(func, *args, **kwargs)
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    return {name: controller.stats() for name, controller in CONTROLLERS.items()}
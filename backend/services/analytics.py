@@ -0,0 +1,226 @@
+# backend/services/analytics.py
+"""
+Vectorized CGM analytics: AGP percentile curves and cohort distributions.
+
+Trusted readings (those the quality filter did not flag as sensor artifacts)
+are pulled from cgm_logs in columnar chunks (user id, epoch seconds,
+glucose) straight into NumPy arrays. Everything downstream is array work:
+
+- AGP: each reading falls into a (time-of-day bin, mg/dL level) cell; one
+  np.bincount builds the full histogram and the 5/25/50/75/95th percentiles
+  of every bin are read off its cumulative counts. Histograms add, so chunks,
+  users and worker processes are combined by summing them.
+- Cohorts: per-user count/sum/sum of squares/in-range counts come from
+  weighted bincounts; the cohort's distribution of mean, TIR, CV and GMI is
+  then taken across users.
+
+Cohorts larger than ANALYTICS_CHUNK_USERS are split into user chunks that run
+on a process pool (ANALYTICS_WORKERS processes), each with its own read-only
+connection.
+"""
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.services import db
+from backend.services.cgm_stats import TRUSTED_READING
+
+PERCENTILES: Tuple[int, ...] = (5, 25, 50, 75, 95)
+# Glucose levels kept by the histogram (mg/dL, 1 mg/dL resolution)
+LEVEL_MIN, LEVEL_MAX = 40, 400
+LEVELS = LEVEL_MAX - LEVEL_MIN + 1
+# Time of day is local time; the app reports in IST
+LOCAL_UTC_OFFSET_MINUTES = int(os.getenv("LOCAL_UTC_OFFSET_MINUTES", "330"))
+AGP_BIN_MINUTES = int(os.getenv("AGP_BIN_MINUTES", "15"))
+
+ANALYTICS_WORKERS = int(os.getenv("ANALYTICS_WORKERS", str(os.cpu_count() or 2)))
+ANALYTICS_CHUNK_USERS = int(os.getenv("ANALYTICS_CHUNK_USERS", "500"))
+ANALYTICS_CHUNK_ROWS = int(os.getenv("ANALYTICS_CHUNK_ROWS", "200000"))
+
+
+# --- loading -----------------------------------------------------------------
+
+def load_chunks(
+    conn: sqlite3.Connection, user_ids: Sequence[int], since: str, rows: int = ANALYTICS_CHUNK_ROWS
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """(user_id, epoch seconds, glucose) column arrays for trusted readings at or after `since`"""
+    marks = ",".join("?" for _ in user_ids)
+    cur = conn.execute(
+        f"SELECT user_id, CAST(strftime('%s', timestamp) AS INTEGER), glucose_level FROM cgm_logs "
+        f"WHERE user_id IN ({marks}) AND timestamp >= ? AND {TRUSTED_READING}",
+        (*user_ids, since),
+    )
+    while True:
+        batch = cur.fetchmany(rows)
+        if not batch:
+            return
+        users, seconds, glucose = zip(*batch)
+        yield (
+            np.fromiter(users, dtype=np.int64, count=len(batch)),
+            np.fromiter(seconds, dtype=np.int64, count=len(batch)),
+            np.fromiter(glucose, dtype=np.float64, count=len(batch)),
+        )
+
+
+# --- array kernels -----------------------------------------------------------
+
+def histogram(seconds: np.ndarray, glucose: np.ndarray, bin_minutes: int = AGP_BIN_MINUTES) -> np.ndarray:
+    """Counts per (time-of-day bin, mg/dL level)"""
+    bins = 1440 // bin_minutes
+    minute = ((seconds // 60 + LOCAL_UTC_OFFSET_MINUTES) % 1440) // bin_minutes
+    level = np.clip(np.rint(glucose), LEVEL_MIN, LEVEL_MAX).astype(np.int64) - LEVEL_MIN
+    return np.bincount(minute * LEVELS + level, minlength=bins * LEVELS).reshape(bins, LEVELS)
+
+
+def percentiles(hist: np.ndarray, qs: Sequence[int] = PERCENTILES) -> Dict[str, List[Optional[int]]]:
+    """Percentile curves (mg/dL) from a histogram; None for bins without readings"""
+    cumulative = np.cumsum(hist, axis=1)
+    totals = cumulative[:, -1]
+    curves = {}
+    for q in qs:
+        # First level whose cumulative count reaches q% of the bin's readings
+        index = (cumulative < np.maximum(np.ceil(totals * q / 100.0), 1)[:, None]).sum(axis=1)
+        values = index + LEVEL_MIN
+        curves[f"p{q}"] = [int(v) if t else None for v, t in zip(values, totals)]
+    return curves
+
+
+def user_moments(positions: np.ndarray, glucose: np.ndarray, size: int) -> np.ndarray:
+    """Per-user [count, sum, sum of squares, in range] rows for users indexed 0..size-1"""
+    in_range = ((glucose >= 70) & (glucose <= 180)).astype(np.float64)
+    return np.stack([
+        np.bincount(positions, minlength=size).astype(np.float64),
+        np.bincount(positions, weights=glucose, minlength=size),
+        np.bincount(positions, weights=glucose * glucose, minlength=size),
+        np.bincount(positions, weights=in_range, minlength=size),
+    ], axis=1)
+
+
+def summarize(
+    user_ids: Sequence[int], chunks: Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+    bin_minutes: int = AGP_BIN_MINUTES
+) -> Tuple[np.ndarray, np.ndarray]:
+    """AGP histogram and per-user moments over a stream of column chunks"""
+    ids = np.asarray(sorted(user_ids), dtype=np.int64)
+    hist = np.zeros((1440 // bin_minutes, LEVELS), dtype=np.int64)
+    moments = np.zeros((len(ids), 4), dtype=np.float64)
+    for users, seconds, glucose in chunks:
+        hist += histogram(seconds, glucose, bin_minutes)
+        moments += user_moments(np.searchsorted(ids, users), glucose, len(ids))
+    return hist, moments
+
+
+def _summarize_from_db(db_path: str, user_ids: Sequence[int], since: str, bin_minutes: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Process-pool task: one chunk of users over its own read-only connection"""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return summarize(user_ids, load_chunks(conn, user_ids, since), bin_minutes)
+    finally:
+        conn.close()
+
+
+# --- process pool ------------------------------------------------------------
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=ANALYTICS_WORKERS)
+    return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def summarize_users(user_ids: Sequence[int], days: int, bin_minutes: int = AGP_BIN_MINUTES) -> Tuple[np.ndarray, np.ndarray]:
+    """Histogram and per-user moments (in sorted user id order) for the last `days` days"""
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+    ids = sorted(set(user_ids))
+    if len(ids) <= ANALYTICS_CHUNK_USERS:
+        return _summarize_from_db(str(db.DB_PATH), ids, since, bin_minutes)
+
+    chunks = [ids[i:i + ANALYTICS_CHUNK_USERS] for i in range(0, len(ids), ANALYTICS_CHUNK_USERS)]
+    futures = [_get_pool().submit(_summarize_from_db, str(db.DB_PATH), chunk, since, bin_minutes) for chunk in chunks]
+    hist = np.zeros((1440 // bin_minutes, LEVELS), dtype=np.int64)
+    parts = []
+    for future in futures:
+        chunk_hist, chunk_moments = future.result()
+        hist += chunk_hist
+        parts.append(chunk_moments)
+    return hist, np.concatenate(parts)
+
+
+# --- reports -----------------------------------------------------------------
+
+def _agp(hist: np.ndarray, bin_minutes: int) -> Dict[str, Any]:
+    return {
+        "bin_minutes": bin_minutes,
+        "minutes": list(range(0, 1440, bin_minutes)),
+        "readings": hist.sum(axis=1).tolist(),
+        **percentiles(hist),
+    }
+
+
+def user_agp(user_id: int, days: int = 14, bin_minutes: int = AGP_BIN_MINUTES) -> Dict[str, Any]:
+    """AGP curves for one user"""
+    hist, moments = summarize_users([user_id], days, bin_minutes)
+    return {"user_id": user_id, "days": days, "readings": int(moments[0, 0]), "agp": _agp(hist, bin_minutes)}
+
+
+def cohort_user_ids(condition: Optional[str] = None, diet: Optional[str] = None) -> List[int]:
+    """Users whose medical conditions mention `condition` and/or whose diet is `diet`"""
+    clauses, params = [], []
+    if condition:
+        clauses.append("LOWER(medical_conditions) LIKE ?")
+        params.append(f"%{condition.lower()}%")
+    if diet:
+        clauses.append("LOWER(dietary_preference) = ?")
+        params.append(diet.lower())
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    con = db.get_db()
+    try:
+        return [row[0] for row in con.execute(f"SELECT id FROM users {where} ORDER BY id", params)]
+    finally:
+        con.close()
+
+
+def cohort_report(
+    condition: Optional[str] = None, diet: Optional[str] = None, days: int = 14,
+    bin_minutes: int = AGP_BIN_MINUTES
+) -> Dict[str, Any]:
+    """Cohort AGP plus the distribution of per-user mean, TIR, CV and GMI"""
+    user_ids = cohort_user_ids(condition, diet)
+    report: Dict[str, Any] = {"condition": condition, "diet": diet, "days": days, "users": len(user_ids)}
+    if not user_ids:
+        return {**report, "users_with_readings": 0, "readings": 0, "agp": None, "distributions": {}}
+
+    hist, moments = summarize_users(user_ids, days, bin_minutes)
+    count, total, squares, in_range = moments[moments[:, 0] > 1].T
+    mean = total / count
+    sd = np.sqrt(np.maximum(squares - count * mean * mean, 0) / (count - 1))
+    metrics = {"mean": mean, "tir": 100 * in_range / count, "cv": 100 * sd / mean, "gmi": 3.31 + 0.02392 * mean}
+    return {
+        **report,
+        "users_with_readings": int(len(count)),
+        "readings": int(moments[:, 0].sum()),
+        "agp": _agp(hist, bin_minutes),
+        "distributions": {
+            name: np.round(np.percentile(values, PERCENTILES), 1).tolist() if len(values) else []
+            for name, values in metrics.items()
+        },
+        "percentiles": list(PERCENTILES),
+    }
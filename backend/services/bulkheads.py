@@ -0,0 +1,202 @@
+# backend/services/bulkheads.py
+"""
+Bounded thread pools ("bulkheads") for blocking work called from async routes.
+
+DB, LLM and TTS calls each get their own pool, so a slow Gemini call or a
+pyttsx3 render can only exhaust its own workers and queue, never the event
+loop or the threads serving DB-only requests such as /history. Each pool
+rejects work beyond workers + queue_limit with BulkheadFull and gives up
+waiting after its timeout with BulkheadTimeout; main.py maps these to 503
+and 504. Occupancy, queue wait and rejections are exported by stats().
+
+Pools are sized from the environment, e.g. LLM_POOL_WORKERS,
+LLM_POOL_QUEUE and LLM_POOL_TIMEOUT_SECONDS.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from backend.services import deadlines
+
+# Extra wait past the request deadline so stages can return their fallbacks
+DEADLINE_GRACE_SECONDS = float(os.getenv("DEADLINE_GRACE_SECONDS", "1.0"))
+# Smoothing of the recent queue wait (weight of the newest sample)
+QUEUE_WAIT_ALPHA = 0.2
+
+
+class BulkheadFull(RuntimeError):
+    """Raised when a pool already holds workers + queue_limit tasks"""
+
+    def __init__(self, name: str, capacity: int):
+        super().__init__(f"{name} pool is saturated ({capacity} tasks in flight)")
+        self.name = name
+
+
+class BulkheadTimeout(TimeoutError):
+    """Raised when a task does not finish within the pool's timeout"""
+
+    def __init__(self, name: str, timeout: float):
+        super().__init__(f"{name} task timed out after {timeout:.1f}s")
+        self.name = name
+
+
+class Bulkhead:
+    """A named, bounded thread pool with admission control and metrics"""
+
+    def __init__(self, name: str, workers: int, queue_limit: int, timeout: float):
+        self.name = name
+        self.workers = max(1, workers)
+        self.queue_limit = max(0, queue_limit)
+        self.timeout = timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._active = 0
+        self._peak_in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._wait_recent = 0.0
+
+    @property
+    def capacity(self) -> int:
+        """Tasks that may be running or queued at once"""
+        return self.workers + self.queue_limit
+
+    @property
+    def saturated(self) -> bool:
+        """True when the next task would be rejected"""
+        return self._in_flight >= self.capacity
+
+    def recent_queue_wait(self) -> float:
+        """Exponentially smoothed queue wait of recent tasks, in seconds"""
+        return self._wait_recent
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{self.name}-pool")
+        return self._executor
+
+    async def run(self, func: Callable[..., Any], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """Run a blocking callable on this pool and await its result"""
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self._rejected += 1
+                raise BulkheadFull(self.name, self.capacity)
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+        # The worker thread sees this request's context (its deadline included)
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, self._track, time.perf_counter(), func, *args, **kwargs)
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self._get_executor(), call)
+        except Exception:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+
+        limit = self.timeout if timeout is None else timeout
+        left = deadlines.remaining()
+        if left is not None:
+            limit = min(limit, max(0.0, left) + DEADLINE_GRACE_SECONDS)
+        try:
+            # shield: on timeout the thread keeps its slot until it really finishes
+            return await asyncio.wait_for(asyncio.shield(future), timeout=limit)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timeouts += 1
+            raise BulkheadTimeout(self.name, limit)
+
+    def _track(self, submitted: float, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        waited = time.perf_counter() - submitted
+        with self._lock:
+            self._active += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            self._wait_recent += QUEUE_WAIT_ALPHA * (waited - self._wait_recent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._in_flight -= 1
+                self._completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            started = self._completed + self._active
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "timeout_seconds": self.timeout,
+                "active": self._active,
+                "queued": self._in_flight - self._active,
+                "saturation": round(self._in_flight / self.capacity, 3),
+                "peak_in_flight": self._peak_in_flight,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "timeouts": self._timeouts,
+                "avg_queue_wait_ms": round(self._wait_total / started * 1000, 3) if started else 0.0,
+                "max_queue_wait_ms": round(self._wait_max * 1000, 3),
+                "recent_queue_wait_ms": round(self._wait_recent * 1000, 3),
+            }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _from_env(name: str, workers: int, queue_limit: int, timeout: float) -> Bulkhead:
+    prefix = name.upper()
+    return Bulkhead(
+        name,
+        workers=int(os.getenv(f"{prefix}_POOL_WORKERS", str(workers))),
+        queue_limit=int(os.getenv(f"{prefix}_POOL_QUEUE", str(queue_limit))),
+        timeout=float(os.getenv(f"{prefix}_POOL_TIMEOUT_SECONDS", str(timeout))),
+    )
+
+
+# name -> pool; sqlite work is short, LLM calls are slow, TTS renders are heavy,
+# analytics threads wait on the analytics process pool
+BULKHEADS: Dict[str, Bulkhead] = {
+    "db": _from_env("db", workers=8, queue_limit=64, timeout=10.0),
+    "llm": _from_env("llm", workers=8, queue_limit=32, timeout=60.0),
+    "tts": _from_env("tts", workers=1, queue_limit=4, timeout=30.0),
+    "analytics": _from_env("analytics", workers=2, queue_limit=8, timeout=120.0),
+}
+
+
+async def run_db(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    return await BULKHEADS["db"].run(func, *args, **kwargs)
+
+
+async def run_llm(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    return await BULKHEADS["llm"].run(func, *args, **kwargs)
+
+
+async def run_tts(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    return await BULKHEADS["tts"].run(func, *args, **kwargs)
+
+
+async def run_analytics(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    return await BULKHEADS["analytics"].run(func, *args, **kwargs)
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    return {name: pool.stats() for name, pool in BULKHEADS.items()}
+
+
+def shutdown() -> None:
+    for pool in BULKHEADS.values():
+        pool.shutdown()
@@ -0,0 +1,286 @@
+# backend/services/cgm_alerts.py
+"""
+Predictive CGM alerts.
+
+Every reading is fed to an in-memory sliding window per user (the last
+ALERT_WINDOW_MINUTES). Running sums give the least-squares trend in O(1) per
+reading, from which two alerts are derived:
+
+- predicted_low: the trend line, or the user's damped-Holt forecast
+  (cgm_forecast) when one is passed in, crosses PREDICTED_LOW_MGDL within
+  ALERT_HORIZON_MINUTES;
+- rapid_rise: glucose rising faster than RAPID_RISE_MGDL_PER_MIN.
+
+Readings the quality filter flags stay out of the window, but a flagged one
+below PREDICTED_LOW_MGDL still raises a possible_low alert (observe_flagged):
+a fast drop can be sensor compression or a real hypo, and a missed low is
+the worse mistake. It clears on the first trusted reading back above the
+threshold plus ALERT_HYSTERESIS_MGDL.
+
+Each alert has hysteresis (predicted_low clears once the projection is back
+above the threshold plus ALERT_HYSTERESIS_MGDL, rapid_rise once the rate has
+halved) and is deduplicated: an active alert is never raised again, and a
+cleared one stays quiet for ALERT_COOLDOWN_MINUTES of reading time. Only
+raise/clear transitions are written to cgm_alerts, so steady readings cost no
+database work. A user's window and active alerts are warmed from the
+database the first time this process sees them.
+
+The window and alert state move as soon as a reading is observed, before
+its transaction commits. A caller that rolls back after observe() must call
+forget() so the user's state is warmed again from committed rows; otherwise
+the engine would hold an alert whose row is gone and never raise it again.
+"""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from backend.services import db
+from backend.services.cgm_forecast import ForecastState
+from backend.services.cgm_stats import TRUSTED_READING, epoch_seconds
+
+ALERT_WINDOW_MINUTES = float(os.getenv("ALERT_WINDOW_MINUTES", "30"))
+ALERT_HORIZON_MINUTES = float(os.getenv("ALERT_HORIZON_MINUTES", "20"))
+PREDICTED_LOW_MGDL = float(os.getenv("PREDICTED_LOW_MGDL", "70"))
+RAPID_RISE_MGDL_PER_MIN = float(os.getenv("RAPID_RISE_MGDL_PER_MIN", "2.0"))
+ALERT_HYSTERESIS_MGDL = float(os.getenv("ALERT_HYSTERESIS_MGDL", "10"))
+ALERT_COOLDOWN_MINUTES = float(os.getenv("ALERT_COOLDOWN_MINUTES", "30"))
+ALERT_ENGINE_MAX_USERS = int(os.getenv("ALERT_ENGINE_MAX_USERS", "10000"))
+# A trend needs this many readings spanning at least this many minutes
+MIN_POINTS, MIN_SPAN_MINUTES = 3, 10.0
+# The window's time origin moves forward (and its sums are recomputed) once a day
+_REBASE_MINUTES = 24 * 60.0
+
+
+class TrendWindow:
+    """Readings of the last `minutes`, with running least-squares sums"""
+
+    def __init__(self, minutes: float):
+        self.minutes = minutes
+        self.points: Deque[Tuple[float, float]] = deque()
+        # Times are minutes since `origin` to keep the sums well conditioned
+        self.origin: Optional[float] = None
+        self.n = 0
+        self.st = self.sv = self.stt = self.stv = 0.0
+
+    def add(self, seconds: float, value: float) -> None:
+        if self.origin is None:
+            self.origin = seconds
+        t = (seconds - self.origin) / 60.0
+        self.points.append((t, value))
+        self._update(t, value, 1)
+        while self.points and self.points[0][0] < t - self.minutes:
+            self._update(*self.points.popleft(), -1)
+        if self.points[0][0] > _REBASE_MINUTES:
+            self._rebase()
+
+    def _rebase(self) -> None:
+        """Shift times to start at 0 and recompute the sums, bounding rounding drift"""
+        shift = self.points[0][0]
+        self.origin += shift * 60.0
+        self.points = deque((t - shift, v) for t, v in self.points)
+        self.n = 0
+        self.st = self.sv = self.stt = self.stv = 0.0
+        for t, v in self.points:
+            self._update(t, v, 1)
+
+    def _update(self, t: float, v: float, sign: int) -> None:
+        self.n += sign
+        self.st += sign * t
+        self.sv += sign * v
+        self.stt += sign * t * t
+        self.stv += sign * t * v
+
+    def trend(self) -> Optional[Tuple[float, float]]:
+        """(fitted value at the latest reading, slope in mg/dL per minute), or None if too little data"""
+        if self.n < MIN_POINTS or self.points[-1][0] - self.points[0][0] < MIN_SPAN_MINUTES:
+            return None
+        denominator = self.n * self.stt - self.st * self.st
+        if denominator <= 0:
+            return None
+        slope = (self.n * self.stv - self.st * self.sv) / denominator
+        fitted = self.sv / self.n + slope * (self.points[-1][0] - self.st / self.n)
+        return fitted, slope
+
+
+class _UserState:
+    def __init__(self, minutes: float):
+        self.window = TrendWindow(minutes)
+        # kind -> alert id for active alerts; kind -> epoch seconds of the reading that cleared it
+        self.active: Dict[str, int] = {}
+        self.cleared_at: Dict[str, float] = {}
+
+
+class AlertEngine:
+    """Per-user trend windows and alert state; observe() runs on every reading"""
+
+    def __init__(self, window_minutes: float = ALERT_WINDOW_MINUTES, max_users: int = ALERT_ENGINE_MAX_USERS):
+        self.window_minutes = window_minutes
+        self.max_users = max_users
+        self._users: "OrderedDict[int, _UserState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _state(self, conn: sqlite3.Connection, user_id: int, seconds: float) -> _UserState:
+        state = self._users.get(user_id)
+        if state is not None:
+            self._users.move_to_end(user_id)
+            return state
+        state = _UserState(self.window_minutes)
+        since = datetime.fromtimestamp(seconds - self.window_minutes * 60, timezone.utc).isoformat()
+        until = datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+        for value, ts in conn.execute(
+            f"SELECT glucose_level, timestamp FROM cgm_logs WHERE user_id=? AND timestamp>=? AND timestamp<? "
+            f"AND {TRUSTED_READING} ORDER BY timestamp", (user_id, since, until)
+        ).fetchall():
+            state.window.add(epoch_seconds(ts), float(value))
+        for alert_id, kind in conn.execute(
+            "SELECT id, kind FROM cgm_alerts WHERE user_id=? AND resolved_at IS NULL", (user_id,)
+        ).fetchall():
+            state.active[kind] = alert_id
+        self._users[user_id] = state
+        if len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        return state
+
+    def observe(self, conn: sqlite3.Connection, user_id: int, glucose: float, ts: str,
+                forecast: Optional[ForecastState] = None) -> List[Dict[str, Any]]:
+        """Feed one reading; returns alerts raised by it (writes raise/clear rows on `conn`)"""
+        seconds = epoch_seconds(ts)
+        with self._lock, self._discard_on_error(user_id):
+            state = self._state(conn, user_id, seconds)
+            state.window.add(seconds, glucose)
+            # A trusted reading back above the threshold ends a possible low
+            self._transition(conn, user_id, state, "possible_low", False,
+                             glucose > PREDICTED_LOW_MGDL + ALERT_HYSTERESIS_MGDL, ts, seconds, None)
+            trend = state.window.trend()
+            if trend is None:
+                return []
+            fitted, slope = trend
+            projected = fitted + slope * ALERT_HORIZON_MINUTES
+            # Either model seeing a low coming is enough; both must agree it has passed
+            lowest = projected
+            if forecast is not None and forecast.ready:
+                lowest = min(lowest, forecast.project(ALERT_HORIZON_MINUTES))
+
+            conditions = {
+                "predicted_low": (
+                    lowest < PREDICTED_LOW_MGDL,
+                    lowest > PREDICTED_LOW_MGDL + ALERT_HYSTERESIS_MGDL,
+                ),
+                "rapid_rise": (
+                    slope >= RAPID_RISE_MGDL_PER_MIN,
+                    slope < RAPID_RISE_MGDL_PER_MIN / 2,
+                ),
+            }
+            raised = []
+            for kind, (trigger, clear) in conditions.items():
+                alert = self._transition(
+                    conn, user_id, state, kind, trigger, clear, ts, seconds,
+                    lambda kind=kind: _describe(kind, glucose, slope, lowest if kind == "predicted_low" else projected, fitted),
+                )
+                if alert:
+                    raised.append(alert)
+            return raised
+
+    def observe_flagged(self, conn: sqlite3.Connection, user_id: int, glucose: float, ts: str) -> List[Dict[str, Any]]:
+        """Feed a reading the quality filter flagged: kept out of the trend, but a low is still alerted"""
+        if glucose >= PREDICTED_LOW_MGDL:
+            return []
+        seconds = epoch_seconds(ts)
+        with self._lock, self._discard_on_error(user_id):
+            state = self._state(conn, user_id, seconds)
+            alert = self._transition(
+                conn, user_id, state, "possible_low", True, False, ts, seconds,
+                lambda: _describe("possible_low", glucose, 0.0, glucose, glucose),
+            )
+            return [alert] if alert else []
+
+    @staticmethod
+    def _transition(conn: sqlite3.Connection, user_id: int, state: _UserState, kind: str, trigger: bool,
+                    clear: bool, ts: str, seconds: float,
+                    describe: Optional[Callable[[], Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """Raise or clear one alert kind, with dedup and cooldown; returns the alert if one was raised"""
+        if kind in state.active:
+            if clear:
+                conn.execute("UPDATE cgm_alerts SET resolved_at=? WHERE id=?", (ts, state.active.pop(kind)))
+                state.cleared_at[kind] = seconds
+            return None
+        cooling = kind in state.cleared_at and seconds - state.cleared_at[kind] < ALERT_COOLDOWN_MINUTES * 60
+        if not trigger or cooling:
+            return None
+        alert = describe()
+        cur = conn.execute(
+            "INSERT INTO cgm_alerts(user_id, kind, message, glucose, slope, projected, created_at) "
+            "VALUES(?,?,?,?,?,?,?)",
+            (user_id, kind, alert["message"], alert["glucose"], alert["slope"], alert["projected"], ts),
+        )
+        state.active[kind] = cur.lastrowid
+        return {"id": cur.lastrowid, **alert}
+
+    @contextmanager
+    def _discard_on_error(self, user_id: int) -> Iterator[None]:
+        """A failed write leaves the caller's transaction to roll back, so drop the half-updated state"""
+        try:
+            yield
+        except Exception:
+            self._users.pop(user_id, None)
+            raise
+
+    def forget(self, user_id: int) -> None:
+        """Drop a user's state, e.g. after rolling back readings it observed; it is rebuilt from the database"""
+        with self._lock:
+            self._users.pop(user_id, None)
+
+
+def _describe(kind: str, glucose: float, slope: float, projected: float, fitted: float) -> Dict[str, Any]:
+    if kind == "possible_low":
+        message = (
+            f"⚠️ POSSIBLE LOW: {glucose:.0f} mg/dL after a fast drop. It may be sensor pressure, but if you "
+            "feel shaky, sweaty or confused, treat it as a low now and confirm with a fingerstick."
+        )
+    elif kind == "predicted_low":
+        minutes = (PREDICTED_LOW_MGDL - fitted) / slope if slope < 0 else 0.0
+        message = (
+            f"📉 PREDICTED LOW: glucose may drop below {PREDICTED_LOW_MGDL:.0f} mg/dL in about "
+            f"{max(0, round(minutes))} minutes (now {glucose:.0f}, falling {abs(slope):.1f} mg/dL/min). "
+            "Consider a small carb snack and recheck soon."
+        )
+    else:
+        message = (
+            f"📈 RAPID RISE: glucose is climbing {slope:.1f} mg/dL/min (now {glucose:.0f}, "
+            f"~{projected:.0f} mg/dL in {ALERT_HORIZON_MINUTES:.0f} minutes)."
+        )
+    return {"kind": kind, "message": message, "glucose": glucose, "slope": round(slope, 2), "projected": round(projected, 1)}
+
+
+ENGINE = AlertEngine()
+
+
+def observe(conn: sqlite3.Connection, user_id: int, glucose: float, ts: str,
+            forecast: Optional[ForecastState] = None) -> List[Dict[str, Any]]:
+    """Feed a reading just inserted into cgm_logs to the shared engine"""
+    return ENGINE.observe(conn, user_id, glucose, ts, forecast)
+
+
+def observe_flagged(conn: sqlite3.Connection, user_id: int, glucose: float, ts: str) -> List[Dict[str, Any]]:
+    """Feed a reading the quality filter flagged to the shared engine"""
+    return ENGINE.observe_flagged(conn, user_id, glucose, ts)
+
+
+def forget(user_id: int) -> None:
+    """Drop the shared engine's state for a user whose observed readings were rolled back"""
+    ENGINE.forget(user_id)
+
+
+def get_alerts(user_id: int, active_only: bool = False, limit: int = 50) -> List[Dict[str, Any]]:
+    con = db.get_db(); cur = con.cursor()
+    where = "user_id=? AND resolved_at IS NULL" if active_only else "user_id=?"
+    cur.execute(
+        f"SELECT id, kind, message, glucose, slope, projected, created_at, resolved_at FROM cgm_alerts "
+        f"WHERE {where} ORDER BY created_at DESC, id DESC LIMIT ?", (user_id, limit)
+    )
+    rows = [dict(r) for r in cur.fetchall()]; con.close()
+    return rows
@@ -0,0 +1,145 @@
+# backend/services/cgm_forecast.py
+"""
+Per-user glucose forecaster: damped Holt (double exponential smoothing).
+
+Each user's model is one row of cgm_forecast_state — level, trend (mg/dL per
+minute), time of the last reading, a running residual variance and a reading
+count — updated in O(1) in the same transaction as every trusted reading.
+Readings arrive at irregular intervals, so the per-step smoothing factors
+FORECAST_ALPHA / FORECAST_BETA (defined for a 5-minute step) are rescaled to
+the actual gap, and the trend decays by FORECAST_DAMPING per minute: glucose
+moves do not continue linearly for two hours, and a damped trend levels the
+projection off instead of running away.
+
+project() gives the value any number of minutes past the last reading, with
+an approximate 95% band from the one-step residual variance. After
+FORECAST_RESET_MINUTES without readings the model restarts from the next
+reading. Projections feed the predictive-low alert (cgm_alerts) and the meal
+planner's context.
+"""
+import os
+import sqlite3
+from dataclasses import astuple, dataclass, fields
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional
+
+from backend.services import db
+from backend.services.cgm_stats import epoch_seconds
+
+FORECAST_ALPHA = float(os.getenv("FORECAST_ALPHA", "0.5"))
+FORECAST_BETA = float(os.getenv("FORECAST_BETA", "0.3"))
+FORECAST_DAMPING = float(os.getenv("FORECAST_DAMPING", "0.99"))
+FORECAST_RESET_MINUTES = float(os.getenv("FORECAST_RESET_MINUTES", "60"))
+HORIZONS = (30, 60, 90, 120)
+# Readings before a projection is offered; the smoothing step and sensor range
+MIN_READINGS, STEP_MINUTES = 4, 5.0
+SENSOR_MIN, SENSOR_MAX = 40.0, 400.0
+
+
+@dataclass
+class ForecastState:
+    level: float
+    trend: float
+    last_seconds: float
+    resid_var: float = 0.0
+    n: int = 1
+
+    @property
+    def ready(self) -> bool:
+        return self.n >= MIN_READINGS
+
+    def drift(self, minutes: float) -> float:
+        """Total change the damped trend adds over `minutes`"""
+        if FORECAST_DAMPING >= 1.0:
+            return self.trend * minutes
+        phi = FORECAST_DAMPING
+        return self.trend * phi * (1 - phi ** minutes) / (1 - phi)
+
+    def project(self, minutes: float) -> float:
+        return min(max(self.level + self.drift(minutes), SENSOR_MIN), SENSOR_MAX)
+
+    def band(self, minutes: float) -> float:
+        """Half-width of the approximate 95% interval; one-step errors add up like a random walk"""
+        return 1.96 * (self.resid_var * max(minutes, STEP_MINUTES) / STEP_MINUTES) ** 0.5
+
+
+_COLUMNS = ", ".join(f.name for f in fields(ForecastState))
+
+
+def update(state: Optional[ForecastState], seconds: float, glucose: float) -> ForecastState:
+    """Fold one reading into the model"""
+    if state is None:
+        return ForecastState(glucose, 0.0, seconds)
+    minutes = (seconds - state.last_seconds) / 60.0
+    if minutes <= 0:
+        # Late or duplicate reading: the model has already moved past it
+        return state
+    if minutes > FORECAST_RESET_MINUTES:
+        return ForecastState(glucose, 0.0, seconds, state.resid_var)
+    steps = minutes / STEP_MINUTES
+    alpha = 1 - (1 - FORECAST_ALPHA) ** steps
+    beta = 1 - (1 - FORECAST_BETA) ** steps
+    predicted = state.level + state.drift(minutes)
+    error = glucose - predicted
+    state.level = predicted + alpha * error
+    state.trend = FORECAST_DAMPING ** minutes * state.trend + beta * alpha * error / minutes
+    # Residuals are kept per 5-minute step so bands do not depend on the sensor's interval
+    weight = min(1.0, 0.1 * steps)
+    state.resid_var += weight * (error * error / max(steps, 1.0) - state.resid_var)
+    state.last_seconds = seconds
+    state.n += 1
+    return state
+
+
+def load(conn: sqlite3.Connection, user_id: int) -> Optional[ForecastState]:
+    row = conn.execute(f"SELECT {_COLUMNS} FROM cgm_forecast_state WHERE user_id=?", (user_id,)).fetchone()
+    return ForecastState(*row) if row else None
+
+
+def record_reading(conn: sqlite3.Connection, user_id: int, glucose: float, ts: str) -> ForecastState:
+    """Update the user's model with a trusted reading just inserted into cgm_logs"""
+    state = update(load(conn, user_id), epoch_seconds(ts), float(glucose))
+    conn.execute(
+        f"INSERT OR REPLACE INTO cgm_forecast_state(user_id, {_COLUMNS}) "
+        f"VALUES(?, {', '.join('?' for _ in fields(ForecastState))})",
+        (user_id, *astuple(state)),
+    )
+    return state
+
+
+def projections(state: Optional[ForecastState], horizons: Iterable[int] = HORIZONS,
+                now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    """Projections `horizons` minutes from now, or None if the model is not ready or has gone stale"""
+    if state is None or not state.ready:
+        return None
+    elapsed = ((now or datetime.now(timezone.utc)).timestamp() - state.last_seconds) / 60.0
+    if elapsed > FORECAST_RESET_MINUTES:
+        return None
+    elapsed = max(elapsed, 0.0)
+    points = []
+    for minutes in horizons:
+        value, band = state.project(elapsed + minutes), state.band(elapsed + minutes)
+        points.append({
+            "minutes": minutes,
+            "glucose": round(value, 1),
+            "low": round(max(value - band, SENSOR_MIN), 1),
+            "high": round(min(value + band, SENSOR_MAX), 1),
+        })
+    return {
+        "as_of": datetime.fromtimestamp(state.last_seconds, timezone.utc).isoformat(),
+        "level": round(state.level, 1),
+        "trend_per_min": round(state.trend, 2),
+        "projections": points,
+    }
+
+
+def get_forecast(user_id: int) -> Dict[str, Any]:
+    con = db.get_db()
+    try:
+        forecast = projections(load(con, user_id))
+    finally:
+        con.close()
+    if forecast is None:
+        return {"user_id": user_id, "available": False,
+                "message": f"Needs {MIN_READINGS} recent readings no more than {FORECAST_RESET_MINUTES:.0f} minutes apart"}
+    return {"user_id": user_id, "available": True, **forecast}
@@ -0,0 +1,268 @@
+# backend/services/cgm_index.py
+"""
+Prefix-sum index for CGM statistics over arbitrary time ranges.
+
+cgm_prefix holds one row per user per hour with readings: running totals
+from the user's first hour up to and including that hour of the reading
+count, sum and sum of squares (of glucose - SHIFT, which keeps the variance
+well conditioned) and the range counters, plus that hour's own min and max.
+Totals for any whole-hour span are the difference of two rows, each found
+with one index seek, so "mean between Monday and Thursday" costs the same
+for a day or a year. The partial hours at either end of a range are read
+from cgm_logs directly (at most an hour of readings each), so answers are
+exact to the second.
+
+Min and max come from a sparse table over the hourly extremes (level k holds
+the extreme of 2^k consecutive hours with data), answering any span with two
+lookups. It is kept in memory per user and brought up to date from the rows
+whose version changed since it was built: appending to the newest hour
+recomputes O(log n) entries per level. Only committed rows go into it: a
+connection with uncommitted writes (a pipeline step) scans the hourly
+extremes of the range instead, since a rolled-back version number is handed
+out again and the cache would never see that it changed.
+
+Each trusted reading updates its hour's row in the insert transaction
+(later rows too, for back-filled readings). A user's rows are rebuilt from
+the hourly buckets of cgm_stats the first time they are read on a
+connection of their own; until then range_moments() scans cgm_logs.
+"""
+import math
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.services import cgm_stats, db
+from backend.services.cgm_stats import HIGH, HIGH_LEVEL2, LOW, LOW_LEVEL2, TRUSTED_READING, Moments, epoch_hour
+
+CGM_INDEX_CACHE_USERS = int(os.getenv("CGM_INDEX_CACHE_USERS", "256"))
+# Values are summed as glucose - SHIFT
+SHIFT = 140.0
+TOTALS = ("n", "s", "sq", "below_54", "below_70", "in_range", "above_180", "above_250")
+_TOTALS = ", ".join(TOTALS)
+
+
+def _delta(x: float) -> Tuple:
+    d = x - SHIFT
+    return (1, d, d * d, int(x < LOW_LEVEL2), int(x < LOW), int(LOW <= x <= HIGH), int(x > HIGH), int(x > HIGH_LEVEL2))
+
+
+def _has_rows(conn: sqlite3.Connection, user_id: int) -> bool:
+    return conn.execute("SELECT 1 FROM cgm_prefix WHERE user_id=? LIMIT 1", (user_id,)).fetchone() is not None
+
+
+def _next_version(conn: sqlite3.Connection, user_id: int) -> int:
+    return (conn.execute("SELECT MAX(version) FROM cgm_prefix WHERE user_id=?", (user_id,)).fetchone()[0] or 0) + 1
+
+
+def rebuild(conn: sqlite3.Connection, user_id: int) -> None:
+    """Recompute a user's rows from the cgm_stats hourly buckets"""
+    version = _next_version(conn, user_id)
+    conn.execute("DELETE FROM cgm_prefix WHERE user_id=?", (user_id,))
+    rows = conn.execute(
+        "SELECT hour, n, mean, m2, min, max, below_54, below_70, in_range, above_180, above_250 FROM cgm_hourly "
+        "WHERE user_id=? AND n>0 ORDER BY hour", (user_id,)
+    ).fetchall()
+    if not rows:
+        return
+    table = np.asarray([tuple(r) for r in rows], dtype=np.float64)
+    n, centered = table[:, 1], table[:, 2] - SHIFT
+    hourly = np.column_stack([n, n * centered, table[:, 3] + n * centered * centered, table[:, 6:]])
+    totals = np.cumsum(hourly, axis=0)
+    conn.executemany(
+        f"INSERT INTO cgm_prefix(user_id, hour, {_TOTALS}, hour_min, hour_max, version) "
+        f"VALUES(?, ?, {', '.join('?' for _ in TOTALS)}, ?, ?, ?)",
+        [
+            (user_id, int(row[0]), int(t[0]), float(t[1]), float(t[2]), *(int(c) for c in t[3:]), row[4], row[5], version)
+            for row, t in zip(rows, totals)
+        ],
+    )
+
+
+def record_reading(conn: sqlite3.Connection, user_id: int, glucose: float, ts: str) -> None:
+    """Fold a trusted reading (already recorded by cgm_stats) into the user's prefix rows"""
+    if not _has_rows(conn, user_id):
+        # The hourly buckets already include this reading
+        rebuild(conn, user_id)
+        return
+    hour, x = epoch_hour(ts), float(glucose)
+    delta = _delta(x)
+    version = _next_version(conn, user_id)
+    previous = conn.execute(
+        f"SELECT hour, {_TOTALS} FROM cgm_prefix WHERE user_id=? AND hour<=? ORDER BY hour DESC LIMIT 1", (user_id, hour)
+    ).fetchone()
+    increments = ", ".join(f"{c}={c}+?" for c in TOTALS)
+    if previous is not None and previous[0] == hour:
+        conn.execute(
+            f"UPDATE cgm_prefix SET {increments}, hour_min=MIN(hour_min, ?), hour_max=MAX(hour_max, ?), version=? "
+            f"WHERE user_id=? AND hour=?", (*delta, x, x, version, user_id, hour)
+        )
+    else:
+        base = tuple(previous[1:]) if previous is not None else (0,) * len(TOTALS)
+        conn.execute(
+            f"INSERT INTO cgm_prefix(user_id, hour, {_TOTALS}, hour_min, hour_max, version) "
+            f"VALUES(?, ?, {', '.join('?' for _ in TOTALS)}, ?, ?, ?)",
+            (user_id, hour, *(b + d for b, d in zip(base, delta)), x, x, version),
+        )
+    # Only a back-filled reading has later hours to shift
+    conn.execute(f"UPDATE cgm_prefix SET {increments} WHERE user_id=? AND hour>?", (*delta, user_id, hour))
+
+
+# --- min/max sparse table ------------------------------------------------------
+
+class SparseExtremes:
+    """Range min/max over a user's hours with data in O(1) per query"""
+
+    def __init__(self):
+        self.hours = np.empty(0, dtype=np.int64)
+        self.mins: List[np.ndarray] = [np.empty(0)]
+        self.maxs: List[np.ndarray] = [np.empty(0)]
+        self.version = 0
+
+    def splice(self, hours: np.ndarray, mins: np.ndarray, maxs: np.ndarray) -> None:
+        """Replace everything from hours[0] on and recompute only the entries that depend on it"""
+        keep = int(np.searchsorted(self.hours, hours[0])) if len(hours) else len(self.hours)
+        self.hours = np.concatenate([self.hours[:keep], hours])
+        self.mins[0] = np.concatenate([self.mins[0][:keep], mins])
+        self.maxs[0] = np.concatenate([self.maxs[0][:keep], maxs])
+        size = len(self.hours)
+        levels = max(1, size.bit_length())
+        del self.mins[levels:], self.maxs[levels:]
+        for k in range(1, levels):
+            half = 1 << (k - 1)
+            # Level k entry i covers i .. i + 2^k - 1; those starting before `keep - 2^k + 1` are unchanged
+            start = max(0, keep - (1 << k) + 1)
+            if k < len(self.mins):
+                start = min(start, len(self.mins[k]))
+                head_min, head_max = self.mins[k][:start], self.maxs[k][:start]
+            else:
+                start, head_min, head_max = 0, np.empty(0), np.empty(0)
+                self.mins.append(None); self.maxs.append(None)
+            below, above = self.mins[k - 1], self.maxs[k - 1]
+            self.mins[k] = np.concatenate([head_min, np.minimum(below[start:size - (1 << k) + 1], below[start + half:size - half + 1])])
+            self.maxs[k] = np.concatenate([head_max, np.maximum(above[start:size - (1 << k) + 1], above[start + half:size - half + 1])])
+
+    def query(self, first_hour: int, end_hour: int) -> Tuple[Optional[float], Optional[float]]:
+        """(min, max) over hours first_hour <= h < end_hour, None if none have data"""
+        i = int(np.searchsorted(self.hours, first_hour))
+        j = int(np.searchsorted(self.hours, end_hour))
+        if i >= j:
+            return None, None
+        k = (j - i).bit_length() - 1
+        return (
+            float(min(self.mins[k][i], self.mins[k][j - (1 << k)])),
+            float(max(self.maxs[k][i], self.maxs[k][j - (1 << k)])),
+        )
+
+
+_cache: "OrderedDict[Tuple[str, int], SparseExtremes]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def extremes(conn: sqlite3.Connection, user_id: int) -> SparseExtremes:
+    """The user's sparse table, updated from rows changed since it was last used"""
+    key = (str(db.DB_PATH), user_id)
+    with _cache_lock:
+        table = _cache.pop(key, None) or SparseExtremes()
+        changed = conn.execute(
+            "SELECT MIN(hour), MAX(version) FROM cgm_prefix WHERE user_id=? AND version>?", (user_id, table.version)
+        ).fetchone()
+        if changed[0] is not None:
+            rows = conn.execute(
+                "SELECT hour, hour_min, hour_max FROM cgm_prefix WHERE user_id=? AND hour>=? ORDER BY hour",
+                (user_id, changed[0]),
+            ).fetchall()
+            columns = np.asarray([tuple(r) for r in rows], dtype=np.float64)
+            table.splice(columns[:, 0].astype(np.int64), columns[:, 1], columns[:, 2])
+            table.version = changed[1]
+        _cache[key] = table
+        while len(_cache) > CGM_INDEX_CACHE_USERS:
+            _cache.popitem(last=False)
+        return table
+
+
+def _range_extremes(conn: sqlite3.Connection, user_id: int, first_hour: int,
+                    end_hour: int) -> Tuple[Optional[float], Optional[float]]:
+    """(min, max) over whole hours, from the cache unless `conn` has uncommitted writes"""
+    if not conn.in_transaction:
+        return extremes(conn, user_id).query(first_hour, end_hour)
+    low, high = conn.execute(
+        "SELECT MIN(hour_min), MAX(hour_max) FROM cgm_prefix WHERE user_id=? AND hour>=? AND hour<?",
+        (user_id, first_hour, end_hour),
+    ).fetchone()
+    return (float(low) if low is not None else None, float(high) if high is not None else None)
+
+
+# --- range queries -------------------------------------------------------------
+
+def _iso(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+
+
+def _totals(conn: sqlite3.Connection, user_id: int, hour: int) -> Tuple:
+    """Running totals through `hour` (zeros before the first row)"""
+    row = conn.execute(
+        f"SELECT {_TOTALS} FROM cgm_prefix WHERE user_id=? AND hour<=? ORDER BY hour DESC LIMIT 1", (user_id, hour)
+    ).fetchone()
+    return tuple(row) if row else (0,) * len(TOTALS)
+
+
+def range_moments(conn: sqlite3.Connection, user_id: int, start: float, end: float) -> Moments:
+    """Moments of the trusted readings with start <= t < end (epoch seconds)"""
+    first_hour, end_hour = math.ceil(start / 3600), math.floor(end / 3600)
+    moments = Moments()
+    if not _has_rows(conn, user_id):
+        # Not built yet (ensure() runs on connections the caller commits): read the raw rows
+        edges = [(start, end)]
+    elif first_hour < end_hour:
+        totals = [b - a for a, b in zip(_totals(conn, user_id, first_hour - 1), _totals(conn, user_id, end_hour - 1))]
+        n, s, sq = totals[0], totals[1], totals[2]
+        if n:
+            moments = Moments(
+                n=int(n), mean=SHIFT + s / n, m2=max(0.0, sq - s * s / n),
+                below_54=int(totals[3]), below_70=int(totals[4]), in_range=int(totals[5]),
+                above_180=int(totals[6]), above_250=int(totals[7]),
+            )
+            moments.min, moments.max = _range_extremes(conn, user_id, first_hour, end_hour)
+        edges = [(start, first_hour * 3600), (end_hour * 3600, end)]
+    else:
+        edges = [(start, end)]
+    for lo, hi in edges:
+        if lo >= hi:
+            continue
+        part = Moments()
+        for (value,) in conn.execute(
+            f"SELECT glucose_level FROM cgm_logs WHERE user_id=? AND timestamp>=? AND timestamp<? AND {TRUSTED_READING}",
+            (user_id, _iso(lo), _iso(hi)),
+        ):
+            part.add(float(value))
+        moments.merge(part)
+    return moments
+
+
+def ensure(conn: sqlite3.Connection, user_id: int) -> None:
+    """Build the user's rows (and hourly buckets) if readings predate the index.
+
+    Writes without committing: the caller owns the transaction.
+    """
+    if not _has_rows(conn, user_id):
+        if cgm_stats.revision(user_id, conn) == 0:
+            cgm_stats.rebuild(conn, user_id)
+        rebuild(conn, user_id)
+
+
+def get_range(user_id: int, start: datetime, end: datetime) -> Dict[str, Any]:
+    """Mean, SD, CV, GMI, time in ranges and extremes between two instants"""
+    con = db.get_db()
+    try:
+        with con:
+            ensure(con, user_id)
+        summary = range_moments(con, user_id, start.timestamp(), end.timestamp()).summary()
+    finally:
+        con.close()
+    summary.pop("mage", None)
+    return {"user_id": user_id, "from": start.isoformat(), "to": end.isoformat(), **summary}
@@ -0,0 +1,199 @@
+# backend/services/cgm_quality.py
+"""
+Streaming quality filter for CGM readings.
+
+Every reading is classified before it is written to cgm_logs, from a small
+per-user state row (cgm_quality_state) read and written in the same
+transaction, so the cost is O(1) per reading whatever the history length.
+The flag is stored in cgm_logs.quality:
+
+- ok: plausible; rows from before this filter (quality NULL) count as ok;
+- jump: the rate of change from the last trusted reading exceeds
+  CGM_MAX_RATE_MGDL_PER_MIN. If the next reading agrees with the jumped
+  value (a real level change, e.g. after calibration) it is accepted;
+- compression: a fast drop into the low range, the signature of pressure on
+  the sensor during sleep. Readings stay flagged until glucose recovers to
+  within COMPRESSION_RECOVERY_MGDL of the level before the drop, or for at
+  most COMPRESSION_MAX_MINUTES, after which a persisting low is trusted.
+  A rapid real hypo looks the same, so readings below LOW_LEVEL2 (54 mg/dL)
+  are never flagged, and flagged lows still raise a possible_low alert;
+- warmup: during the first CGM_WARMUP_MINUTES of a sensor session (the first
+  reading after CGM_SESSION_GAP_MINUTES of silence) the jump limit is halved.
+
+Only ok readings reach the statistics (cgm_stats) and the trend of the
+predictive alert engine (cgm_alerts); flagged readings are still stored and
+shown, and flagged lows are alerted on their own (cgm_alerts.observe_flagged).
+
+A gap is recorded in cgm_gaps when a stream that was arriving at most
+CGM_GAP_MINUTES apart goes silent for longer, so hand-entered readings hours
+apart are not reported as dropouts.
+"""
+import os
+import sqlite3
+from dataclasses import astuple, dataclass, fields
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from backend.services import db
+from backend.services.cgm_stats import LOW, LOW_LEVEL2, TRUSTED_READING, epoch_seconds
+
+CGM_MAX_RATE_MGDL_PER_MIN = float(os.getenv("CGM_MAX_RATE_MGDL_PER_MIN", "4"))
+COMPRESSION_DROP_MGDL_PER_MIN = float(os.getenv("COMPRESSION_DROP_MGDL_PER_MIN", "2"))
+COMPRESSION_RECOVERY_MGDL = float(os.getenv("COMPRESSION_RECOVERY_MGDL", "20"))
+COMPRESSION_MAX_MINUTES = float(os.getenv("COMPRESSION_MAX_MINUTES", "60"))
+CGM_WARMUP_MINUTES = float(os.getenv("CGM_WARMUP_MINUTES", "60"))
+CGM_SESSION_GAP_MINUTES = float(os.getenv("CGM_SESSION_GAP_MINUTES", "120"))
+CGM_GAP_MINUTES = float(os.getenv("CGM_GAP_MINUTES", "15"))
+
+FLAGS = ("ok", "jump", "compression", "warmup")
+
+
+@dataclass
+class QualityState:
+    """One user's filter state; the reference is the last trusted reading"""
+    session_start: float
+    last_seconds: float
+    last_interval: Optional[float]
+    ref_seconds: float
+    ref_glucose: float
+    pending_seconds: Optional[float] = None
+    pending_glucose: Optional[float] = None
+    compression_since: Optional[float] = None
+
+    def restart(self, seconds: float, glucose: float) -> None:
+        self.ref_seconds, self.ref_glucose = seconds, glucose
+        self.pending_seconds = self.pending_glucose = self.compression_since = None
+
+
+_COLUMNS = ", ".join(f.name for f in fields(QualityState))
+
+
+def classify(state: Optional[QualityState], seconds: float, glucose: float) -> Tuple[QualityState, str, Optional[float]]:
+    """(new state, flag, gap start in epoch seconds or None) for one reading"""
+    if state is None:
+        return QualityState(seconds, seconds, None, seconds, glucose), "ok", None
+    interval = seconds - state.last_seconds
+    if interval < 0:
+        # Late (back-filled) reading: nothing to compare it with, leave the stream state alone
+        return state, "ok", None
+
+    if interval > CGM_GAP_MINUTES * 60:
+        live = state.last_interval is not None and state.last_interval <= CGM_GAP_MINUTES * 60
+        gap_start = state.last_seconds if live else None
+        if interval >= CGM_SESSION_GAP_MINUTES * 60:
+            state.session_start = seconds
+        state.last_seconds, state.last_interval = seconds, interval
+        # Rates across a gap say nothing; the reading after it becomes the new reference
+        state.restart(seconds, glucose)
+        return state, "ok", gap_start
+    state.last_seconds, state.last_interval = seconds, interval
+
+    if glucose < LOW_LEVEL2:
+        # A clinically significant low is never written off as an artifact
+        state.restart(seconds, glucose)
+        return state, "ok", None
+
+    if state.compression_since is not None:
+        recovered = glucose >= state.ref_glucose - COMPRESSION_RECOVERY_MGDL
+        if not recovered and seconds - state.compression_since <= COMPRESSION_MAX_MINUTES * 60:
+            return state, "compression", None
+        state.restart(seconds, glucose)
+        return state, "ok", None
+
+    warming = seconds - state.session_start < CGM_WARMUP_MINUTES * 60
+    limit = CGM_MAX_RATE_MGDL_PER_MIN / (2 if warming else 1)
+    rate = (glucose - state.ref_glucose) / max((seconds - state.ref_seconds) / 60.0, 1.0)
+    if glucose < LOW and rate <= -COMPRESSION_DROP_MGDL_PER_MIN:
+        state.compression_since = seconds
+        return state, "compression", None
+    if abs(rate) > limit:
+        if state.pending_seconds is not None:
+            agreed = abs(glucose - state.pending_glucose) / max((seconds - state.pending_seconds) / 60.0, 1.0)
+            if agreed <= limit:
+                state.restart(seconds, glucose)
+                return state, "ok", None
+        state.pending_seconds, state.pending_glucose = seconds, glucose
+        return state, "warmup" if warming else "jump", None
+    state.restart(seconds, glucose)
+    return state, "ok", None
+
+
+def _load(conn: sqlite3.Connection, user_id: int, seconds: float) -> Optional[QualityState]:
+    row = conn.execute(f"SELECT {_COLUMNS} FROM cgm_quality_state WHERE user_id=?", (user_id,)).fetchone()
+    if row:
+        return QualityState(*row)
+    # First sight of a user with older readings: continue from their latest trusted one
+    row = conn.execute(
+        f"SELECT glucose_level, timestamp FROM cgm_logs WHERE user_id=? AND timestamp<=? AND {TRUSTED_READING} "
+        f"ORDER BY timestamp DESC, id DESC LIMIT 1",
+        (user_id, datetime.fromtimestamp(seconds, timezone.utc).isoformat()),
+    ).fetchone()
+    if row is None:
+        return None
+    last = epoch_seconds(row[1])
+    return QualityState(last - CGM_WARMUP_MINUTES * 60, last, None, last, float(row[0]))
+
+
+def check(conn: sqlite3.Connection, user_id: int, glucose: float, ts: str) -> Dict[str, Any]:
+    """Classify a reading about to be inserted; updates the state (and cgm_gaps) on `conn`"""
+    seconds = epoch_seconds(ts)
+    state, flag, gap_start = classify(_load(conn, user_id, seconds), seconds, float(glucose))
+    conn.execute(
+        f"INSERT OR REPLACE INTO cgm_quality_state(user_id, {_COLUMNS}) "
+        f"VALUES(?, {', '.join('?' for _ in fields(QualityState))})",
+        (user_id, *astuple(state)),
+    )
+    gap = None
+    if gap_start is not None:
+        gap = {
+            "started_at": datetime.fromtimestamp(gap_start, timezone.utc).isoformat(),
+            "ended_at": ts,
+            "minutes": round((seconds - gap_start) / 60.0, 1),
+        }
+        conn.execute(
+            "INSERT INTO cgm_gaps(user_id, started_at, ended_at, minutes) VALUES(?,?,?,?)",
+            (user_id, gap["started_at"], gap["ended_at"], gap["minutes"]),
+        )
+    return {"quality": flag, "gap": gap}
+
+
+def describe(flag: str) -> Optional[str]:
+    """A short user-facing note for a flagged reading"""
+    notes = {
+        "jump": "🔎 This reading jumped implausibly fast from the last one, so it looks like a sensor glitch.",
+        "compression": (
+            "🔎 This low came on suddenly. That can be pressure on the sensor (e.g. lying on it), "
+            "but treat it as real if you feel low and confirm with a fingerstick."
+        ),
+        "warmup": "🔎 The sensor is still warming up and this reading looks noisy.",
+    }
+    if flag not in notes:
+        return None
+    return notes[flag] + " It is kept in your log but left out of your stats and trend."
+
+
+def get_quality(user_id: int, days: int = 7) -> Dict[str, Any]:
+    """Flag counts and stream gaps over the last `days`"""
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+    con = db.get_db(); cur = con.cursor()
+    cur.execute(
+        "SELECT COALESCE(quality, 'ok'), COUNT(*) FROM cgm_logs WHERE user_id=? AND timestamp>=? GROUP BY 1",
+        (user_id, since),
+    )
+    counts = {flag: 0 for flag in FLAGS}
+    counts.update({flag: n for flag, n in cur.fetchall()})
+    cur.execute(
+        "SELECT started_at, ended_at, minutes FROM cgm_gaps WHERE user_id=? AND ended_at>=? ORDER BY ended_at DESC",
+        (user_id, since),
+    )
+    gaps = [dict(r) for r in cur.fetchall()]; con.close()
+    total = sum(counts.values())
+    return {
+        "user_id": user_id,
+        "days": days,
+        "readings": total,
+        "flags": counts,
+        "trusted_pct": round(100.0 * counts["ok"] / total, 1) if total else None,
+        "gaps": gaps,
+        "gap_minutes": round(sum(g["minutes"] for g in gaps), 1),
+    }
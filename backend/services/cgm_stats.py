@@ -0,0 +1,353 @@
+# backend/services/cgm_stats.py
+"""
+Incremental CGM statistics: time in/below/above range, GMI, CV and MAGE.
+
+Every reading updates, in the same transaction as its cgm_logs insert:
+
+- its hourly bucket in cgm_hourly (Welford update of count/mean/M2, min/max,
+  range counters and MAGE excursions);
+- the per-user window aggregates in cgm_window_stats (24h, 7d, 14d, 90d);
+- the user's row in cgm_stats_state (MAGE turning-point tracker and a
+  revision number that later caches can compare against).
+
+Windows slide by whole hours: buckets that fall out of a window are
+subtracted from its aggregate with the inverse of Chan's parallel merge, so
+reading a user's stats touches four window rows plus any buckets that just
+expired. Min/max are rescanned from the hourly buckets only when an expired
+bucket held the window's extreme.
+
+MAGE counts a turning point once glucose has moved back from the running
+extreme by more than the trailing 24h SD, and keeps swings larger than that
+SD. Readings flagged by the quality filter (cgm_quality) are left out.
+Users with readings but no state (e.g. readings from before this table
+existed) are rebuilt from cgm_logs on first access.
+"""
+import sqlite3
+from dataclasses import astuple, dataclass, fields
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from backend.services import db
+
+# Window name -> length in hours
+WINDOWS: Dict[str, int] = {"24h": 24, "7d": 7 * 24, "14d": 14 * 24, "90d": 90 * 24}
+# Consensus CGM ranges (mg/dL)
+LOW_LEVEL2, LOW, HIGH, HIGH_LEVEL2 = 54.0, 70.0, 180.0, 250.0
+# cgm_logs rows that count: not flagged by the quality filter (backend/services/cgm_quality.py)
+TRUSTED_READING = "(quality IS NULL OR quality = 'ok')"
+
+
+@dataclass
+class Moments:
+    """Mergeable summary of a set of readings"""
+    n: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    min: Optional[float] = None
+    max: Optional[float] = None
+    below_54: int = 0
+    below_70: int = 0
+    in_range: int = 0
+    above_180: int = 0
+    above_250: int = 0
+    exc_n: int = 0
+    exc_sum: float = 0.0
+
+    def add(self, x: float) -> None:
+        """Welford update with one reading"""
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+        self.below_54 += x < LOW_LEVEL2
+        self.below_70 += x < LOW
+        self.in_range += LOW <= x <= HIGH
+        self.above_180 += x > HIGH
+        self.above_250 += x > HIGH_LEVEL2
+
+    def add_excursion(self, amplitude: float) -> None:
+        self.exc_n += 1
+        self.exc_sum += amplitude
+
+    def merge(self, other: "Moments") -> None:
+        """Chan et al. parallel merge of another summary into this one"""
+        if other.n == 0:
+            self.exc_n += other.exc_n
+            self.exc_sum += other.exc_sum
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.mean += delta * other.n / n
+        self.n = n
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._count(other, 1)
+
+    def remove(self, other: "Moments") -> None:
+        """Inverse of merge; min/max are left for the caller to rescan"""
+        n = self.n - other.n
+        if n <= 0:
+            self.n, self.mean, self.m2 = 0, 0.0, 0.0
+        elif other.n:
+            mean = (self.n * self.mean - other.n * other.mean) / n
+            delta = other.mean - mean
+            self.m2 = max(0.0, self.m2 - other.m2 - delta * delta * n * other.n / self.n)
+            self.mean, self.n = mean, n
+        self._count(other, -1)
+
+    def _count(self, other: "Moments", sign: int) -> None:
+        self.below_54 += sign * other.below_54
+        self.below_70 += sign * other.below_70
+        self.in_range += sign * other.in_range
+        self.above_180 += sign * other.above_180
+        self.above_250 += sign * other.above_250
+        self.exc_n += sign * other.exc_n
+        self.exc_sum += sign * other.exc_sum
+
+    @property
+    def sd(self) -> float:
+        return (self.m2 / (self.n - 1)) ** 0.5 if self.n > 1 else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        """Clinical metrics; percentages are shares of readings"""
+        if self.n == 0:
+            return {"readings": 0}
+
+        def pct(count: int) -> float:
+            return round(100.0 * count / self.n, 1)
+
+        return {
+            "readings": self.n,
+            "mean": round(self.mean, 1),
+            "sd": round(self.sd, 1),
+            "cv": round(100.0 * self.sd / self.mean, 1) if self.mean else None,
+            "gmi": round(3.31 + 0.02392 * self.mean, 2),
+            "tir": pct(self.in_range),
+            "tbr": pct(self.below_70),
+            "tbr_level2": pct(self.below_54),
+            "tar": pct(self.above_180),
+            "tar_level2": pct(self.above_250),
+            "min": self.min,
+            "max": self.max,
+            "mage": round(self.exc_sum / self.exc_n, 1) if self.exc_n else None,
+        }
+
+
+STAT_COLUMNS: Tuple[str, ...] = tuple(f.name for f in fields(Moments))
+_SELECT = ", ".join(STAT_COLUMNS)
+_PLACEHOLDERS = ", ".join("?" for _ in STAT_COLUMNS)
+
+
+def epoch_seconds(ts: str) -> float:
+    """Seconds since the epoch for an ISO timestamp (naive timestamps are UTC)"""
+    moment = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def epoch_hour(ts: str) -> int:
+    """Hours since the epoch for an ISO timestamp"""
+    return int(epoch_seconds(ts) // 3600)
+
+
+def _current_hour() -> int:
+    return int(datetime.now(timezone.utc).timestamp() // 3600)
+
+
+class _Ledger:
+    """One user's buckets, windows and tracker, loaded lazily and written back once"""
+
+    def __init__(self, conn: sqlite3.Connection, user_id: int, state: Optional[Tuple]):
+        self.conn = conn
+        self.user_id = user_id
+        self.revision, self.anchor, self.extreme, self.direction = state or (0, None, None, 0)
+        self.buckets: Dict[int, Moments] = {}
+        self.dirty_buckets = set()
+        self.windows: Dict[str, Moments] = {}
+        self.starts: Dict[str, int] = {}
+        for row in conn.execute(
+            f"SELECT span, start_hour, {_SELECT} FROM cgm_window_stats WHERE user_id=?", (user_id,)
+        ):
+            self.windows[row[0]] = Moments(*row[2:])
+            self.starts[row[0]] = row[1]
+        self.dirty_windows = False
+
+    def bucket(self, hour: int) -> Moments:
+        if hour not in self.buckets:
+            row = self.conn.execute(
+                f"SELECT {_SELECT} FROM cgm_hourly WHERE user_id=? AND hour=?", (self.user_id, hour)
+            ).fetchone()
+            self.buckets[hour] = Moments(*row) if row else Moments()
+        return self.buckets[hour]
+
+    def _buckets_between(self, lo: int, hi: int) -> Iterable[Moments]:
+        """Buckets with lo <= hour < hi, preferring the in-memory copies"""
+        stored = {
+            row[0]: Moments(*row[1:])
+            for row in self.conn.execute(
+                f"SELECT hour, {_SELECT} FROM cgm_hourly WHERE user_id=? AND hour>=? AND hour<?",
+                (self.user_id, lo, hi),
+            )
+        }
+        if len(self.buckets) < hi - lo:
+            stored.update((h, m) for h, m in self.buckets.items() if lo <= h < hi)
+        else:
+            stored.update((h, self.buckets[h]) for h in range(lo, hi) if h in self.buckets)
+        return stored.values()
+
+    def advance(self, now_hour: int) -> None:
+        """Slide every window so it ends at now_hour, subtracting expired buckets"""
+        for name, hours in WINDOWS.items():
+            start = now_hour - hours + 1
+            window = self.windows.get(name)
+            if window is None:
+                self.windows[name], self.starts[name] = Moments(), start
+                self.dirty_windows = True
+                continue
+            old_start = self.starts[name]
+            if start <= old_start:
+                continue
+            rescan = False
+            if window.n:
+                for expired in self._buckets_between(old_start, start):
+                    window.remove(expired)
+                    rescan = rescan or (expired.n and (expired.min <= window.min or expired.max >= window.max))
+            self.starts[name] = start
+            self.dirty_windows = True
+            if window.n == 0:
+                self.windows[name] = Moments()
+            elif rescan:
+                window.min = window.max = None
+                for bucket in self._buckets_between(start, now_hour + 1):
+                    if bucket.n:
+                        window.min = bucket.min if window.min is None else min(window.min, bucket.min)
+                        window.max = bucket.max if window.max is None else max(window.max, bucket.max)
+
+    def _excursion(self, x: float, threshold: float) -> Optional[float]:
+        """Feed the MAGE turning-point tracker; returns a confirmed excursion amplitude"""
+        if self.direction == 0:
+            if self.anchor is None:
+                self.anchor = self.extreme = x
+            elif x != self.anchor:
+                self.direction = 1 if x > self.anchor else -1
+                self.extreme = x
+            return None
+        if (x - self.extreme) * self.direction >= 0:
+            self.extreme = x
+            return None
+        if abs(self.extreme - x) <= threshold:
+            return None
+        # Turned back by more than one SD: the running extreme was a peak or nadir
+        amplitude = abs(self.extreme - self.anchor)
+        self.anchor, self.extreme, self.direction = self.extreme, x, -self.direction
+        return amplitude if threshold > 0 and amplitude > threshold else None
+
+    def add(self, x: float, hour: int, now_hour: int) -> None:
+        self.advance(now_hour)
+        amplitude = self._excursion(x, self.windows["24h"].sd)
+        bucket = self.bucket(hour)
+        bucket.add(x)
+        if amplitude is not None:
+            bucket.add_excursion(amplitude)
+        self.dirty_buckets.add(hour)
+        for name, window in self.windows.items():
+            if hour >= self.starts[name]:
+                window.add(x)
+                if amplitude is not None:
+                    window.add_excursion(amplitude)
+        self.dirty_windows = True
+        self.revision += 1
+
+    def save(self) -> None:
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO cgm_hourly(user_id, hour, {_SELECT}) VALUES(?, ?, {_PLACEHOLDERS})",
+            [(self.user_id, hour, *astuple(self.buckets[hour])) for hour in self.dirty_buckets],
+        )
+        self.dirty_buckets.clear()
+        if self.dirty_windows:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO cgm_window_stats(user_id, span, start_hour, {_SELECT}) "
+                f"VALUES(?, ?, ?, {_PLACEHOLDERS})",
+                [(self.user_id, name, self.starts[name], *astuple(m)) for name, m in self.windows.items()],
+            )
+            self.dirty_windows = False
+        self.conn.execute(
+            "INSERT OR REPLACE INTO cgm_stats_state(user_id, revision, anchor, extreme, direction) VALUES(?,?,?,?,?)",
+            (self.user_id, self.revision, self.anchor, self.extreme, self.direction),
+        )
+
+
+def _state(conn: sqlite3.Connection, user_id: int) -> Optional[Tuple]:
+    return conn.execute(
+        "SELECT revision, anchor, extreme, direction FROM cgm_stats_state WHERE user_id=?", (user_id,)
+    ).fetchone()
+
+
+def rebuild(conn: sqlite3.Connection, user_id: int) -> None:
+    """Recompute a user's buckets, windows and tracker from cgm_logs"""
+    previous = _state(conn, user_id)
+    for table in ("cgm_hourly", "cgm_window_stats", "cgm_stats_state"):
+        conn.execute(f"DELETE FROM {table} WHERE user_id=?", (user_id,))
+    ledger = _Ledger(conn, user_id, None)
+    # Keep revisions increasing across rebuilds
+    ledger.revision = previous[0] if previous else 0
+    now_hour = None
+    for reading, ts in conn.execute(
+        f"SELECT glucose_level, timestamp FROM cgm_logs WHERE user_id=? AND {TRUSTED_READING} ORDER BY timestamp, id",
+        (user_id,)
+    ).fetchall():
+        hour = epoch_hour(ts)
+        now_hour = hour if now_hour is None else max(now_hour, hour)
+        ledger.add(float(reading), hour, now_hour)
+    ledger.advance(max(now_hour or 0, _current_hour()))
+    ledger.save()
+
+
+def record_reading(conn: sqlite3.Connection, user_id: int, reading: float, ts: str) -> None:
+    """Fold a reading just inserted into cgm_logs into the user's statistics"""
+    state = _state(conn, user_id)
+    if state is None:
+        # First sight of this user: the rebuild includes the new row
+        rebuild(conn, user_id)
+        return
+    hour = epoch_hour(ts)
+    ledger = _Ledger(conn, user_id, state)
+    ledger.add(float(reading), hour, max(hour, _current_hour()))
+    ledger.save()
+
+
+def revision(user_id: int, conn: Optional[sqlite3.Connection] = None) -> int:
+    """The user's statistics revision; bumps with every recorded reading"""
+    con = conn or db.get_db()
+    try:
+        row = _state(con, user_id)
+        return row[0] if row else 0
+    finally:
+        if conn is None:
+            con.close()
+
+
+def get_stats(user_id: int) -> Dict[str, Any]:
+    """Windowed metrics for a user from the maintained aggregates"""
+    con = db.get_db()
+    try:
+        with con:
+            state = _state(con, user_id)
+            if state is None:
+                rebuild(con, user_id)
+                state = _state(con, user_id)
+            ledger = _Ledger(con, user_id, state)
+            ledger.advance(_current_hour())
+            if ledger.dirty_windows:
+                ledger.save()
+        return {
+            "user_id": user_id,
+            "revision": ledger.revision,
+            "windows": {name: ledger.windows[name].summary() for name in WINDOWS},
+        }
+    finally:
+        con.close()
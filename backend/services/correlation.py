@@ -0,0 +1,259 @@
+# backend/services/correlation.py
+"""
+Mood–glucose–food correlation for one user.
+
+The three logs are aligned on a common grid of CORRELATION_GRID_MINUTES
+cells over the last `days` days:
+
+- glucose: mean of the user's 5-minute resampled series (resample.grid) in
+  each cell, NaN where the grid has no values;
+- mood: the latest mood score, held for up to MOOD_HOLD_HOURS (a mood is a
+  state, not an instant);
+- food: meals, each with a category (the primary_macros label the food agent
+  stores, or the same keyword rules applied to the description).
+
+From the grid, all in NumPy:
+
+- lagged cross-correlation of mood against glucose for lags up to
+  ±CORRELATION_MAX_LAG_HOURS. A positive lag means mood leads glucose, so a
+  negative r at a positive lag reads "lower mood is followed by higher
+  glucose";
+- per food category, the glucose excursion after each meal (peak within
+  POSTPRANDIAL_HOURS minus the pre-meal baseline) and the time to peak.
+
+Results are cached per user and reused until the user's data changes: the
+cache key is the CGM statistics revision plus the newest mood and food log
+ids, and entries also expire when the hour rolls over (the window moves).
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.services import db, resample
+from backend.services.cgm_stats import epoch_seconds
+
+CORRELATION_GRID_MINUTES = int(os.getenv("CORRELATION_GRID_MINUTES", "15"))
+CORRELATION_MAX_LAG_HOURS = float(os.getenv("CORRELATION_MAX_LAG_HOURS", "6"))
+MOOD_HOLD_HOURS = float(os.getenv("MOOD_HOLD_HOURS", "6"))
+POSTPRANDIAL_HOURS = float(os.getenv("POSTPRANDIAL_HOURS", "2"))
+CORRELATION_CACHE_USERS = int(os.getenv("CORRELATION_CACHE_USERS", "1024"))
+# Fewer overlapping grid cells than this and a lag's r is not reported
+MIN_PAIRS = 12
+# Excursions above this (mg/dL) count as spikes
+SPIKE_MGDL = 50.0
+
+# Same keyword rules as FoodIntakeAgent._extract_macros, in the same order
+_CATEGORY_WORDS = (
+    ("protein-rich", ("protein", "meat", "fish", "chicken", "egg", "paneer", "dal", "tofu")),
+    ("carb-rich", ("carbs", "rice", "bread", "pasta", "roti", "poha", "idli", "dosa", "sugar", "sweet")),
+    ("fat-rich", ("fat", "oil", "nuts", "avocado", "fried", "butter", "ghee")),
+)
+
+
+def food_category(description: str, analysis: Optional[str]) -> str:
+    """The stored primary_macros label, else keyword rules on the description"""
+    if analysis:
+        try:
+            label = json.loads(analysis).get("primary_macros")
+            if label:
+                return label
+        except (ValueError, AttributeError):
+            pass
+    text = (description or "").lower()
+    for category, words in _CATEGORY_WORDS:
+        if any(word in text for word in words):
+            return category
+    return "balanced"
+
+
+# --- loading -----------------------------------------------------------------
+
+def _load(con, user_id: int, since: str) -> Dict[str, Any]:
+    seconds, glucose = resample.grid(con, user_id, epoch_seconds(since), datetime.now(timezone.utc).timestamp())
+    present = ~np.isnan(glucose)
+    mood = con.execute(
+        "SELECT CAST(strftime('%s', timestamp) AS INTEGER), score FROM mood_logs "
+        "WHERE user_id=? AND timestamp>=? AND score IS NOT NULL ORDER BY timestamp", (user_id, since)
+    ).fetchall()
+    food = con.execute(
+        "SELECT CAST(strftime('%s', timestamp) AS INTEGER), meal_description, nutrition_analysis FROM food_logs "
+        "WHERE user_id=? AND timestamp>=? ORDER BY timestamp", (user_id, since)
+    ).fetchall()
+
+    def columns(rows, dtype=np.float64):
+        if not rows:
+            return np.empty(0), np.empty(0, dtype=dtype)
+        seconds, values = zip(*rows)
+        return np.asarray(seconds, dtype=np.float64), np.asarray(values, dtype=dtype)
+
+    return {
+        "cgm": (seconds[present], glucose[present]),
+        "mood": columns(mood),
+        "food": columns([(t, food_category(d, a)) for t, d, a in food], dtype=object),
+    }
+
+
+def _token(con, user_id: int) -> Tuple:
+    """Changes whenever a reading, mood or meal is logged for the user"""
+    return tuple(con.execute(
+        "SELECT (SELECT revision FROM cgm_stats_state WHERE user_id=?), "
+        "(SELECT MAX(id) FROM mood_logs WHERE user_id=?), (SELECT MAX(id) FROM food_logs WHERE user_id=?)",
+        (user_id, user_id, user_id),
+    ).fetchone())
+
+
+# --- array kernels -----------------------------------------------------------
+
+def grid_mean(seconds: np.ndarray, values: np.ndarray, start: float, cells: int, step: float) -> np.ndarray:
+    """Mean of the values falling in each grid cell; NaN for empty cells"""
+    index = ((seconds - start) // step).astype(np.int64)
+    keep = (index >= 0) & (index < cells)
+    counts = np.bincount(index[keep], minlength=cells)
+    sums = np.bincount(index[keep], weights=values[keep], minlength=cells)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def hold(series: np.ndarray, cells: int) -> np.ndarray:
+    """Carry each value forward over following NaN cells, for at most `cells` cells"""
+    positions = np.arange(len(series))
+    last = np.maximum.accumulate(np.where(np.isnan(series), -1, positions))
+    held = np.where(last >= 0, series[np.maximum(last, 0)], np.nan)
+    return np.where(positions - last <= cells, held, np.nan)
+
+
+def lagged_correlation(x: np.ndarray, y: np.ndarray, max_lag: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pearson r of x[t] against y[t + lag] for lag in -max_lag..max_lag, over cells where both exist.
+    Returns (lags, r with NaN where pairs < MIN_PAIRS, pairs)."""
+    n = len(x)
+    lags = np.arange(-max_lag, max_lag + 1)
+    if n <= 2 * max_lag:
+        return lags, np.full(len(lags), np.nan), np.zeros(len(lags), dtype=np.int64)
+    # Rows are the cells t = max_lag .. n - max_lag - 1, columns the lags
+    windows = np.lib.stride_tricks.sliding_window_view(y, 2 * max_lag + 1)
+    xs = np.broadcast_to(x[max_lag:n - max_lag, None], windows.shape)
+    both = ~np.isnan(xs) & ~np.isnan(windows)
+    pairs = both.sum(axis=0)
+    xv, yv = np.where(both, xs, 0.0), np.where(both, windows, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mx, my = xv.sum(axis=0) / pairs, yv.sum(axis=0) / pairs
+        cov = (xv * yv).sum(axis=0) / pairs - mx * my
+        vx = (xv * xv).sum(axis=0) / pairs - mx * mx
+        vy = (yv * yv).sum(axis=0) / pairs - my * my
+        r = cov / np.sqrt(vx * vy)
+    return lags, np.where((pairs >= MIN_PAIRS) & (vx > 1e-12) & (vy > 1e-12), r, np.nan), pairs
+
+
+def excursions(glucose: np.ndarray, meal_cells: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(peak minus baseline, cells to peak) after each meal; NaN without readings.
+    The baseline is the mean of the two cells up to and including the meal's."""
+    padded = np.concatenate([np.full(2, np.nan), glucose, np.full(window + 1, np.nan)])
+    meals = meal_cells + 2
+    before = np.stack([padded[meals - 1], padded[meals]])
+    counts = (~np.isnan(before)).sum(axis=0)
+    baseline = np.where(counts > 0, np.where(np.isnan(before), 0.0, before).sum(axis=0) / np.maximum(counts, 1), np.nan)
+    after = np.lib.stride_tricks.sliding_window_view(padded, window)[meals + 1]
+    filled = np.where(np.isnan(after), -np.inf, after)
+    peak_at = filled.argmax(axis=1)
+    peak = filled[np.arange(len(meals)), peak_at]
+    peak = np.where(np.isinf(peak), np.nan, peak)
+    return peak - baseline, (peak_at + 1).astype(np.float64)
+
+
+# --- report ------------------------------------------------------------------
+
+def _round(values: np.ndarray, digits: int) -> List[Optional[float]]:
+    return [None if np.isnan(v) else round(float(v), digits) for v in values]
+
+
+def compute(data: Dict[str, Any], start: float, end: float, grid_minutes: int = CORRELATION_GRID_MINUTES) -> Dict[str, Any]:
+    """Correlation report from loaded column arrays"""
+    step = grid_minutes * 60.0
+    cells = int(np.ceil((end - start) / step))
+    glucose = grid_mean(*data["cgm"], start, cells, step)
+    mood = hold(grid_mean(*data["mood"], start, cells, step), int(MOOD_HOLD_HOURS * 60 / grid_minutes))
+
+    lags, r, pairs = lagged_correlation(mood, glucose, int(CORRELATION_MAX_LAG_HOURS * 60 / grid_minutes))
+    strongest = None
+    if not np.all(np.isnan(r)):
+        best = int(np.nanargmax(np.abs(r)))
+        strongest = {"lag_minutes": int(lags[best] * grid_minutes), "r": round(float(r[best]), 3), "pairs": int(pairs[best])}
+
+    meal_seconds, categories = data["food"]
+    meal_cells = ((meal_seconds - start) // step).astype(np.int64)
+    inside = (meal_cells >= 0) & (meal_cells < cells)
+    rise, to_peak = excursions(glucose, meal_cells[inside], max(1, int(POSTPRANDIAL_HOURS * 60 / grid_minutes)))
+    by_category: Dict[str, Any] = {}
+    for category in sorted(set(categories[inside])):
+        mask = (categories[inside] == category) & ~np.isnan(rise)
+        meals = int((categories[inside] == category).sum())
+        if not mask.any():
+            by_category[category] = {"meals": meals, "meals_with_readings": 0}
+            continue
+        by_category[category] = {
+            "meals": meals,
+            "meals_with_readings": int(mask.sum()),
+            "mean_excursion": round(float(rise[mask].mean()), 1),
+            "median_excursion": round(float(np.median(rise[mask])), 1),
+            "max_excursion": round(float(rise[mask].max()), 1),
+            "spike_rate": round(float((rise[mask] > SPIKE_MGDL).mean()), 2),
+            "mean_minutes_to_peak": round(float(to_peak[mask].mean() * grid_minutes), 0),
+        }
+
+    return {
+        "grid_minutes": grid_minutes,
+        "readings": {"cgm": int(len(data["cgm"][0])), "mood": int(len(data["mood"][0])), "meals": int(inside.sum())},
+        "mood_glucose": {
+            "lags_minutes": (lags * grid_minutes).tolist(),
+            "r": _round(r, 3),
+            "pairs": pairs.tolist(),
+            "strongest": strongest,
+        },
+        "food_categories": by_category,
+    }
+
+
+# --- cache -------------------------------------------------------------------
+
+_cache: "OrderedDict[Tuple[int, int], Tuple[Tuple, int, Dict[str, Any]]]" = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+
+
+def user_correlation(user_id: int, days: int = 30) -> Dict[str, Any]:
+    """Correlation report for the last `days` days, recomputed only after new data"""
+    now = datetime.now(timezone.utc)
+    hour = int(now.timestamp() // 3600)
+    con = db.get_db()
+    try:
+        token = _token(con, user_id)
+        key = (user_id, days)
+        with _cache_lock:
+            entry = _cache.get(key)
+            if entry is not None and entry[0] == token and entry[1] == hour:
+                _cache.move_to_end(key)
+                _cache_stats["hits"] += 1
+                return {**entry[2], "cached": True}
+            _cache_stats["misses"] += 1
+        start = now - timedelta(days=days)
+        data = _load(con, user_id, start.isoformat())
+    finally:
+        con.close()
+
+    report = {"user_id": user_id, "days": days, **compute(data, start.timestamp(), now.timestamp())}
+    with _cache_lock:
+        _cache[key] = (token, hour, report)
+        _cache.move_to_end(key)
+        while len(_cache) > CORRELATION_CACHE_USERS:
+            _cache.popitem(last=False)
+    return {**report, "cached": False}
+
+
+def cache_stats() -> Dict[str, Any]:
+    with _cache_lock:
+        return {**_cache_stats, "entries": len(_cache)}
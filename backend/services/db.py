@@ -1,11 +1,24 @@
+import base64
+import json
 import sqlite3
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Iterable, List, Dict, Any, Optional, Tuple
+
+from backend.services import deadlines
 
 DB_PATH = Path(__file__).resolve().parents[2] / "data" / "healthcare.db"
 
 def ensure_tables():
     ensure_log_tables()
+    ensure_job_tables()
+    ensure_cgm_stats_tables()
+    ensure_cgm_quality_tables()
+    ensure_cgm_forecast_table()
+    ensure_history_indexes()
+    ensure_cgm_alert_table()
+    ensure_postprandial_table()
+    ensure_mood_tables()
+    ensure_nutrition_tables()
     
 def initialize_with_sample_data():
     """Initialize database with sample data if empty"""
@@ -33,14 +46,15 @@ def initialize_with_sample_data():
 
 def get_db() -> sqlite3.Connection:
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    con = sqlite3.connect(DB_PATH)
+    # Lock waits and statements are bounded by the request deadline, if any
+    con = deadlines.guard(sqlite3.connect(DB_PATH, timeout=deadlines.budget(5.0)))
     con.row_factory = sqlite3.Row
     return con
 
 def get_db_connection():
     """Get a database connection that can be used in a context manager"""
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    con = sqlite3.connect(DB_PATH)
+    con = deadlines.guard(sqlite3.connect(DB_PATH, timeout=deadlines.budget(5.0)))
     con.row_factory = sqlite3.Row
     return con
 
@@ -106,41 +120,447 @@ def get_user(user_id: int) -> Dict[str, Any]:
     row = cur.fetchone(); con.close()
     return dict(row) if row else {}
 
-def insert_mood(user_id: int, mood: str, ts: str) -> None:
+def insert_mood(user_id: int, mood: str, ts: str) -> Dict[str, Any]:
+    from backend.services import mood_score, push
+    score = mood_score.score(mood)
     con = get_db(); cur = con.cursor()
-    cur.execute("INSERT INTO mood_logs(user_id, timestamp, mood) VALUES(?,?,?)", (user_id, ts, mood))
+    cur.execute("INSERT INTO mood_logs(user_id, timestamp, mood, score) VALUES(?,?,?,?)", (user_id, ts, mood, score))
+    if score is not None:
+        mood_score.record(con, user_id, score, ts)
+    summary = mood_score.summary(con, user_id)
     con.commit(); con.close()
+    push.publish(user_id, "mood", {"mood": mood, "score": score, "timestamp": ts})
+    return summary
 
 def insert_cgm(user_id: int, reading: float, ts: str) -> None:
+    from backend.services import cgm_alerts, cgm_forecast, cgm_index, cgm_quality, cgm_stats, push
     con = get_db(); cur = con.cursor()
-    cur.execute("INSERT INTO cgm_logs(user_id, glucose_level, timestamp) VALUES(?,?,?)", (user_id, reading, ts))
+    quality = cgm_quality.check(con, user_id, reading, ts)["quality"]
+    cur.execute(
+        "INSERT INTO cgm_logs(user_id, glucose_level, timestamp, quality) VALUES(?,?,?,?)", (user_id, reading, ts, quality)
+    )
+    alerts = []
+    if quality == "ok":
+        cgm_stats.record_reading(con, user_id, reading, ts)
+        cgm_index.record_reading(con, user_id, reading, ts)
+        forecast = cgm_forecast.record_reading(con, user_id, reading, ts)
+        alerts = cgm_alerts.observe(con, user_id, reading, ts, forecast)
+    else:
+        alerts = cgm_alerts.observe_flagged(con, user_id, reading, ts)
     con.commit(); con.close()
+    push.publish_reading(user_id, reading, ts, None, alerts, quality)
 
-def insert_food(user_id: int, description: str, ts: str) -> None:
+def insert_food(user_id: int, description: str, ts: str, nutrition_analysis: Optional[Dict[str, Any]] = None) -> None:
+    from backend.services import nutrition, push
+    macros = nutrition.extract(nutrition_analysis)
     con = get_db(); cur = con.cursor()
-    cur.execute("INSERT INTO food_logs(user_id, meal_description, timestamp) VALUES(?,?,?)", (user_id, description, ts))
+    cur.execute(
+        "INSERT INTO food_logs(user_id, meal_description, nutrition_analysis, timestamp, carbs_g, protein_g, fat_g, calories) "
+        "VALUES(?,?,?,?,?,?,?,?)",
+        (user_id, description, json.dumps(nutrition_analysis) if nutrition_analysis is not None else None, ts,
+         *(macros[c] for c in nutrition.MACROS)),
+    )
+    nutrition.record(con, user_id, macros, ts)
     con.commit(); con.close()
+    push.publish(user_id, "food", {"meal_description": description, "timestamp": ts, **macros})
 
-def get_mood_history(user_id: int, limit: int = 50) -> List[Dict[str, Any]]:
-    con = get_db(); cur = con.cursor()
-    cur.execute("SELECT timestamp, mood FROM mood_logs WHERE user_id=? ORDER BY timestamp DESC LIMIT ?", (user_id, limit))
-    rows = [dict(r) for r in cur.fetchall()]; con.close()
-    return rows
+def encode_cursor(ts: str, row_id: int) -> str:
+    """Opaque keyset cursor for a history row"""
+    return base64.urlsafe_b64encode(json.dumps([ts, row_id]).encode()).decode().rstrip("=")
 
-def get_cgm_history(user_id: int, limit: int = 50) -> List[Dict[str, Any]]:
-    con = get_db(); cur = con.cursor()
-    cur.execute("SELECT timestamp, glucose_level FROM cgm_logs WHERE user_id=? ORDER BY timestamp DESC LIMIT ?", (user_id, limit))
-    rows = [dict(r) for r in cur.fetchall()]; con.close()
-    return rows
+def decode_cursor(token: str, after: bool = False) -> Tuple[str, Optional[int]]:
+    """(timestamp, id) from encode_cursor. A bare ISO timestamp is also accepted and
+    excludes rows at exactly that time, whether paging back or reading `after` it
+    (it has no id then, so `after` it means by timestamp)."""
+    try:
+        ts, row_id = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return str(ts), int(row_id)
+    except (ValueError, TypeError):
+        if token[:4].isdigit() and "-" in token:
+            return token, None if after else 0
+        raise ValueError(f"invalid cursor: {token!r}")
 
-def get_food_history(user_id: int, limit: int = 50) -> List[Dict[str, Any]]:
+def _history(
+    table: str, columns: str, user_id: int, limit: int,
+    before: Optional[Tuple[str, int]] = None, since: Optional[Tuple[str, Optional[int]]] = None
+) -> List[Dict[str, Any]]:
+    """Keyset page on (timestamp, id): newest first, older than `before`; or the rows written
+    after `since`, in id order. Deltas key on id alone so backfilled readings with an
+    earlier timestamp than the cursor are still returned."""
     con = get_db(); cur = con.cursor()
-    cur.execute("SELECT timestamp, meal_description FROM food_logs WHERE user_id=? ORDER BY timestamp DESC LIMIT ?", (user_id, limit))
+    if since is not None and since[1] is None:
+        cur.execute(
+            f"SELECT id, {columns} FROM {table} WHERE user_id=? AND timestamp > ? ORDER BY id LIMIT ?",
+            (user_id, since[0], limit)
+        )
+    elif since is not None:
+        cur.execute(
+            f"SELECT id, {columns} FROM {table} WHERE user_id=? AND id > ? ORDER BY id LIMIT ?",
+            (user_id, since[1], limit)
+        )
+    elif before is not None:
+        cur.execute(
+            f"SELECT id, {columns} FROM {table} WHERE user_id=? AND (timestamp, id) < (?, ?) "
+            f"ORDER BY timestamp DESC, id DESC LIMIT ?", (user_id, *before, limit)
+        )
+    else:
+        cur.execute(
+            f"SELECT id, {columns} FROM {table} WHERE user_id=? ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (user_id, limit)
+        )
     rows = [dict(r) for r in cur.fetchall()]; con.close()
     return rows
 
+def get_mood_history(user_id: int, limit: int = 50, before: Optional[Tuple[str, int]] = None,
+                     since: Optional[Tuple[str, Optional[int]]] = None) -> List[Dict[str, Any]]:
+    return _history("mood_logs", "timestamp, mood", user_id, limit, before, since)
+
+def get_cgm_history(user_id: int, limit: int = 50, before: Optional[Tuple[str, int]] = None,
+                    since: Optional[Tuple[str, Optional[int]]] = None) -> List[Dict[str, Any]]:
+    return _history("cgm_logs", "timestamp, glucose_level, quality", user_id, limit, before, since)
+
+def get_food_history(user_id: int, limit: int = 50, before: Optional[Tuple[str, int]] = None,
+                     since: Optional[Tuple[str, Optional[int]]] = None) -> List[Dict[str, Any]]:
+    return _history("food_logs", "timestamp, meal_description", user_id, limit, before, since)
+
 def get_latest_cgm_for_user(user_id: int):
     con = get_db(); cur = con.cursor()
     cur.execute("SELECT glucose_level FROM cgm_logs WHERE user_id=? ORDER BY timestamp DESC LIMIT 1", (user_id,))
     row = cur.fetchone(); con.close()
     return float(row["glucose_level"]) if row else None
+
+def ensure_job_tables() -> None:
+    con = get_db(); cur = con.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS background_jobs(
+            id TEXT PRIMARY KEY,
+            kind TEXT,
+            user_id INTEGER,
+            status TEXT,
+            result TEXT,
+            error TEXT,
+            created_at TEXT,
+            started_at TEXT,
+            finished_at TEXT
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_background_jobs_finished ON background_jobs(finished_at)")
+    con.commit(); con.close()
+
+def insert_job(job_id: str, kind: str, user_id: int, created_at: str) -> None:
+    con = get_db(); cur = con.cursor()
+    cur.execute(
+        "INSERT INTO background_jobs(id, kind, user_id, status, created_at) VALUES(?,?,?,?,?)",
+        (job_id, kind, user_id, "queued", created_at),
+    )
+    con.commit(); con.close()
+
+def update_job(job_id: str, status: str, ts_column: str, ts: str, result: Optional[str] = None, error: Optional[str] = None) -> None:
+    if ts_column not in ("started_at", "finished_at"):
+        raise ValueError(f"Unknown job timestamp column: {ts_column}")
+    con = get_db(); cur = con.cursor()
+    cur.execute(
+        f"UPDATE background_jobs SET status=?, {ts_column}=?, result=COALESCE(?, result), error=COALESCE(?, error) WHERE id=?",
+        (status, ts, result, error, job_id),
+    )
+    con.commit(); con.close()
+
+def get_job(job_id: str) -> Dict[str, Any]:
+    con = get_db(); cur = con.cursor()
+    cur.execute("SELECT * FROM background_jobs WHERE id=?", (job_id,))
+    row = cur.fetchone(); con.close()
+    return dict(row) if row else {}
+
+def fail_unfinished_jobs(error: str, finished_at: str, job_ids: Optional[List[str]] = None,
+                         idle_before: Optional[str] = None, keep: Iterable[str] = ()) -> int:
+    """Mark queued/running jobs failed: the given ids, or those not started (or queued, if
+    never started) since a cutoff, except the ids in `keep`"""
+    if job_ids is not None:
+        if not job_ids:
+            return 0
+        where, params = f"id IN ({', '.join('?' for _ in job_ids)})", list(job_ids)
+    else:
+        keep = list(keep)
+        where, params = "COALESCE(started_at, created_at) < ?", [idle_before]
+        if keep:
+            where += f" AND id NOT IN ({', '.join('?' for _ in keep)})"
+            params += keep
+    con = get_db(); cur = con.cursor()
+    cur.execute(
+        f"UPDATE background_jobs SET status='failed', error=?, finished_at=? "
+        f"WHERE status IN ('queued', 'running') AND {where}",
+        (error, finished_at, *params),
+    )
+    failed = cur.rowcount
+    con.commit(); con.close()
+    return failed
+
+def delete_finished_jobs(before: str) -> int:
+    con = get_db(); cur = con.cursor()
+    cur.execute("DELETE FROM background_jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (before,))
+    deleted = cur.rowcount
+    con.commit(); con.close()
+    return deleted
+
+def ensure_cgm_stats_tables() -> None:
+    """Aggregates maintained by backend/services/cgm_stats.py and cgm_index.py"""
+    stat_columns = """
+            n INTEGER, mean REAL, m2 REAL, min REAL, max REAL,
+            below_54 INTEGER, below_70 INTEGER, in_range INTEGER, above_180 INTEGER, above_250 INTEGER,
+            exc_n INTEGER, exc_sum REAL"""
+    con = get_db(); cur = con.cursor()
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS cgm_hourly(
+            user_id INTEGER,
+            hour INTEGER,{stat_columns},
+            PRIMARY KEY(user_id, hour)
+        )
+    """)
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS cgm_window_stats(
+            user_id INTEGER,
+            span TEXT,
+            start_hour INTEGER,{stat_columns},
+            PRIMARY KEY(user_id, span)
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS cgm_stats_state(
+            user_id INTEGER PRIMARY KEY,
+            revision INTEGER,
+            anchor REAL,
+            extreme REAL,
+            direction INTEGER
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS cgm_prefix(
+            user_id INTEGER,
+            hour INTEGER,
+            n INTEGER, s REAL, sq REAL,
+            below_54 INTEGER, below_70 INTEGER, in_range INTEGER, above_180 INTEGER, above_250 INTEGER,
+            hour_min REAL,
+            hour_max REAL,
+            version INTEGER,
+            PRIMARY KEY(user_id, hour)
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_cgm_prefix_version ON cgm_prefix(user_id, version)")
+    con.commit(); con.close()
+
+def ensure_cgm_quality_tables() -> None:
+    """Reading quality flag, filter state and stream gaps (backend/services/cgm_quality.py)"""
+    con = get_db(); cur = con.cursor()
+    try:
+        cur.execute("ALTER TABLE cgm_logs ADD COLUMN quality TEXT")
+    except sqlite3.OperationalError:
+        pass  # column already added
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS cgm_quality_state(
+            user_id INTEGER PRIMARY KEY,
+            session_start REAL,
+            last_seconds REAL,
+            last_interval REAL,
+            ref_seconds REAL,
+            ref_glucose REAL,
+            pending_seconds REAL,
+            pending_glucose REAL,
+            compression_since REAL
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS cgm_gaps(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            started_at TEXT,
+            ended_at TEXT,
+            minutes REAL
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_cgm_gaps_user ON cgm_gaps(user_id, ended_at)")
+    con.commit(); con.close()
+
+def ensure_cgm_forecast_table() -> None:
+    """Per-user damped-Holt model state (backend/services/cgm_forecast.py)"""
+    con = get_db(); cur = con.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS cgm_forecast_state(
+            user_id INTEGER PRIMARY KEY,
+            level REAL,
+            trend REAL,
+            last_seconds REAL,
+            resid_var REAL,
+            n INTEGER
+        )
+    """)
+    con.commit(); con.close()
+
+def ensure_cgm_alert_table() -> None:
+    """Raise/clear history of predictive alerts (backend/services/cgm_alerts.py)"""
+    con = get_db(); cur = con.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS cgm_alerts(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            kind TEXT,
+            message TEXT,
+            glucose REAL,
+            slope REAL,
+            projected REAL,
+            created_at TEXT,
+            resolved_at TEXT
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_cgm_alerts_user ON cgm_alerts(user_id, created_at)")
+    con.commit(); con.close()
+
+def ensure_postprandial_table() -> None:
+    """Post-meal glucose response per food log (backend/services/postprandial.py)"""
+    con = get_db(); cur = con.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS postprandial(
+            food_log_id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            meal_at TEXT,
+            baseline REAL,
+            peak REAL,
+            rise REAL,
+            minutes_to_peak REAL,
+            iauc REAL,
+            readings INTEGER,
+            computed_at TEXT
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_postprandial_user ON postprandial(user_id, meal_at)")
+    con.commit(); con.close()
+
+def ensure_mood_tables() -> None:
+    """Mood score column, daily sums and EWMA state (backend/services/mood_score.py)"""
+    from backend.services import mood_score
+    con = get_db(); cur = con.cursor()
+    try:
+        cur.execute("ALTER TABLE mood_logs ADD COLUMN score INTEGER")
+    except sqlite3.OperationalError:
+        pass  # column already added
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS mood_daily(
+            user_id INTEGER,
+            day INTEGER,
+            n INTEGER,
+            total INTEGER,
+            PRIMARY KEY(user_id, day)
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS mood_state(
+            user_id INTEGER PRIMARY KEY,
+            weighted REAL,
+            weight REAL,
+            last_seconds REAL
+        )
+    """)
+    try:
+        rebuilt = mood_score.backfill(con)
+        if rebuilt:
+            print(f"✅ Mood scores backfilled for {rebuilt} users")
+    except sqlite3.OperationalError as e:
+        # Tables created by ensure_log_tables alone have no timestamp column
+        print(f"⚠️ mood backfill skipped: {e}")
+    con.commit(); con.close()
+
+def ensure_nutrition_tables() -> None:
+    """Numeric macro columns on food_logs and daily rollups (backend/services/nutrition.py)"""
+    from backend.services import nutrition
+    con = get_db(); cur = con.cursor()
+    added = False
+    for column in nutrition.MACROS:
+        try:
+            cur.execute(f"ALTER TABLE food_logs ADD COLUMN {column} REAL")
+            added = True
+        except sqlite3.OperationalError:
+            pass  # column already added
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS nutrition_daily(
+            user_id INTEGER,
+            day INTEGER,
+            meals INTEGER,
+            carbs_g REAL,
+            protein_g REAL,
+            fat_g REAL,
+            calories REAL,
+            unmeasured INTEGER,
+            carbs_g_missing INTEGER DEFAULT 0,
+            protein_g_missing INTEGER DEFAULT 0,
+            fat_g_missing INTEGER DEFAULT 0,
+            calories_missing INTEGER DEFAULT 0,
+            PRIMARY KEY(user_id, day)
+        )
+    """)
+    stale = False
+    for column in nutrition.MISSING:
+        try:
+            cur.execute(f"ALTER TABLE nutrition_daily ADD COLUMN {column} INTEGER DEFAULT 0")
+            stale = True  # rollups written before the per-macro counts
+        except sqlite3.OperationalError:
+            pass  # column already added
+    try:
+        rebuilt = nutrition.backfill(con, parse_blobs=added, rebuild_all=stale)
+        if rebuilt:
+            print(f"✅ Nutrition rollups built for {rebuilt} users")
+    except sqlite3.OperationalError as e:
+        # Tables created by ensure_log_tables alone have no timestamp or analysis column
+        print(f"⚠️ nutrition backfill skipped: {e}")
+    con.commit(); con.close()
+
+def ensure_history_indexes() -> None:
+    """Per-user (timestamp, id) indexes behind history keyset pages and analytics range scans,
+    and per-user id indexes behind `since` deltas"""
+    con = get_db(); cur = con.cursor()
+    for table in ("cgm_logs", "mood_logs", "food_logs"):
+        try:
+            cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_user_id ON {table}(user_id)")
+            # id is the rowid, so (user_id, timestamp) also orders ties by id
+            cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_user_ts ON {table}(user_id, timestamp)")
+        except sqlite3.OperationalError as e:
+            # Tables created by ensure_log_tables alone have no timestamp column
+            print(f"⚠️ {table} index skipped: {e}")
+    con.commit(); con.close()
+
+def ensure_session_table() -> None:
+    con = get_db(); cur = con.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS chat_sessions(
+            key TEXT PRIMARY KEY,
+            state TEXT,
+            updated_at REAL
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated ON chat_sessions(updated_at)")
+    con.commit(); con.close()
+
+def get_session(key: str) -> Dict[str, Any]:
+    con = get_db(); cur = con.cursor()
+    cur.execute("SELECT state, updated_at FROM chat_sessions WHERE key=?", (key,))
+    row = cur.fetchone(); con.close()
+    return dict(row) if row else {}
+
+def upsert_session(key: str, state: str, updated_at: float) -> None:
+    con = get_db(); cur = con.cursor()
+    cur.execute(
+        "INSERT INTO chat_sessions(key, state, updated_at) VALUES(?,?,?) "
+        "ON CONFLICT(key) DO UPDATE SET state=excluded.state, updated_at=excluded.updated_at",
+        (key, state, updated_at),
+    )
+    con.commit(); con.close()
+
+def delete_session(key: str) -> None:
+    con = get_db(); cur = con.cursor()
+    cur.execute("DELETE FROM chat_sessions WHERE key=?", (key,))
+    con.commit(); con.close()
+
+def delete_sessions_before(updated_at: float) -> int:
+    con = get_db(); cur = con.cursor()
+    cur.execute("DELETE FROM chat_sessions WHERE updated_at < ?", (updated_at,))
+    deleted = cur.rowcount
+    con.commit(); con.close()
+    return deleted
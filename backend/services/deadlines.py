@@ -0,0 +1,106 @@
+# backend/services/deadlines.py
+"""
+Request deadlines carried through context variables.
+
+An endpoint opens `with deadline(ENDPOINT_DEADLINES["chat"]):` and every
+stage below it - orchestrator, agents, DB connections, LLM calls - asks for
+its remaining budget instead of using its own fixed timeout. The bulkhead
+pools copy the context into their worker threads, so the deadline follows the
+request across `run_in_executor`.
+
+When the budget runs out, LLM calls raise DeadlineExceeded (agents already
+catch LLM failures and serve their fallback responses) and SQLite statements
+are interrupted. Load shedding (backend/services/admission.py) uses
+`without_llm()` to give a request a zero LLM budget, so it is served the same
+fallbacks straight away.
+"""
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+# Overall budget per endpoint, in seconds
+ENDPOINT_DEADLINES: Dict[str, float] = {
+    "chat": float(os.getenv("DEADLINE_CHAT_SECONDS", "20")),
+    "mealplan": float(os.getenv("DEADLINE_MEALPLAN_SECONDS", "25")),
+    "food": float(os.getenv("DEADLINE_FOOD_SECONDS", "15")),
+    "mood": float(os.getenv("DEADLINE_MOOD_SECONDS", "10")),
+    "interrupt": float(os.getenv("DEADLINE_INTERRUPT_SECONDS", "15")),
+}
+# An LLM call is not started with less budget than this; the caller falls back instead
+LLM_MIN_BUDGET_SECONDS = float(os.getenv("LLM_MIN_BUDGET_SECONDS", "1.0"))
+
+# Absolute time.monotonic() deadline of the current request, if any
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+# Set for requests that were admitted in degraded mode
+_llm_disabled: ContextVar[bool] = ContextVar("llm_disabled", default=False)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a stage has no time budget left"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded before {stage}")
+        self.stage = stage
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[float]:
+    """Run the block under a deadline; nested deadlines can only tighten it"""
+    target = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        target = min(target, current)
+    token = _deadline.set(target)
+    try:
+        yield target
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left for the current request, or None without a deadline"""
+    target = _deadline.get()
+    return None if target is None else target - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check(stage: str) -> None:
+    """Raise DeadlineExceeded if the request has no budget left"""
+    if expired():
+        raise DeadlineExceeded(stage)
+
+
+def budget(default: float) -> float:
+    """A stage's timeout: its own default, capped by the remaining request budget"""
+    left = remaining()
+    return default if left is None else max(0.0, min(default, left))
+
+
+def llm_budget(default: float) -> float:
+    """Timeout for an LLM call: like budget(), but zero for degraded requests"""
+    return 0.0 if _llm_disabled.get() else budget(default)
+
+
+@contextmanager
+def without_llm() -> Iterator[None]:
+    """Run the block with no LLM budget, so agents serve their fallbacks"""
+    token = _llm_disabled.set(True)
+    try:
+        yield
+    finally:
+        _llm_disabled.reset(token)
+
+
+def guard(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """Interrupt statements on `conn` once the current request's deadline passes"""
+    target = _deadline.get()
+    if target is not None:
+        conn.set_progress_handler(lambda: int(time.monotonic() > target), 10000)
+    return conn
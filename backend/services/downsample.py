@@ -0,0 +1,177 @@
+# backend/services/downsample.py
+"""
+Chart-sized CGM series for arbitrary time ranges.
+
+GET /history/cgm/series/{user_id} returns at most `max_points` points for
+[from, to), whatever the range:
+
+- lttb: Largest-Triangle-Three-Buckets picks the raw readings that best keep
+  the visual shape of the line (peaks, troughs, slopes);
+- minmax: one row per time bucket with min, max, mean and count, for band
+  charts that must never hide a low or a high.
+
+Ranges that already fit are returned as raw readings. Only trusted readings
+are used, so raw and hourly series (cgm_hourly leaves flagged readings out)
+agree. When a bucket spans an
+hour or more, the series is built from cgm_hourly (maintained per reading by
+cgm_stats) instead of cgm_logs: minmax buckets are snapped to whole hours so
+their min/max/mean are exact merges of the hourly rows, and lttb runs over
+the hourly means. Users whose rollups have not been built yet fall back to
+raw readings.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from backend.services import db
+from backend.services.cgm_stats import TRUSTED_READING
+
+METHODS = ("lttb", "minmax")
+
+
+# --- array kernels -----------------------------------------------------------
+
+def lttb(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the `n` points Largest-Triangle-Three-Buckets keeps (x ascending)"""
+    size = len(x)
+    if n >= size:
+        return np.arange(size)
+    if n < 3:
+        raise ValueError("LTTB keeps at least 3 points")
+    # Buckets over the points between the fixed first and last
+    edges = np.floor(np.linspace(1, size - 1, n - 1)).astype(np.int64)
+    keep = np.empty(n, dtype=np.int64)
+    keep[0], keep[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # The next bucket's centroid (the last point for the final bucket)
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else size
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def merge_buckets(
+    x: np.ndarray, counts: np.ndarray, lows: np.ndarray, highs: np.ndarray, sums: np.ndarray,
+    start: float, width: float
+) -> Tuple[np.ndarray, ...]:
+    """Merge per-point (count, min, max, sum) rows (x ascending) into `width`-second buckets from `start`;
+    returns (bucket start, count, min, max, mean) for the non-empty buckets"""
+    if len(x) == 0:
+        return tuple(np.empty(0) for _ in range(5))
+    index = ((x - start) // width).astype(np.int64)
+    # x is ascending, so each bucket is a contiguous run
+    firsts = np.flatnonzero(np.diff(index, prepend=index[0] - 1))
+    total = np.add.reduceat(counts, firsts)
+    return (
+        start + index[firsts] * width,
+        total,
+        np.minimum.reduceat(lows, firsts),
+        np.maximum.reduceat(highs, firsts),
+        np.add.reduceat(sums, firsts) / total,
+    )
+
+
+def minmax(x: np.ndarray, y: np.ndarray, start: float, width: float) -> Tuple[np.ndarray, ...]:
+    """(bucket start, count, min, max, mean) of raw readings in `width`-second buckets"""
+    return merge_buckets(x, np.ones(len(x)), y, y, y, start, width)
+
+
+# --- loading -----------------------------------------------------------------
+
+def _iso(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+
+
+def _raw(con, user_id: int, start: float, end: float) -> Tuple[np.ndarray, np.ndarray]:
+    rows = con.execute(
+        "SELECT CAST(strftime('%s', timestamp) AS INTEGER), glucose_level FROM cgm_logs "
+        f"WHERE user_id=? AND timestamp>=? AND timestamp<? AND {TRUSTED_READING} ORDER BY timestamp",
+        (user_id, _iso(start), _iso(end)),
+    ).fetchall()
+    if not rows:
+        return np.empty(0), np.empty(0)
+    seconds, glucose = zip(*rows)
+    return np.asarray(seconds, dtype=np.float64), np.asarray(glucose, dtype=np.float64)
+
+
+def _hourly(con, user_id: int, start: float, end: float) -> Tuple[np.ndarray, ...]:
+    """(hour start seconds, count, min, max, mean) of the user's non-empty hourly rollups"""
+    rows = con.execute(
+        "SELECT hour, n, min, max, mean FROM cgm_hourly WHERE user_id=? AND hour>=? AND hour<? AND n>0 ORDER BY hour",
+        (user_id, int(start // 3600), int(np.ceil(end / 3600))),
+    ).fetchall()
+    if not rows:
+        return tuple(np.empty(0) for _ in range(5))
+    hours, counts, lows, highs, means = (np.asarray(column, dtype=np.float64) for column in zip(*rows))
+    return hours * 3600, counts, lows, highs, means
+
+
+def _has_rollups(con, user_id: int) -> bool:
+    return con.execute("SELECT 1 FROM cgm_stats_state WHERE user_id=?", (user_id,)).fetchone() is not None
+
+
+# --- series ------------------------------------------------------------------
+
+def _points(seconds: np.ndarray, glucose: np.ndarray) -> List[Dict[str, Any]]:
+    return [{"timestamp": _iso(t), "glucose_level": round(float(v), 1)} for t, v in zip(seconds, glucose)]
+
+
+def _bands(starts, counts, lows, highs, means) -> List[Dict[str, Any]]:
+    return [
+        {"timestamp": _iso(t), "readings": int(c), "min": float(lo), "max": float(hi), "mean": round(float(m), 1)}
+        for t, c, lo, hi, m in zip(starts, counts, lows, highs, means)
+    ]
+
+
+def cgm_series(user_id: int, start: datetime, end: datetime, max_points: int = 500, method: str = "lttb") -> Dict[str, Any]:
+    """Downsampled CGM readings in [start, end) with at most max_points points"""
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
+    lo, hi = start.timestamp(), end.timestamp()
+    result: Dict[str, Any] = {
+        "user_id": user_id, "from": _iso(lo), "to": _iso(hi), "method": method, "max_points": max_points,
+    }
+    if hi <= lo:
+        return {**result, "source": "raw", "readings": 0, "points": []}
+
+    width = (hi - lo) / max_points
+    con = db.get_db()
+    try:
+        hourly = width >= 3600 and _has_rollups(con, user_id)
+        if hourly:
+            hours, counts, lows, highs, means = _hourly(con, user_id, lo, hi)
+            readings = int(counts.sum())
+        else:
+            seconds, glucose = _raw(con, user_id, lo, hi)
+            readings = len(seconds)
+    finally:
+        con.close()
+
+    if hourly:
+        result.update(source="hourly", readings=readings)
+        if method == "minmax":
+            # Whole-hour buckets are exact merges of the hourly rows
+            origin, until = np.floor(lo / 3600) * 3600, np.ceil(hi / 3600) * 3600
+            span = float(np.ceil((until - origin) / max_points / 3600) * 3600)
+            buckets = merge_buckets(hours, counts, lows, highs, means * counts, origin, span)
+            return {**result, "bucket_seconds": int(span), "points": _bands(*buckets)}
+        # LTTB over hourly means, placed mid-hour
+        centers = hours + 1800
+        keep = lttb(centers, means, max_points)
+        return {**result, "points": _points(centers[keep], means[keep])}
+
+    result.update(source="raw", readings=readings)
+    if readings <= max_points:
+        if method == "minmax":
+            return {**result, "bucket_seconds": 0, "points": _bands(seconds, np.ones(readings), glucose, glucose, glucose)}
+        return {**result, "points": _points(seconds, glucose)}
+    if method == "minmax":
+        span = float(np.ceil(width))
+        return {**result, "bucket_seconds": int(span), "points": _bands(*minmax(seconds, glucose, lo, span))}
+    keep = lttb(seconds, glucose, max_points)
+    return {**result, "points": _points(seconds[keep], glucose[keep])}
@@ -0,0 +1,90 @@
+# backend/services/emergency.py
+"""
+Emergency fast lane.
+
+`triage` runs at the very front of /chat and /interrupt, on the event loop,
+before user validation, admission control or any pool: it classifies the
+message with the in-memory intent engine and, for an emergency, returns the
+fixed emergency guidance straight away. It never touches the database or
+the LLM, so an emergency reply cannot queue behind LLM traffic.
+
+Fast-lane latency is recorded apart from the flow engine's step timings and
+exported by stats() (GET /metrics/emergency).
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from backend.services.intents import Intent, classify
+
+# Recent fast-lane latencies kept for percentiles
+LATENCY_WINDOW = 1024
+
+
+def is_emergency(intent: Intent) -> bool:
+    """Messages the interrupt agent answers with emergency guidance"""
+    return intent.kind in ("emergency", "general") and intent.query_type == "emergency"
+
+
+def response(query: str) -> Dict[str, Any]:
+    """The fixed emergency reply; no profile lookup and no LLM"""
+    return {
+        "success": True,
+        "message": f"🚨 EMERGENCY DETECTED: {query}\n\n⚠️ IMMEDIATE ACTION REQUIRED:\n• Call emergency services (911) immediately\n• Do not delay seeking medical attention\n• Stay calm and follow emergency protocols\n\nThis is a serious situation requiring immediate professional medical care.",
+        "query_type": "emergency",
+        "priority": "critical",
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
+
+class LaneStats:
+    """Check/hit counters and a window of recent hit latencies"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._checks = 0
+        self._hits = 0
+        self._max = 0.0
+
+    def record(self, seconds: float, hit: bool) -> None:
+        with self._lock:
+            self._checks += 1
+            if hit:
+                self._hits += 1
+                self._latencies.append(seconds)
+                self._max = max(self._max, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            recent = sorted(self._latencies)
+            checks, hits, worst = self._checks, self._hits, self._max
+
+        def pick(q: float) -> float:
+            return round(recent[min(len(recent) - 1, int(q * len(recent)))] * 1e6, 1) if recent else 0.0
+
+        return {
+            "checks": checks,
+            "emergencies": hits,
+            "p50_us": pick(0.50),
+            "p99_us": pick(0.99),
+            "max_us": round(worst * 1e6, 1),
+        }
+
+
+_stats = LaneStats()
+
+
+def triage(text: str) -> Optional[Dict[str, Any]]:
+    """The emergency reply for `text`, or None when it is not an emergency"""
+    started = time.perf_counter()
+    query = (text or "").strip()
+    reply = response(query.lower()) if query and is_emergency(classify(query.lower())) else None
+    _stats.record(time.perf_counter() - started, reply is not None)
+    return reply
+
+
+def stats() -> Dict[str, Any]:
+    return _stats.snapshot()
@@ -0,0 +1,203 @@
+# backend/services/intents.py
+"""
+Single-pass intent classification for chat messages.
+
+Every keyword list used for routing (tracking commands, emergency words,
+health topics, question words) is compiled into one word-level trie. A
+message is tokenized once and walked once against the trie, so matches
+respect word boundaries ("plan" never matches "planet") and multi-word
+phrases ("meal plan", "chest pain") win over their single-word prefixes.
+`classify` returns a structured Intent with the route, the command
+argument, any glucose number and the keyword groups that were seen.
+"""
+import re
+import string
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from backend.services import mood_lexicon
+
+# Keyword groups; a phrase may belong to several groups.
+KEYWORD_GROUPS: Dict[str, Tuple[str, ...]] = {
+    # Safety-critical phrases, routed ahead of any tracking command
+    "emergency": (
+        "emergency", "urgent", "911", "ambulance", "chest pain", "heart attack",
+        "stroke", "bleeding", "unconscious", "severe pain", "difficulty breathing", "choking",
+    ),
+    "help": ("help",),
+    "support": ("support", "assist"),
+    "health": (
+        "diabetes", "glucose", "insulin", "blood sugar", "medication", "doctor",
+        "symptoms", "side effects", "dosage", "prescription", "medical",
+    ),
+    # Tracking routes
+    "mood": ("mood", "moods"),
+    "cgm": ("cgm", "glucose", "blood sugar"),
+    "food": ("food", "ate", "eat", "eats", "eating", "meal", "meals", "snack", "snacks"),
+    "plan": ("plan", "meal plan", "diet plan"),
+    # Other tracking vocabulary that keeps a message out of general Q&A
+    "tracking": ("blood", "sugar"),
+    # Routing-suggestion topics
+    "feeling": ("feeling", "feel"),
+    "diet": ("diet",),
+    "question": ("how", "what", "why", "when", "where"),
+}
+
+# Route precedence when a message mentions several tracking topics
+ROUTES: Tuple[str, ...] = ("mood", "cgm", "food", "plan")
+COMMAND_PREFIXES: Tuple[str, ...] = ("mood", "cgm", "food")
+# Routes whose agents call the LLM; CGM, greeting and emergency replies only use the database, and
+# mood only for text its lexicon cannot place (see _uses_llm)
+LLM_ROUTES: FrozenSet[str] = frozenset(("food", "plan", "general"))
+
+
+# ASCII punctuation becomes whitespace, so one C-level translate + split yields
+# the word sequence (UTF-8 continuation bytes are never punctuation).
+_SEPARATORS = bytes.maketrans(string.punctuation.encode(), b" " * len(string.punctuation))
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+# Separators between commands in one message ("mood: happy, cgm: 132; ate poha")
+_COMMAND_BREAKS = re.compile(r"[,;\n]+")
+
+
+def _build(groups: Dict[str, Iterable[str]]) -> Dict[str, List[Tuple[Tuple[str, ...], FrozenSet[str]]]]:
+    """Compile keyword groups into a word-level trie: first word -> phrases, longest first"""
+    labels: Dict[Tuple[str, ...], set] = {}
+    for group, phrases in groups.items():
+        for phrase in phrases:
+            labels.setdefault(tuple(phrase.lower().split()), set()).add(group)
+    trie: Dict[str, List[Tuple[Tuple[str, ...], FrozenSet[str]]]] = {}
+    for words in sorted(labels, key=len, reverse=True):
+        trie.setdefault(words[0], []).append((words, frozenset(labels[words])))
+    return trie
+
+
+_TRIE = _build(KEYWORD_GROUPS)
+# Words that may start a multi-word phrase need the positional walk; messages
+# without them resolve with one set intersection.
+_PHRASE_STARTS = frozenset(w for w, entries in _TRIE.items() if len(entries[0][0]) > 1)
+_SINGLE_WORDS = {w: entries[-1][1] for w, entries in _TRIE.items() if len(entries[-1][0]) == 1}
+
+
+class Intent(NamedTuple):
+    """Structured result of classifying one chat message"""
+    kind: str                       # mood | cgm | food | plan | emergency | general
+    text: str
+    argument: str                   # text after the first ":" (or the whole message)
+    reading: Optional[float]        # first number in the argument, for CGM
+    labels: FrozenSet[str]          # keyword groups seen anywhere in the message
+    command: Optional[str] = None   # explicit "mood:" / "cgm:" / "food:" prefix
+
+    @property
+    def emergency(self) -> bool:
+        return "emergency" in self.labels
+
+    @property
+    def is_general(self) -> bool:
+        """True when the message belongs to general Q&A rather than tracking"""
+        return self.kind == "general"
+
+    @property
+    def query_type(self) -> str:
+        """Coarse question category used by the interrupt agent"""
+        if self.emergency or "help" in self.labels:
+            return "emergency"
+        if "health" in self.labels:
+            return "health_question"
+        if "question" in self.labels:
+            return "information_request"
+        if "support" in self.labels:
+            return "help_request"
+        return "general_query"
+
+
+def classify(text: str) -> Intent:
+    """Classify a chat message in a single pass over its words"""
+    text = text or ""
+    words = text.lower().encode().translate(_SEPARATORS).decode().split()
+    n = len(words)
+    labels = set()
+
+    hits = _TRIE.keys() & words
+    if hits & _PHRASE_STARTS:
+        i = 0
+        while i < n:
+            step = 1
+            for phrase, groups in _TRIE.get(words[i], ()):
+                size = len(phrase)
+                if size == 1 or tuple(words[i:i + size]) == phrase:
+                    labels.update(groups)
+                    step = size
+                    break
+            i += step
+    else:
+        for word in hits:
+            labels.update(_SINGLE_WORDS[word])
+
+    colon_at = text.find(":")
+    argument = text[colon_at + 1:].strip() if colon_at >= 0 else text
+
+    # An explicit "mood:" / "cgm:" / "food:" prefix names the route outright
+    command = None
+    if colon_at >= 0 and n and words[0] in COMMAND_PREFIXES and text[:colon_at].strip().lower() == words[0]:
+        command = words[0]
+        labels.add(command)
+
+    # Glucose number: first number in the argument that is not itself a keyword ("911")
+    reading = None
+    match = _NUMBER.search(text, colon_at + 1)
+    while match is not None:
+        if match.group() not in _TRIE:
+            reading = float(match.group())
+            break
+        match = _NUMBER.search(text, match.end())
+
+    if "emergency" in labels:
+        kind = "emergency"
+    elif command:
+        kind = command
+    else:
+        kind = next((route for route in ROUTES if route in labels), "general")
+
+    return Intent(kind, text, argument, reading, frozenset(labels), command)
+
+
+def split_commands(text: str) -> List[Intent]:
+    """
+    Split a message into one Intent per mood/CGM/food command.
+
+    Segments that start no new command ("a banana" in "food: poha, a banana",
+    or a glucose mention without a number or "cgm:" prefix) continue the
+    previous command; text before the first command is dropped.
+    """
+    commands: List[str] = []
+    for segment in _COMMAND_BREAKS.split(text or ""):
+        segment = segment.strip()
+        if not segment:
+            continue
+        intent = classify(segment)
+        starts_command = intent.kind in COMMAND_PREFIXES and (
+            intent.command or intent.kind != "cgm" or intent.reading is not None
+        )
+        if starts_command:
+            commands.append(segment)
+        elif commands:
+            commands[-1] = f"{commands[-1]}, {segment}"
+    return [classify(command) for command in commands]
+
+
+def _uses_llm(intent: Intent) -> bool:
+    if intent.kind in LLM_ROUTES:
+        return True
+    # A mood the lexicon cannot place goes to the LLM fallback
+    return intent.kind == "mood" and mood_lexicon.needs_llm(intent.argument)
+
+
+def needs_llm(text: str) -> bool:
+    """True when a chat message would reach an LLM-backed agent"""
+    if not (text or "").strip():
+        return False
+    intent = classify(text)
+    if intent.kind == "emergency":
+        return False
+    if _uses_llm(intent):
+        return True
+    return any(_uses_llm(command) for command in split_commands(text))
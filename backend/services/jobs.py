@@ -0,0 +1,164 @@
+# backend/services/jobs.py
+"""
+Background job runner for long-running agent work (e.g. meal plan generation).
+
+Jobs run on a bounded worker pool. Status and results are persisted in the
+background_jobs table so any uvicorn worker can answer a poll for a job id.
+
+Jobs never stay queued/running forever: shutdown() marks the jobs it cancels
+as failed, and jobs still unfinished JOB_STALE_MINUTES after they started (or
+were queued, if they never started) are taken to belong to a process that
+died: they are marked failed on the next submit, then pruned with the other
+finished jobs. Jobs this runner still holds are never swept, however long
+they have waited in its queue.
+"""
+import asyncio
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from backend.services import db
+from backend.services.bulkheads import run_db
+
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "24"))
+# Longer than any job can run or wait: an unfinished job idle this long belongs to a process that is gone
+JOB_STALE_MINUTES = float(os.getenv("JOB_STALE_MINUTES", "30"))
+FINISHED_STATUSES = ("done", "failed")
+
+
+class JobQueueFull(RuntimeError):
+    """Raised when a runner already holds its maximum number of queued jobs"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class JobRunner:
+    """Runs `func(user_id)` in a bounded thread pool and records the outcome"""
+
+    def __init__(self, kind: str, func: Callable[[int], Dict[str, Any]], workers: int = 2, queue_limit: int = 32):
+        self.kind = kind
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue_limit = max(0, queue_limit)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._events: Dict[str, threading.Event] = {}
+        self._futures: Dict[str, Future] = {}
+
+    @property
+    def capacity(self) -> int:
+        """Jobs that may be running or waiting at once"""
+        return self.workers + self.queue_limit
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{self.kind}-job")
+        return self._executor
+
+    def submit(self, user_id: int) -> Dict[str, Any]:
+        """Queue a job; raises JobQueueFull when the runner is at capacity"""
+        with self._lock:
+            if self._pending >= self.capacity:
+                raise JobQueueFull(f"{self.kind} job queue is full ({self.capacity} jobs)")
+            self._pending += 1
+
+        job_id = uuid.uuid4().hex
+        try:
+            self._prune()
+            db.insert_job(job_id, self.kind, user_id, _now())
+            self._events[job_id] = threading.Event()
+            self._futures[job_id] = self._get_executor().submit(self._run, job_id, user_id)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            self._events.pop(job_id, None)
+            self._futures.pop(job_id, None)
+            raise
+
+        return {"job_id": job_id, "status": "queued", "kind": self.kind, "user_id": user_id}
+
+    def _run(self, job_id: str, user_id: int) -> None:
+        try:
+            db.update_job(job_id, "running", "started_at", _now())
+            result = self.func(user_id)
+            db.update_job(job_id, "done", "finished_at", _now(), result=json.dumps(result, default=str))
+        except Exception as e:
+            print(f"⚠️ {self.kind} job {job_id} failed: {e}")
+            try:
+                db.update_job(job_id, "failed", "finished_at", _now(), error=str(e))
+            except Exception as db_error:
+                print(f"⚠️ Could not record failure for job {job_id}: {db_error}")
+        finally:
+            self._finish(job_id)
+
+    def _finish(self, job_id: str) -> None:
+        with self._lock:
+            self._pending -= 1
+        self._futures.pop(job_id, None)
+        event = self._events.pop(job_id, None)
+        if event:
+            event.set()
+
+    def _prune(self) -> None:
+        """Fail jobs abandoned by a dead process, then drop finished jobs older than the retention window"""
+        now = datetime.now(timezone.utc)
+        stale = (now - timedelta(minutes=JOB_STALE_MINUTES)).isoformat()
+        db.fail_unfinished_jobs("abandoned: the server stopped before the job finished", now.isoformat(),
+                                idle_before=stale, keep=list(self._futures))
+        db.delete_finished_jobs((now - timedelta(hours=JOB_RETENTION_HOURS)).isoformat())
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        """Return the stored job with its result decoded, or {} if unknown"""
+        job = db.get_job(job_id)
+        if job and job.get("result"):
+            try:
+                job["result"] = json.loads(job["result"])
+            except (TypeError, ValueError):
+                pass
+        return job
+
+    async def wait(self, job_id: str, timeout: float = 0.0) -> Dict[str, Any]:
+        """Long-poll: return once the job finishes or `timeout` seconds pass"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(0.0, timeout)
+        while True:
+            job = await run_db(self.get, job_id)
+            if not job or job["status"] in FINISHED_STATUSES or loop.time() >= deadline:
+                return job
+            # Jobs owned by this process signal completion in memory; jobs owned
+            # by another worker are only visible through the database.
+            event = self._events.get(job_id)
+            interval = 0.1 if event is not None else 0.5
+            while loop.time() < deadline and (event is None or not event.is_set()):
+                await asyncio.sleep(min(interval, max(0.0, deadline - loop.time())))
+                if event is None:
+                    break
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "pending": self._pending,
+        }
+
+    def shutdown(self) -> None:
+        """Stop the pool; queued jobs that never started are recorded as failed"""
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        cancelled = [job_id for job_id, future in list(self._futures.items()) if future.cancelled()]
+        for job_id in cancelled:
+            self._finish(job_id)
+        try:
+            db.fail_unfinished_jobs("cancelled: the server shut down", _now(), job_ids=cancelled)
+        except Exception as e:
+            print(f"⚠️ Could not record cancelled {self.kind} jobs: {e}")
@@ -24,9 +24,12 @@ for p in CANDIDATE_ENVS:
 
 # --- Gemini setup ---
 import google.generativeai as genai  # noqa: E402
+from backend.services.deadlines import LLM_MIN_BUDGET_SECONDS, DeadlineExceeded, expired, llm_budget  # noqa: E402
 
 API_KEY = os.getenv("GEMINI_API_KEY")
 MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+# Per-call cap; a request deadline (backend/services/deadlines.py) can shorten it
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
 
 # DEBUG: show what we tried and whether we found the key
 print(
@@ -57,16 +60,24 @@ if API_KEY:
         API_KEY = None
 
 def generate_text(prompt: str) -> str:
-    """Return a plain text response from Gemini; never raise."""
+    """Return a plain text response from Gemini.
+    
+    Never raises, except DeadlineExceeded when the current request's time
+    budget is (or runs) out, so callers serve their fallback instead.
+    """
     if not prompt or not prompt.strip():
         return "Error: Empty prompt provided"
     
     if not API_KEY:
         return "🔧 Demo Mode: AI features disabled. Please set GEMINI_API_KEY to enable AI responses."
     
+    timeout = llm_budget(LLM_TIMEOUT_SECONDS)
+    if timeout < LLM_MIN_BUDGET_SECONDS:
+        raise DeadlineExceeded("llm call")
+    
     try:
         model = genai.GenerativeModel(MODEL)
-        resp = model.generate_content(prompt)
+        resp = model.generate_content(prompt, request_options={"timeout": timeout})
         
         if not resp or not hasattr(resp, 'text'):
             return "Error: Invalid response from Gemini API"
@@ -75,6 +86,8 @@ def generate_text(prompt: str) -> str:
         return result if result else "Error: Empty response from Gemini API"
         
     except Exception as e:
+        if expired():
+            raise DeadlineExceeded("llm response") from e
         error_msg = str(e)
         if "API_KEY" in error_msg:
             return "Error: Invalid Gemini API key. Please check your GEMINI_API_KEY in .env file"
@@ -0,0 +1,234 @@
+# backend/services/mood_lexicon.py
+"""
+Free-text mood recognition: "exhausted", "happyy", "feeling kinda down".
+
+Every word or phrase the recognizer accepts maps to a label on the mood
+scale (mood_score.SCALE): the labels themselves plus SYNONYMS. At import
+the vocabulary is compiled into
+
+- a word-level phrase table (first word -> phrases, longest first), so
+  "worn out" and "not bad" win over their single words, as in intents.py;
+- a SymSpell index: every single-word term with up to MAX_EDITS letters
+  deleted, mapped back to the terms. A typed word looks up its own deletes
+  (a few dozen dictionary probes) and the candidates are confirmed with an
+  edit distance that counts transpositions, so a typo costs microseconds
+  with no scan of the vocabulary.
+
+recognize() normalizes the text (lowercase, punctuation to spaces, letters
+repeated three or more times cut to two), corrects every word that is not
+filler ("feeling", "kinda", "today") against the index, memoized per word,
+and then matches phrases. Short words tolerate fewer edits so "am" never
+becomes "calm". A negation up to NEGATION_SCOPE words before a mood word
+("not happy", "not at all calm") lands on the far side of neutral. resolve() adds the LLM as the last
+resort for text the lexicon cannot place, when MOOD_LLM_FALLBACK is on;
+needs_llm() tells callers ahead of time, so that text is run through
+admission control and the LLM pool like any other LLM-bound request.
+"""
+import os
+import re
+import string
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from backend.services.mood_score import SCALE
+
+MOOD_LLM_FALLBACK = os.getenv("MOOD_LLM_FALLBACK", "1") == "1"
+MOOD_LEXICON_CACHE = int(os.getenv("MOOD_LEXICON_CACHE", "4096"))
+MAX_EDITS = 2
+
+# Synonym or phrase -> label on the mood scale
+SYNONYMS: Dict[str, str] = {
+    # 5
+    "joyful": "happy", "cheerful": "happy", "glad": "happy", "delighted": "happy", "elated": "happy",
+    "ecstatic": "excited", "thrilled": "excited", "pumped": "excited", "energetic": "excited",
+    "wonderful": "great", "awesome": "great", "on top of the world": "great", "over the moon": "happy",
+    "superb": "excellent", "brilliant": "excellent",
+    # 4
+    "relaxed": "calm", "peaceful": "calm", "chill": "calm", "at ease": "calm", "serene": "calm",
+    "satisfied": "content", "grateful": "content", "thankful": "content", "hopeful": "content",
+    "well": "good", "pretty good": "good", "positive": "good", "better": "good",
+    # 3
+    "meh": "neutral", "so so": "neutral", "average": "neutral", "normal": "neutral", "nothing special": "neutral",
+    "not bad": "okay", "not great": "okay", "all right": "alright",
+    # 2
+    "exhausted": "tired", "sleepy": "tired", "drained": "tired", "fatigued": "tired", "worn out": "tired",
+    "burnt out": "tired", "burned out": "tired", "weary": "tired",
+    "unhappy": "sad", "blue": "sad", "gloomy": "sad", "lonely": "sad", "hurt": "sad", "heartbroken": "sad",
+    "bummed": "down", "not good": "down", "not well": "down", "under the weather": "low", "sick": "low",
+    "let down": "disappointed", "bothered": "upset",
+    # 1
+    "overwhelmed": "stressed", "tense": "stressed", "pressured": "stressed", "stressed out": "stressed",
+    "nervous": "anxious", "worried": "anxious", "scared": "anxious", "afraid": "anxious", "panicky": "anxious",
+    "mad": "angry", "furious": "angry", "livid": "angry", "pissed": "angry",
+    "irritated": "frustrated", "annoyed": "frustrated", "fed up": "frustrated",
+    "horrible": "awful", "miserable": "awful", "dreadful": "awful", "crappy": "awful", "hopeless": "depressed",
+}
+
+# Words that carry no mood of their own
+FILLER = frozenset((
+    "i", "im", "am", "is", "was", "are", "be", "been", "being", "my", "me", "mood", "moods", "feel", "feels",
+    "feeling", "felt", "kinda", "kind", "of", "sort", "sorta", "a", "an", "bit", "little", "lil", "pretty", "quite",
+    "rather", "so", "very", "really", "super", "totally", "just", "today", "tonight", "now", "right", "rn", "doing",
+    "somewhat", "slightly", "extremely", "too", "and", "but", "the", "this", "morning", "evening", "afternoon",
+    "lately", "honestly", "like", "think", "guess", "mostly",
+))
+NEGATIONS = frozenset(("not", "no", "never", "isnt", "arent", "dont", "didnt", "aint", "hardly"))
+# A negation reaches this many words ahead ("not at all happy")
+NEGATION_SCOPE = 3
+# Negated labels land on the other side of neutral
+NEGATED = {5: "down", 4: "down", 3: "neutral", 2: "okay", 1: "okay"}
+
+_SEPARATORS = str.maketrans(string.punctuation.replace("'", ""), " " * (len(string.punctuation) - 1))
+_REPEATS = re.compile(r"(.)\1{2,}")
+
+
+class MoodMatch(NamedTuple):
+    """A recognized mood"""
+    label: str          # label on mood_score.SCALE
+    score: int
+    term: str           # vocabulary word or phrase that matched
+    method: str         # exact | synonym | fuzzy | negated | llm
+    distance: int = 0   # edits needed to reach the term
+
+
+def _normalize(text: str) -> List[str]:
+    text = _REPEATS.sub(r"\1\1", (text or "").lower().translate(_SEPARATORS))
+    return [word.replace("'", "") for word in text.split()]
+
+
+def _allowed_edits(word: str) -> int:
+    """Short words are too easily confused: none up to 3 letters, one up to 5"""
+    return 0 if len(word) <= 3 else 1 if len(word) <= 5 else MAX_EDITS
+
+
+def _deletes(word: str, edits: int) -> Set[str]:
+    variants, frontier = {word}, {word}
+    for _ in range(edits):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance with adjacent transpositions (optimal string alignment)"""
+    if a == b:
+        return 0
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+    return current[-1]
+
+
+class MoodIndex:
+    """Phrase table plus SymSpell delete index over the mood vocabulary"""
+
+    def __init__(self, scale: Dict[str, int], synonyms: Dict[str, str]):
+        self.scale = scale
+        # term -> (label, method); labels are their own terms
+        self.terms: Dict[Tuple[str, ...], Tuple[str, str]] = {
+            tuple(term.split()): (label, "synonym") for term, label in synonyms.items()
+        }
+        self.terms.update({(label,): (label, "exact") for label in scale})
+        self.phrases: Dict[str, List[Tuple[str, ...]]] = {}
+        for words in sorted(self.terms, key=len, reverse=True):
+            self.phrases.setdefault(words[0], []).append(words)
+        # Every word of every term is a correction target, so typos inside phrases are fixed too
+        self.words = {word for words in self.terms for word in words} | NEGATIONS
+        self.deletes: Dict[str, Set[str]] = {}
+        for word in self.words:
+            for variant in _deletes(word, _allowed_edits(word)):
+                self.deletes.setdefault(variant, set()).add(word)
+        # The vocabulary never changes, so corrections of words seen before are free
+        self.correct = lru_cache(maxsize=MOOD_LEXICON_CACHE)(self._closest)
+
+    def _closest(self, word: str) -> Tuple[Optional[str], int]:
+        """Closest vocabulary word within the allowed edits (ties go to the alphabetically first)"""
+        if word in self.words:
+            return word, 0
+        edits = _allowed_edits(word)
+        if not edits:
+            return None, 0
+        candidates = {
+            candidate
+            for variant in _deletes(word, edits)
+            for candidate in self.deletes.get(variant, ())
+            if abs(len(candidate) - len(word)) <= edits and _allowed_edits(candidate)
+        }
+        best: Tuple[int, str] = (edits + 1, "")
+        for candidate in candidates:
+            distance = edit_distance(word, candidate)
+            if distance <= _allowed_edits(candidate) and (distance, candidate) < best:
+                best = (distance, candidate)
+        return (best[1], best[0]) if best[1] else (None, 0)
+
+    def recognize(self, text: str) -> Optional[MoodMatch]:
+        """The first mood named in the text, or None"""
+        tokens: List[Tuple[str, int]] = []
+        for word in _normalize(text):
+            # Filler stays as typed: it never names a mood but may be part of a phrase ("so so")
+            corrected = (None, 0) if word in FILLER else self.correct(word)
+            tokens.append(corrected if corrected[0] is not None else (word, 0))
+        words = [word for word, _ in tokens]
+        negated_at = -NEGATION_SCOPE - 1
+        for i, word in enumerate(words):
+            for phrase in self.phrases.get(word, ()):
+                if tuple(words[i:i + len(phrase)]) != phrase:
+                    continue
+                label, method = self.terms[phrase]
+                distance = sum(d for _, d in tokens[i:i + len(phrase)])
+                if distance:
+                    method = "fuzzy"
+                if i - negated_at <= NEGATION_SCOPE:
+                    label, method = NEGATED[self.scale[label]], "negated"
+                return MoodMatch(label, self.scale[label], " ".join(phrase), method, distance)
+            if word in NEGATIONS:
+                negated_at = i
+        return None
+
+INDEX = MoodIndex(SCALE, SYNONYMS)
+
+
+def recognize(text: str) -> Optional[MoodMatch]:
+    """Recognize a mood from free text with the precompiled index"""
+    return INDEX.recognize(text)
+
+
+def _ask_llm(text: str) -> Optional[MoodMatch]:
+    """One-word classification by the LLM; None if it is unavailable or answers off the scale"""
+    try:
+        from backend.services.llm import generate_text
+
+        answer = generate_text(
+            f'Which one of these moods best describes "{text}"? '
+            f'Answer with exactly one word from: {", ".join(SCALE)}. '
+            f'Answer "none" if the text does not describe a mood.'
+        )
+    except Exception as e:
+        print(f"Mood LLM fallback unavailable: {e}")
+        return None
+    words = _normalize(answer)
+    label = words[0] if words else ""
+    return MoodMatch(label, SCALE[label], text.strip().lower(), "llm") if label in SCALE else None
+
+
+def needs_llm(text: Optional[str]) -> bool:
+    """True when resolve() would ask the LLM: fallback on and the lexicon cannot place the text"""
+    return MOOD_LLM_FALLBACK and bool((text or "").strip()) and recognize(text) is None
+
+
+def resolve(text: str, use_llm: bool = MOOD_LLM_FALLBACK) -> Optional[MoodMatch]:
+    """Lexicon first; the LLM only for text the lexicon cannot place"""
+    match = recognize(text)
+    if match is None and use_llm and (text or "").strip():
+        match = _ask_llm(text)
+    return match
+
+
+def vocabulary() -> Iterable[str]:
+    """Every word and phrase the lexicon accepts"""
+    return sorted(" ".join(words) for words in INDEX.terms)
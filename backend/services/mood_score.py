@@ -0,0 +1,143 @@
+# backend/services/mood_score.py
+"""
+One mood scoring model for every writer of mood_logs.
+
+SCALE maps mood labels to 1 (worst) .. 5 (best). It merges the two scales
+the agents used to carry (agents/MoodAgent's 1-4 and MoodTrackerAgent's
+1-5): labels keep their rank, the 1-4 scale's top tier moves to 5 and
+"good" sits between it and neutral.
+
+Every scored mood updates, in the same transaction as its mood_logs insert:
+
+- mood_daily: the count and sum of scores per user per UTC day, so the
+  average over the last N days reads at most N rows;
+- mood_state: a time-decayed EWMA kept as a decayed weighted sum and weight
+  (each entry counts once and loses half its weight every
+  MOOD_EWMA_HALF_LIFE_HOURS), so an entry logged late lands with the weight
+  it would have had, and the current value is their ratio.
+
+summary() compares the EWMA with the window average to report whether mood
+is improving, declining or steady. backfill() rescores historical rows on
+this scale and rebuilds the aggregates of users whose scores changed or
+who have rows but no state.
+"""
+import os
+import sqlite3
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from backend.services import db
+from backend.services.cgm_stats import epoch_seconds
+
+MOOD_EWMA_HALF_LIFE_HOURS = float(os.getenv("MOOD_EWMA_HALF_LIFE_HOURS", "72"))
+# EWMA this far above/below the window average counts as a trend
+MOOD_TREND_DELTA = float(os.getenv("MOOD_TREND_DELTA", "0.25"))
+NEUTRAL = 3
+
+SCALE: Dict[str, int] = {
+    "happy": 5, "excited": 5, "great": 5, "excellent": 5, "amazing": 5, "fantastic": 5,
+    "content": 4, "calm": 4, "good": 4,
+    "neutral": 3, "ok": 3, "okay": 3, "fine": 3, "alright": 3,
+    "tired": 2, "sad": 2, "down": 2, "low": 2, "disappointed": 2, "upset": 2,
+    "stressed": 1, "anxious": 1, "angry": 1, "awful": 1, "terrible": 1, "depressed": 1, "frustrated": 1,
+}
+
+_DAY = 86400
+
+
+def score(mood: str) -> Optional[int]:
+    """Score of a mood label, None if it is not on the scale"""
+    return SCALE.get(mood.lower().strip())
+
+
+def _decay(seconds: float) -> float:
+    return 0.5 ** (seconds / (MOOD_EWMA_HALF_LIFE_HOURS * 3600))
+
+
+def record(conn: sqlite3.Connection, user_id: int, value: int, ts: str) -> None:
+    """Fold a score just inserted into mood_logs into the user's daily bucket and EWMA"""
+    seconds = epoch_seconds(ts)
+    conn.execute(
+        "INSERT INTO mood_daily(user_id, day, n, total) VALUES(?, ?, 1, ?) "
+        "ON CONFLICT(user_id, day) DO UPDATE SET n=n+1, total=total+excluded.total",
+        (user_id, int(seconds // _DAY), value),
+    )
+    row = conn.execute("SELECT weighted, weight, last_seconds FROM mood_state WHERE user_id=?", (user_id,)).fetchone()
+    if row is None:
+        weighted, weight, last = float(value), 1.0, seconds
+    elif seconds >= row[2]:
+        keep = _decay(seconds - row[2])
+        weighted, weight, last = row[0] * keep + value, row[1] * keep + 1.0, seconds
+    else:
+        # Logged late: it has already lost weight relative to the newest entry
+        late = _decay(row[2] - seconds)
+        weighted, weight, last = row[0] + late * value, row[1] + late, row[2]
+    conn.execute(
+        "INSERT OR REPLACE INTO mood_state(user_id, weighted, weight, last_seconds) VALUES(?, ?, ?, ?)",
+        (user_id, weighted, weight, last),
+    )
+
+
+def rebuild(conn: sqlite3.Connection, user_id: int) -> None:
+    """Recompute a user's aggregates from mood_logs"""
+    conn.execute("DELETE FROM mood_daily WHERE user_id=?", (user_id,))
+    conn.execute("DELETE FROM mood_state WHERE user_id=?", (user_id,))
+    rows = conn.execute(
+        "SELECT score, timestamp FROM mood_logs WHERE user_id=? AND score IS NOT NULL ORDER BY timestamp", (user_id,)
+    ).fetchall()
+    for value, ts in rows:
+        record(conn, user_id, value, ts)
+
+
+def _rescore_sql() -> str:
+    cases = " ".join(f"WHEN '{label}' THEN {value}" for label, value in SCALE.items())
+    return f"CASE lower(trim(mood)) {cases} END"
+
+
+def backfill(conn: sqlite3.Connection) -> int:
+    """Rescore mood_logs on SCALE and rebuild affected users; returns the number of users rebuilt"""
+    rescored = _rescore_sql()
+    labels = ", ".join(f"'{label}'" for label in SCALE)
+    where = f"lower(trim(mood)) IN ({labels}) AND score IS NOT {rescored}"
+    users = {row[0] for row in conn.execute(f"SELECT DISTINCT user_id FROM mood_logs WHERE {where}")}
+    conn.execute(f"UPDATE mood_logs SET score = {rescored} WHERE {where}")
+    users.update(row[0] for row in conn.execute(
+        "SELECT DISTINCT user_id FROM mood_logs WHERE score IS NOT NULL "
+        "AND user_id NOT IN (SELECT user_id FROM mood_state)"
+    ))
+    for user_id in sorted(users):
+        rebuild(conn, user_id)
+    return len(users)
+
+
+def window_average(conn: sqlite3.Connection, user_id: int, days: int = 7,
+                   now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Average score over today and the previous `days` UTC days, from the daily buckets"""
+    today = int((now or datetime.now(timezone.utc)).timestamp() // _DAY)
+    n, total = conn.execute(
+        "SELECT SUM(n), SUM(total) FROM mood_daily WHERE user_id=? AND day>=? AND day<=?",
+        (user_id, today - days, today),
+    ).fetchone()
+    return {"entries": n or 0, "average": round(total / n, 2) if n else None}
+
+
+def summary(conn: sqlite3.Connection, user_id: int, days: int = 7, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """EWMA, window average and trend direction"""
+    row = conn.execute("SELECT weighted, weight FROM mood_state WHERE user_id=?", (user_id,)).fetchone()
+    ewma = round(row[0] / row[1], 2) if row and row[1] else None
+    window = window_average(conn, user_id, days, now)
+    trend = "steady"
+    if ewma is not None and window["average"] is not None:
+        if ewma - window["average"] > MOOD_TREND_DELTA:
+            trend = "improving"
+        elif window["average"] - ewma > MOOD_TREND_DELTA:
+            trend = "declining"
+    return {"ewma": ewma, "days": days, **window, "trend": trend}
+
+
+def get_summary(user_id: int, days: int = 7) -> Dict[str, Any]:
+    con = db.get_db()
+    try:
+        return {"user_id": user_id, **summary(con, user_id, days)}
+    finally:
+        con.close()
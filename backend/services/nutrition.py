@@ -0,0 +1,200 @@
+# backend/services/nutrition.py
+"""
+Numeric macros per food log and per-user daily nutrition rollups.
+
+food_logs carries carbs_g, protein_g, fat_g and calories next to the
+nutrition_analysis JSON. extract() reads them from any analysis the food
+agents have produced:
+
+- numeric fields written by the current food agent (carbs_g, ...);
+- the structured strings of agents/food_agent.py ("45g", "30-60g",
+  "300-500"), ranges taken at their midpoint;
+- the free-text analysis of agno_agents/food_agent.py ("Carbohydrates:
+  45g", "about 30 g of protein", "400-500 calories"), which now ends with a
+  "Totals:" line of single estimates.
+
+A value the analysis does not give stays NULL. Every insert adds its
+numbers to the user's nutrition_daily row for that UTC day (meal count,
+macro totals, the number of meals without numbers and, per macro, the
+number of meals missing it) in the same transaction, so daily and weekly
+totals read one row per day. A meal logged as "roughly 250 calories" adds
+nothing to carbs, so carbs_g_missing says how far the carb total falls short.
+backfill() fills the columns from existing blobs when they are first
+added, and rollups are rebuilt for users with food logs but no rollup rows
+(or for everyone when the per-macro counts are first added).
+"""
+import json
+import re
+import sqlite3
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Union
+
+from backend.services import db
+from backend.services.cgm_stats import epoch_seconds
+
+MACROS = ("carbs_g", "protein_g", "fat_g", "calories")
+_COLUMNS = ", ".join(MACROS)
+# nutrition_daily columns counting the meals without each macro
+MISSING = tuple(f"{column}_missing" for column in MACROS)
+_MISSING_COLUMNS = ", ".join(MISSING)
+_DAY = 86400
+
+# Keys of the structured analyses, per column
+_KEYS = {
+    "carbs_g": ("carbs_g", "carbs", "carbohydrates", "carbohydrate"),
+    "protein_g": ("protein_g", "protein"),
+    "fat_g": ("fat_g", "fat", "fats"),
+    # Not estimated_calories: the agno agent fills it with "300-500" when the text names no calories
+    "calories": ("calories", "kcal", "energy"),
+}
+_NUMBER = r"(\d+(?:\.\d+)?)(?:\s*(?:-|–|to)\s*(\d+(?:\.\d+)?))?"
+# Between a label and its number: punctuation and hedges only, so "carbs, protein, fat): 30g" gives no carbs
+_GLUE = r"[\s:=(~≈-]*(?:(?:about|approximately|approx\.?|around|roughly|estimated|est\.?)\s*)?"
+# Free text: "carbs: 45g", "carbohydrates ~30-40 g" or "45 g of carbs"; percentages are not amounts
+_TEXT = {
+    "carbs_g": (r"carb(?:ohydrate)?s?", "g"),
+    "protein_g": (r"proteins?", "g"),
+    "fat_g": (r"fats?", "g"),
+    "calories": (r"(?:calories|kcal|cal)", r"(?:kcal)?"),
+}
+_PATTERNS = {
+    column: (
+        re.compile(rf"\b{label}\b{_GLUE}{_NUMBER}(?!\s*%|\d)\s*{unit}?", re.I),
+        re.compile(rf"{_NUMBER}\s*{unit}\b(?:\s*of)?\s*{label}\b", re.I),
+    )
+    for column, (label, unit) in _TEXT.items()
+}
+
+
+def _value(match: "re.Match") -> float:
+    low = float(match.group(1))
+    return (low + float(match.group(2))) / 2 if match.group(2) else low
+
+
+def _parse(value: Any) -> Optional[float]:
+    """A number from 45, "45g", "30-60g" or "300-500" (ranges at their midpoint)"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        match = re.search(_NUMBER, value)
+        if match:
+            return _value(match)
+    return None
+
+
+def extract(analysis: Union[None, str, Dict[str, Any]]) -> Dict[str, Optional[float]]:
+    """carbs_g, protein_g, fat_g and calories from a nutrition analysis (JSON text or dict)"""
+    if isinstance(analysis, str):
+        try:
+            analysis = json.loads(analysis)
+        except ValueError:
+            analysis = {"analysis": analysis}
+    # A failed analysis carries placeholder estimates, not amounts
+    if not isinstance(analysis, dict) or analysis.get("error"):
+        return dict.fromkeys(MACROS)
+    text = analysis.get("analysis") if isinstance(analysis.get("analysis"), str) else ""
+    # The "Totals:" line the agent is asked for wins over estimates earlier in the text
+    totals_at = text.lower().rfind("totals:")
+    texts = (text[totals_at:], text) if totals_at >= 0 else (text,)
+    macros: Dict[str, Optional[float]] = {}
+    for column in MACROS:
+        value = next((_parse(analysis[key]) for key in _KEYS[column] if analysis.get(key) is not None), None)
+        if value is None:
+            matches = (pattern.search(part) for part in texts if part for pattern in _PATTERNS[column])
+            match = next((m for m in matches if m), None)
+            value = _value(match) if match else None
+        macros[column] = round(value, 1) if value is not None else None
+    return macros
+
+
+def record(conn: sqlite3.Connection, user_id: int, macros: Dict[str, Optional[float]], ts: str) -> None:
+    """Add a food log just inserted to the user's rollup for its day"""
+    values = [macros.get(column) for column in MACROS]
+    conn.execute(
+        f"INSERT INTO nutrition_daily(user_id, day, meals, {_COLUMNS}, unmeasured, {_MISSING_COLUMNS}) "
+        f"VALUES(?, ?, 1, {', '.join('?' * (len(MACROS) * 2 + 1))}) "
+        f"ON CONFLICT(user_id, day) DO UPDATE SET meals=meals+1, "
+        + ", ".join(f"{c}={c}+excluded.{c}" for c in (*MACROS, "unmeasured", *MISSING)),
+        (user_id, int(epoch_seconds(ts) // _DAY), *(v or 0.0 for v in values), int(all(v is None for v in values)),
+         *(int(v is None) for v in values)),
+    )
+
+
+def rebuild(conn: sqlite3.Connection, user_id: int) -> None:
+    """Recompute a user's rollup from food_logs"""
+    conn.execute("DELETE FROM nutrition_daily WHERE user_id=?", (user_id,))
+    conn.execute(
+        f"INSERT INTO nutrition_daily(user_id, day, meals, {_COLUMNS}, unmeasured, {_MISSING_COLUMNS}) "
+        f"SELECT user_id, CAST(strftime('%s', timestamp) AS INTEGER) / {_DAY}, COUNT(*), "
+        + ", ".join(f"COALESCE(SUM({c}), 0)" for c in MACROS)
+        + ", SUM(" + " AND ".join(f"{c} IS NULL" for c in MACROS) + "), "
+        + ", ".join(f"SUM({c} IS NULL)" for c in MACROS) + " "
+        "FROM food_logs WHERE user_id=? AND timestamp IS NOT NULL GROUP BY 2",
+        (user_id,),
+    )
+
+
+def backfill(conn: sqlite3.Connection, parse_blobs: bool, rebuild_all: bool = False) -> int:
+    """Fill the macro columns from the JSON (when they were just added) and rebuild missing rollups,
+    or every user's when `rebuild_all`"""
+    if parse_blobs:
+        rows = conn.execute("SELECT id, nutrition_analysis FROM food_logs WHERE nutrition_analysis IS NOT NULL").fetchall()
+        conn.executemany(
+            f"UPDATE food_logs SET {', '.join(f'{c}=?' for c in MACROS)} WHERE id=?",
+            [(*extract(blob).values(), row_id) for row_id, blob in rows],
+        )
+    users = [row[0] for row in conn.execute(
+        "SELECT DISTINCT user_id FROM food_logs"
+        + ("" if rebuild_all else " WHERE user_id NOT IN (SELECT user_id FROM nutrition_daily)")
+    )]
+    for user_id in users:
+        rebuild(conn, user_id)
+    return len(users)
+
+
+def totals(conn: sqlite3.Connection, user_id: int, first: date, last: date, period: str = "daily") -> List[Dict[str, Any]]:
+    """Per-day (or per-week, Monday first) totals for first..last from the rollup; `unmeasured`
+    counts, per macro, the meals whose analysis did not give it"""
+    if period == "weekly":
+        first -= timedelta(days=first.weekday())
+    epoch = date(1970, 1, 1)
+    rows = conn.execute(
+        f"SELECT day, meals, unmeasured, {_COLUMNS}, {_MISSING_COLUMNS} FROM nutrition_daily "
+        f"WHERE user_id=? AND day>=? AND day<=? ORDER BY day",
+        (user_id, (first - epoch).days, (last - epoch).days),
+    ).fetchall()
+    buckets: Dict[date, Dict[str, Any]] = {}
+    for day, meals, unmeasured, *values in rows:
+        on = epoch + timedelta(days=day)
+        start = on - timedelta(days=on.weekday()) if period == "weekly" else on
+        bucket = buckets.setdefault(start, dict.fromkeys(("meals", "unmeasured", *MACROS, *MISSING), 0))
+        bucket["meals"] += meals
+        bucket["unmeasured"] += unmeasured
+        for column, value in zip((*MACROS, *MISSING), values):
+            bucket[column] += value
+    step = 7 if period == "weekly" else 1
+    out = []
+    start = first
+    while start <= last:
+        bucket = buckets.get(start, dict.fromkeys(("meals", "unmeasured", *MACROS, *MISSING), 0))
+        out.append({
+            "date": start.isoformat(),
+            "meals": bucket["meals"],
+            **{column: round(bucket[column], 1) for column in MACROS},
+            "unmeasured_meals": bucket["unmeasured"],
+            "unmeasured": {column: bucket[missing] for column, missing in zip(MACROS, MISSING)},
+        })
+        start += timedelta(days=step)
+    return out
+
+
+def get_totals(user_id: int, days: int = 7, period: str = "daily", end: Optional[date] = None) -> Dict[str, Any]:
+    """Totals over the last `days` UTC days, ending today"""
+    last = end or datetime.now(timezone.utc).date()
+    first = last - timedelta(days=days - 1)
+    con = db.get_db()
+    try:
+        rows = totals(con, user_id, first, last, period)
+    finally:
+        con.close()
+    return {"user_id": user_id, "period": period, "from": first.isoformat(), "to": last.isoformat(), "totals": rows}
@@ -0,0 +1,213 @@
+# backend/services/postprandial.py
+"""
+Postprandial glucose response of every logged meal.
+
+For each food_logs row whose window has closed, the glucose curve over the
+following POSTPRANDIAL_WINDOW_MINUTES gives:
+
+- baseline: the last reading at or before the meal (as-of), if it is at most
+  BASELINE_TOLERANCE_MINUTES old;
+- peak, rise (peak - baseline) and minutes_to_peak;
+- iauc: incremental area under the curve above baseline (mg/dL x minutes,
+  trapezoids, area below baseline ignored).
+
+refresh() does this for all pending meals in one pass instead of one query
+per meal: readings of all the users involved are loaded once, keyed by
+(user_id << 32 | epoch seconds) so a single sorted array covers every user,
+and each meal's baseline and window are found with np.searchsorted. Windows
+are gathered into a (meals x readings) matrix, so overlapping meals need no
+special handling. Readings the quality filter flagged are left out, so a
+compression low or a jump is never a baseline or a peak. Results go to the
+postprandial table keyed by food log id.
+
+CGM data often syncs hours after the meal, so a meal stored without a
+baseline or with fewer than MIN_WINDOW_READINGS readings is recomputed on
+every refresh until POSTPRANDIAL_RECHECK_HOURS after it was eaten.
+
+meal_ranking() turns them into the user's steadiest and spikiest meals, which
+MealPlannerAgent puts in its prompt and uses to fill fallback plans.
+"""
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from backend.services import db
+from backend.services.analytics import ANALYTICS_CHUNK_USERS, LOCAL_UTC_OFFSET_MINUTES
+from backend.services.cgm_stats import TRUSTED_READING
+
+POSTPRANDIAL_WINDOW_MINUTES = int(os.getenv("POSTPRANDIAL_WINDOW_MINUTES", "180"))
+BASELINE_TOLERANCE_MINUTES = int(os.getenv("BASELINE_TOLERANCE_MINUTES", "30"))
+# A meal "worked well" when glucose rose less than this (mg/dL)
+STEADY_RISE_MGDL = float(os.getenv("STEADY_RISE_MGDL", "30"))
+# Readings needed after a meal before its metrics are trusted
+MIN_WINDOW_READINGS = 3
+# How long incomplete meals keep waiting for late-synced CGM readings
+POSTPRANDIAL_RECHECK_HOURS = float(os.getenv("POSTPRANDIAL_RECHECK_HOURS", "48"))
+
+_SHIFT = 32
+
+
+def keys(user_ids: np.ndarray, seconds: np.ndarray) -> np.ndarray:
+    """Composite sort keys: user id in the high bits, epoch seconds in the low"""
+    return (user_ids.astype(np.int64) << _SHIFT) + seconds.astype(np.int64)
+
+
+def responses(
+    meal_keys: np.ndarray, cgm_keys: np.ndarray, glucose: np.ndarray,
+    window_minutes: int = POSTPRANDIAL_WINDOW_MINUTES, tolerance_minutes: int = BASELINE_TOLERANCE_MINUTES
+) -> Dict[str, np.ndarray]:
+    """Baseline, peak, rise, minutes to peak, iAUC and reading count per meal (cgm_keys ascending)"""
+    meals = len(meal_keys)
+    if len(cgm_keys) == 0:
+        empty = np.full(meals, np.nan)
+        return {"baseline": empty, "peak": empty, "rise": empty, "minutes_to_peak": empty,
+                "iauc": empty, "readings": np.zeros(meals, dtype=np.int64)}
+    window, tolerance = window_minutes * 60, tolerance_minutes * 60
+    after = np.searchsorted(cgm_keys, meal_keys, side="right")
+    end = np.searchsorted(cgm_keys, meal_keys + window, side="right")
+
+    # As-of baseline: the reading at or just before the meal, for the same user
+    prior = after - 1
+    has_baseline = prior >= 0
+    gap = np.where(has_baseline, meal_keys - cgm_keys[np.maximum(prior, 0)], tolerance + 1)
+    baseline = np.where(has_baseline & (gap <= tolerance), glucose[np.maximum(prior, 0)], np.nan)
+
+    counts = end - after
+    width = int(counts.max()) if meals else 0
+    if width == 0:
+        empty = np.full(meals, np.nan)
+        return {"baseline": baseline, "peak": empty, "rise": empty, "minutes_to_peak": empty,
+                "iauc": empty, "readings": counts}
+    index = after[:, None] + np.arange(width)
+    inside = index < end[:, None]
+    index = np.minimum(index, len(cgm_keys) - 1)
+    values = np.where(inside, glucose[index], -np.inf)
+    minutes = np.where(inside, (cgm_keys[index] - meal_keys[:, None]) / 60.0, np.nan)
+
+    peak_at = values.argmax(axis=1)
+    rows = np.arange(meals)
+    enough = counts >= MIN_WINDOW_READINGS
+    peak = np.where(enough, values[rows, peak_at], np.nan)
+    to_peak = np.where(enough, minutes[rows, peak_at], np.nan)
+
+    # Trapezoids from (0, baseline) through the window's readings, clipped at the baseline
+    above = np.clip(np.where(inside, values, 0.0) - baseline[:, None], 0, None)
+    y = np.concatenate([np.zeros((meals, 1)), above], axis=1)
+    t = np.concatenate([np.zeros((meals, 1)), np.where(inside, minutes, 0.0)], axis=1)
+    segments = 0.5 * (y[:, 1:] + y[:, :-1]) * (t[:, 1:] - t[:, :-1])
+    iauc = np.where(inside, segments, 0.0).sum(axis=1)
+    iauc = np.where(enough & ~np.isnan(baseline), iauc, np.nan)
+    return {"baseline": baseline, "peak": peak, "rise": peak - baseline, "minutes_to_peak": to_peak,
+            "iauc": iauc, "readings": counts}
+
+
+def _nullable(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 1)
+
+
+def refresh(conn: sqlite3.Connection, user_ids: Optional[Iterable[int]] = None, now: Optional[datetime] = None) -> int:
+    """Compute and store responses for meals whose window has closed (or that still lack readings);
+    returns how many were stored"""
+    now = now or datetime.now(timezone.utc)
+    closed = (now - timedelta(minutes=POSTPRANDIAL_WINDOW_MINUTES)).isoformat()
+    recheck = (now - timedelta(hours=POSTPRANDIAL_RECHECK_HOURS)).isoformat()
+    scope, params = "", [closed, MIN_WINDOW_READINGS, recheck]
+    if user_ids is not None:
+        ids = list(user_ids)
+        scope = f"AND f.user_id IN ({','.join('?' for _ in ids)})"
+        params += ids
+    pending = conn.execute(
+        f"SELECT f.id, f.user_id, CAST(strftime('%s', f.timestamp) AS INTEGER), f.timestamp FROM food_logs f "
+        f"LEFT JOIN postprandial p ON p.food_log_id = f.id "
+        f"WHERE f.timestamp <= ? AND (p.food_log_id IS NULL "
+        f"OR ((p.readings < ? OR p.baseline IS NULL) AND f.timestamp >= ?)) {scope} "
+        f"ORDER BY f.user_id, f.timestamp", params
+    ).fetchall()
+    if not pending:
+        return 0
+
+    stored = 0
+    users = sorted({row[1] for row in pending})
+    for i in range(0, len(users), ANALYTICS_CHUNK_USERS):
+        chunk = set(users[i:i + ANALYTICS_CHUNK_USERS])
+        meals = [row for row in pending if row[1] in chunk]
+        stored += _store(conn, meals, sorted(chunk))
+    return stored
+
+
+def _store(conn: sqlite3.Connection, meals: Sequence[tuple], user_ids: Sequence[int]) -> int:
+    ids, meal_users, meal_seconds, meal_stamps = zip(*meals)
+    first = datetime.fromtimestamp(min(meal_seconds) - BASELINE_TOLERANCE_MINUTES * 60, timezone.utc).isoformat()
+    last = datetime.fromtimestamp(max(meal_seconds) + POSTPRANDIAL_WINDOW_MINUTES * 60 + 1, timezone.utc).isoformat()
+    rows = conn.execute(
+        f"SELECT user_id, CAST(strftime('%s', timestamp) AS INTEGER), glucose_level FROM cgm_logs "
+        f"WHERE user_id IN ({','.join('?' for _ in user_ids)}) AND timestamp >= ? AND timestamp <= ? "
+        f"AND {TRUSTED_READING}",
+        (*user_ids, first, last),
+    ).fetchall()
+    if rows:
+        cgm_users, cgm_seconds, glucose = (np.asarray(column) for column in zip(*rows))
+        cgm_keys = keys(cgm_users, cgm_seconds)
+        order = np.argsort(cgm_keys, kind="stable")
+        cgm_keys, glucose = cgm_keys[order], glucose[order].astype(np.float64)
+    else:
+        cgm_keys, glucose = np.empty(0, dtype=np.int64), np.empty(0)
+    result = responses(keys(np.asarray(meal_users), np.asarray(meal_seconds)), cgm_keys, glucose)
+
+    computed_at = datetime.now(timezone.utc).isoformat()
+    conn.executemany(
+        "INSERT OR REPLACE INTO postprandial(food_log_id, user_id, meal_at, baseline, peak, rise, minutes_to_peak, "
+        "iauc, readings, computed_at) VALUES(?,?,?,?,?,?,?,?,?,?)",
+        [
+            (ids[i], meal_users[i], meal_stamps[i], _nullable(result["baseline"][i]), _nullable(result["peak"][i]),
+             _nullable(result["rise"][i]), _nullable(result["minutes_to_peak"][i]), _nullable(result["iauc"][i]),
+             int(result["readings"][i]), computed_at)
+            for i in range(len(ids))
+        ],
+    )
+    return len(ids)
+
+
+def meal_ranking(conn: sqlite3.Connection, user_id: int, limit: int = 3) -> Dict[str, List[Dict[str, Any]]]:
+    """The user's steadiest and spikiest meals (grouped by description), with their usual local time"""
+    rows = conn.execute(
+        "SELECT LOWER(TRIM(f.meal_description)), MIN(f.meal_description), COUNT(*), AVG(p.rise), AVG(p.iauc), "
+        "AVG((CAST(strftime('%s', f.timestamp) AS INTEGER) / 60 + ?) % 1440) "
+        "FROM postprandial p JOIN food_logs f ON f.id = p.food_log_id "
+        "WHERE p.user_id = ? AND p.rise IS NOT NULL GROUP BY 1",
+        (LOCAL_UTC_OFFSET_MINUTES, user_id),
+    ).fetchall()
+    meals = [
+        {"meal": name, "times": times, "mean_rise": round(rise, 1), "mean_iauc": round(iauc or 0.0, 0),
+         "usual_minute": int(minute)}
+        for _, name, times, rise, iauc, minute in rows
+    ]
+    meals.sort(key=lambda m: (m["mean_rise"], m["mean_iauc"]))
+    return {
+        "steady": [m for m in meals if m["mean_rise"] < STEADY_RISE_MGDL][:limit],
+        "spiky": [m for m in reversed(meals) if m["mean_rise"] >= STEADY_RISE_MGDL][:limit],
+    }
+
+
+def get_responses(user_id: int, limit: int = 20) -> Dict[str, Any]:
+    """Refresh the user's pending meals, then their latest responses and meal ranking"""
+    con = db.get_db()
+    try:
+        with con:
+            refresh(con, [user_id])
+        rows = con.execute(
+            "SELECT p.food_log_id, f.meal_description, p.meal_at, p.baseline, p.peak, p.rise, p.minutes_to_peak, "
+            "p.iauc, p.readings FROM postprandial p JOIN food_logs f ON f.id = p.food_log_id "
+            "WHERE p.user_id = ? ORDER BY p.meal_at DESC LIMIT ?", (user_id, limit)
+        ).fetchall()
+        return {
+            "user_id": user_id,
+            "window_minutes": POSTPRANDIAL_WINDOW_MINUTES,
+            "meals": [dict(row) for row in rows],
+            "ranking": meal_ranking(con, user_id),
+        }
+    finally:
+        con.close()
@@ -0,0 +1,213 @@
+# backend/services/push.py
+"""
+In-process pub/sub hub behind GET /stream/{user_id} (Server-Sent Events).
+
+Writers (agents and db.insert_*) call publish() once a CGM reading, mood,
+food entry or alert has been committed; agents writing through a borrowed
+connection hand their events to its owner, which publishes them after its
+commit (FlowEngine.run_pipeline). publish() is thread-safe and never blocks: it
+hands the event to every subscriber's event loop with call_soon_threadsafe,
+so agents running in the DB/LLM pools cost one dict build per subscriber.
+
+Each subscriber owns a bounded queue (PUSH_QUEUE_SIZE events). A client that
+falls that far behind is a slow consumer: its queue is dropped and the
+stream ends with a "disconnect" event instead of buffering without limit.
+EventSource reconnects on its own and sends Last-Event-ID; the last
+PUSH_REPLAY_EVENTS events of the PUSH_REPLAY_USERS most recently active users
+are kept so it can resume from there.
+"""
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+PUSH_QUEUE_SIZE = int(os.getenv("PUSH_QUEUE_SIZE", "256"))
+PUSH_REPLAY_EVENTS = int(os.getenv("PUSH_REPLAY_EVENTS", "64"))
+PUSH_REPLAY_USERS = int(os.getenv("PUSH_REPLAY_USERS", "10000"))
+PUSH_HEARTBEAT_SECONDS = float(os.getenv("PUSH_HEARTBEAT_SECONDS", "15"))
+
+EVENT_KINDS = ("cgm", "mood", "food", "alert")
+
+
+class Subscription:
+    """One connected client: a bounded queue fed on its own event loop"""
+
+    def __init__(self, user_id: int, kinds: Optional[Iterable[str]], size: int):
+        self.user_id = user_id
+        self.kinds = frozenset(kinds) if kinds else None
+        self.queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=size)
+        self.loop = asyncio.get_running_loop()
+        self.closed: Optional[str] = None
+
+    def wants(self, event: Dict[str, Any]) -> bool:
+        return self.kinds is None or event["event"] in self.kinds
+
+    def offer(self, event: Dict[str, Any]) -> bool:
+        """Queue an event (on the subscriber's loop); False once it is a slow consumer"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            self.close("slow_consumer")
+            return False
+
+    def close(self, reason: str) -> None:
+        """Drop whatever is queued and wake the reader with the end-of-stream marker"""
+        if self.closed:
+            return
+        self.closed = reason
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class PushHub:
+    """Per-user fan-out of events to subscribers with bounded buffers"""
+
+    def __init__(
+        self, queue_size: int = PUSH_QUEUE_SIZE, replay: int = PUSH_REPLAY_EVENTS, replay_users: int = PUSH_REPLAY_USERS
+    ):
+        self.queue_size = queue_size
+        self.replay = replay
+        self.replay_users = replay_users
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._recent: "OrderedDict[int, Deque[Dict[str, Any]]]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._published = 0
+        self._delivered = 0
+        self._slow_disconnects = 0
+
+    def subscribe(
+        self, user_id: int, kinds: Optional[Iterable[str]] = None, last_event_id: Optional[int] = None
+    ) -> Subscription:
+        """Register a subscriber (call on its event loop), replaying events after last_event_id"""
+        sub = Subscription(user_id, kinds, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(sub)
+            missed = [e for e in self._recent.get(user_id, ()) if last_event_id is not None and e["id"] > last_event_id]
+        for event in missed:
+            if sub.wants(event):
+                sub.offer(event)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            subs = self._subscribers.get(sub.user_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.user_id]
+
+    def publish(self, user_id: int, kind: str, data: Dict[str, Any]) -> int:
+        """Fan an event out to the user's subscribers; returns how many it was handed to"""
+        event = {"event": kind, "user_id": user_id, "data": data, "sent_at": time.time()}
+        with self._lock:
+            self._published += 1
+            event["id"] = next(self._ids)
+            recent = self._recent.get(user_id)
+            if recent is None:
+                recent = self._recent[user_id] = deque(maxlen=self.replay)
+                if len(self._recent) > self.replay_users:
+                    self._recent.popitem(last=False)
+            else:
+                self._recent.move_to_end(user_id)
+            recent.append(event)
+            targets = [sub for sub in self._subscribers.get(user_id, ()) if sub.wants(event) and not sub.closed]
+        for sub in targets:
+            try:
+                sub.loop.call_soon_threadsafe(self._deliver, sub, event)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                self.unsubscribe(sub)
+        return len(targets)
+
+    async def stream(self, sub: Subscription, heartbeat: float = PUSH_HEARTBEAT_SECONDS) -> AsyncIterator[str]:
+        """SSE frames for a subscription; a comment line every `heartbeat` seconds keeps proxies open"""
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    yield f"event: disconnect\ndata: {json.dumps({'reason': sub.closed})}\n\n"
+                    return
+                yield format_sse(event)
+        finally:
+            self.unsubscribe(sub)
+
+    def _deliver(self, sub: Subscription, event: Dict[str, Any]) -> None:
+        if sub.offer(event):
+            with self._lock:
+                self._delivered += 1
+        elif sub.closed == "slow_consumer":
+            with self._lock:
+                self._slow_disconnects += 1
+            self.unsubscribe(sub)
+
+    def close_all(self, reason: str = "shutdown") -> None:
+        with self._lock:
+            subs = [sub for group in self._subscribers.values() for sub in group]
+            self._subscribers.clear()
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub.close, reason)
+            except RuntimeError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "users": len(self._subscribers),
+                "subscribers": sum(len(group) for group in self._subscribers.values()),
+                "published": self._published,
+                "delivered": self._delivered,
+                "slow_disconnects": self._slow_disconnects,
+                "queue_size": self.queue_size,
+            }
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    payload = json.dumps({"user_id": event["user_id"], "sent_at": event["sent_at"], **event["data"]}, default=str)
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {payload}\n\n"
+
+
+HUB = PushHub()
+
+
+def publish(user_id: int, kind: str, data: Dict[str, Any]) -> int:
+    """Publish to the shared hub; safe from any thread"""
+    return HUB.publish(user_id, kind, data)
+
+
+def publish_all(user_id: int, events: List[Tuple[str, Dict[str, Any]]]) -> None:
+    """Publish (kind, data) events in order, e.g. those a pipeline held back until its commit"""
+    for kind, data in events:
+        publish(user_id, kind, data)
+
+
+def reading_events(glucose: float, ts: str, alert_level: Optional[str], alerts: List[Dict[str, Any]],
+                   quality: str = "ok") -> List[Tuple[str, Dict[str, Any]]]:
+    """A CGM reading followed by the predictive alerts it raised"""
+    events = [("cgm", {"glucose_level": glucose, "alert_level": alert_level, "timestamp": ts, "quality": quality})]
+    events += [("alert", {**alert, "glucose": glucose, "created_at": ts}) for alert in alerts]
+    return events
+
+
+def publish_reading(user_id: int, glucose: float, ts: str, alert_level: Optional[str], alerts: List[Dict[str, Any]],
+                    quality: str = "ok") -> None:
+    """Publish a committed CGM reading and its alerts"""
+    publish_all(user_id, reading_events(glucose, ts, alert_level, alerts, quality))
+
+
+def stats() -> Dict[str, Any]:
+    return HUB.stats()
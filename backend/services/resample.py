@@ -0,0 +1,165 @@
+# backend/services/resample.py
+"""
+CGM readings on a regular time grid.
+
+Readings arrive irregularly, sometimes twice for the same instant and with
+gaps. resample() puts them on a UTC-aligned grid of RESAMPLE_STEP_MINUTES in
+one vectorized pass:
+
+- duplicate timestamps are averaged;
+- a grid point between two readings is linearly interpolated only if those
+  readings are at most RESAMPLE_MAX_GAP_MINUTES apart; points inside longer
+  gaps, and before the first or after the last reading, are NaN (the
+  explicit "missing" marker — null in JSON);
+- only readings the quality filter trusts are used.
+
+grid() serves any range from whole UTC days cached per user (288 points per
+day at 5 minutes). A day's entry is reused while the reading count and
+newest id of that day and its two neighbours (interpolation reaches across
+midnight) are unchanged; those come from one covering-index query, and all
+stale days are rebuilt from a single load. Correlation analytics and the
+/history/cgm/resampled endpoint read from here.
+"""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+from backend.services import db
+from backend.services.cgm_stats import TRUSTED_READING
+
+RESAMPLE_STEP_MINUTES = int(os.getenv("RESAMPLE_STEP_MINUTES", "5"))
+RESAMPLE_MAX_GAP_MINUTES = float(os.getenv("RESAMPLE_MAX_GAP_MINUTES", "20"))
+RESAMPLE_CACHE_DAYS = int(os.getenv("RESAMPLE_CACHE_DAYS", "5000"))
+
+_DAY = 86400
+
+
+def resample(
+    seconds: np.ndarray, glucose: np.ndarray, start: float, points: int,
+    step: float = RESAMPLE_STEP_MINUTES * 60.0, max_gap: float = RESAMPLE_MAX_GAP_MINUTES * 60.0
+) -> np.ndarray:
+    """Values at start + i * step for i < points; NaN where no reading is close enough"""
+    values = np.full(points, np.nan)
+    if len(seconds) == 0 or points <= 0:
+        return values
+    t, inverse, counts = np.unique(np.asarray(seconds, dtype=np.float64), return_inverse=True, return_counts=True)
+    g = np.bincount(inverse, weights=np.asarray(glucose, dtype=np.float64)) / counts
+
+    grid = start + step * np.arange(points)
+    right = np.searchsorted(t, grid, side="left")  # first reading at or after the grid point
+    r = np.minimum(right, len(t) - 1)
+    l = np.maximum(right - 1, 0)
+    exact = (right < len(t)) & (t[r] == grid)
+    span = t[r] - t[l]
+    between = (right > 0) & (right < len(t)) & (span <= max_gap)
+    weight = (grid - t[l]) / np.where(span > 0, span, 1.0)
+    values[between] = (g[l] + weight * (g[r] - g[l]))[between]
+    values[exact] = g[r][exact]
+    return values
+
+
+# --- per-day cache -----------------------------------------------------------
+
+_cache: "OrderedDict[Tuple[str, int, int], Tuple[Tuple, np.ndarray]]" = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+
+
+def _iso(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+
+
+def _day_tokens(conn: sqlite3.Connection, user_id: int, first: int, last: int) -> Dict[int, Tuple[int, int]]:
+    """Day -> (readings, newest id) for first..last, from the (user_id, timestamp) index alone"""
+    return {
+        day: (n, newest)
+        for day, n, newest in conn.execute(
+            "SELECT CAST(strftime('%s', timestamp) AS INTEGER) / 86400, COUNT(*), MAX(id) FROM cgm_logs "
+            "WHERE user_id=? AND timestamp>=? AND timestamp<? GROUP BY 1",
+            (user_id, _iso(first * _DAY), _iso((last + 1) * _DAY)),
+        )
+    }
+
+
+def _load(conn: sqlite3.Connection, user_id: int, start: float, end: float) -> Tuple[np.ndarray, np.ndarray]:
+    rows = conn.execute(
+        f"SELECT CAST(strftime('%s', timestamp) AS INTEGER), glucose_level FROM cgm_logs "
+        f"WHERE user_id=? AND timestamp>=? AND timestamp<=? AND {TRUSTED_READING}",
+        (user_id, _iso(start), _iso(end)),
+    ).fetchall()
+    if not rows:
+        return np.empty(0), np.empty(0)
+    seconds, glucose = zip(*rows)
+    return np.asarray(seconds, dtype=np.float64), np.asarray(glucose, dtype=np.float64)
+
+
+def grid(conn: sqlite3.Connection, user_id: int, start: float, end: float) -> Tuple[np.ndarray, np.ndarray]:
+    """(grid seconds, values) covering [start, end), start rounded down to the grid"""
+    step = RESAMPLE_STEP_MINUTES * 60
+    per_day = _DAY // step
+    first, last = int(start // _DAY), int((end - 1) // _DAY)
+    tokens = _day_tokens(conn, user_id, first - 1, last + 1)
+    path = str(db.DB_PATH)
+
+    days: Dict[int, np.ndarray] = {}
+    stale = []
+    with _cache_lock:
+        for day in range(first, last + 1):
+            token = (tokens.get(day - 1), tokens.get(day), tokens.get(day + 1))
+            entry = _cache.get((path, user_id, day))
+            if entry is not None and entry[0] == token:
+                _cache.move_to_end((path, user_id, day))
+                days[day] = entry[1]
+                _cache_stats["hits"] += 1
+            else:
+                stale.append((day, token))
+                _cache_stats["misses"] += 1
+
+    if stale:
+        lo, hi = stale[0][0], stale[-1][0]
+        max_gap = RESAMPLE_MAX_GAP_MINUTES * 60
+        seconds, glucose = _load(conn, user_id, lo * _DAY - max_gap, (hi + 1) * _DAY + max_gap)
+        values = resample(seconds, glucose, lo * _DAY, (hi - lo + 1) * per_day, step, max_gap)
+        with _cache_lock:
+            for day, token in stale:
+                days[day] = values[(day - lo) * per_day:(day - lo + 1) * per_day].copy()
+                _cache[(path, user_id, day)] = (token, days[day])
+                _cache.move_to_end((path, user_id, day))
+            while len(_cache) > RESAMPLE_CACHE_DAYS:
+                _cache.popitem(last=False)
+
+    values = np.concatenate([days[day] for day in range(first, last + 1)])
+    origin = first * _DAY
+    lo = int((start - origin) // step)
+    hi = int(np.ceil((end - origin) / step))
+    return origin + step * np.arange(lo, hi, dtype=np.float64), values[lo:hi]
+
+
+def get_resampled(user_id: int, start: datetime, end: datetime) -> Dict[str, Any]:
+    """Grid values for a range; null marks points with no reading close enough"""
+    con = db.get_db()
+    try:
+        seconds, values = grid(con, user_id, start.timestamp(), end.timestamp())
+    finally:
+        con.close()
+    missing = int(np.isnan(values).sum())
+    return {
+        "user_id": user_id,
+        "start": _iso(seconds[0]) if len(seconds) else None,
+        "step_minutes": RESAMPLE_STEP_MINUTES,
+        "max_gap_minutes": RESAMPLE_MAX_GAP_MINUTES,
+        "points": len(values),
+        "missing": missing,
+        "coverage_pct": round(100.0 * (len(values) - missing) / len(values), 1) if len(values) else None,
+        "values": [None if np.isnan(v) else round(float(v), 1) for v in values],
+    }
+
+
+def cache_stats() -> Dict[str, Any]:
+    with _cache_lock:
+        return {**_cache_stats, "days": len(_cache)}
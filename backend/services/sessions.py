@@ -0,0 +1,162 @@
+# backend/services/sessions.py
+"""
+Per-session conversation state for the chat flow.
+
+Each chat session (keyed by user id plus session id, or by user id alone
+when no session id is sent) gets its own flow position and context instead
+of sharing one set of orchestrator attributes. Access to a key is
+serialized with a per-key lock; idle sessions expire after a TTL and the
+in-memory store is capped in size.
+
+Set CHAT_SESSION_BACKEND=sqlite to keep state in the chat_sessions table so
+several uvicorn workers can serve the same conversation.
+"""
+import copy
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from backend.services import db
+
+CHAT_SESSION_BACKEND = os.getenv("CHAT_SESSION_BACKEND", "memory")
+CHAT_SESSION_TTL_SECONDS = float(os.getenv("CHAT_SESSION_TTL_SECONDS", "1800"))
+CHAT_SESSION_MAX = int(os.getenv("CHAT_SESSION_MAX", "10000"))
+
+# Expired SQLite rows are swept after this many writes
+_SQLITE_SWEEP_EVERY = 200
+
+
+class SessionStore:
+    """Keyed session state with per-key locks, idle TTL and a size bound"""
+
+    def __init__(
+        self,
+        default_factory: Callable[[], Dict[str, Any]] = dict,
+        ttl_seconds: float = CHAT_SESSION_TTL_SECONDS,
+        max_sessions: int = CHAT_SESSION_MAX,
+        backend: str = CHAT_SESSION_BACKEND,
+    ):
+        if backend not in ("memory", "sqlite"):
+            raise ValueError(f"Unknown session backend: {backend}")
+        self.default_factory = default_factory
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max(1, max_sessions)
+        self.backend = backend
+        self._guard = threading.Lock()
+        # key -> [lock, holders]; entries only live while someone uses the key
+        self._locks: Dict[str, List[Any]] = {}
+        # key -> (last_access, state), oldest access first
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._writes = 0
+        self.evicted = 0
+        if backend == "sqlite":
+            db.ensure_session_table()
+
+    @contextmanager
+    def session(self, key: str) -> Iterator[Dict[str, Any]]:
+        """Hold the key's lock and yield its mutable state; saved on exit"""
+        slot = self._acquire(key)
+        try:
+            state = self._load(key)
+            yield state
+            self._save(key, state)
+        finally:
+            self._release(key, slot)
+
+    def peek(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the stored state without creating or touching it"""
+        now = time.time()
+        if self.backend == "sqlite":
+            row = db.get_session(key)
+            if not row or now - row["updated_at"] > self.ttl_seconds:
+                return None
+            return json.loads(row["state"])
+        with self._guard:
+            entry = self._sessions.get(key)
+            if entry is None or now - entry[0] > self.ttl_seconds:
+                return None
+            return copy.deepcopy(entry[1])
+
+    def clear(self, key: str) -> None:
+        with self._guard:
+            self._sessions.pop(key, None)
+        if self.backend == "sqlite":
+            db.delete_session(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._guard:
+            return {
+                "backend": self.backend,
+                "sessions": len(self._sessions) if self.backend == "memory" else None,
+                "active_keys": len(self._locks),
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl_seconds,
+                "evicted": self.evicted,
+            }
+
+    # --- locking ---------------------------------------------------------
+
+    def _acquire(self, key: str) -> List[Any]:
+        with self._guard:
+            slot = self._locks.get(key)
+            if slot is None:
+                slot = self._locks[key] = [threading.Lock(), 0]
+            slot[1] += 1
+        slot[0].acquire()
+        return slot
+
+    def _release(self, key: str, slot: List[Any]) -> None:
+        slot[0].release()
+        with self._guard:
+            slot[1] -= 1
+            if slot[1] == 0:
+                self._locks.pop(key, None)
+
+    # --- storage ---------------------------------------------------------
+
+    def _load(self, key: str) -> Dict[str, Any]:
+        now = time.time()
+        if self.backend == "sqlite":
+            row = db.get_session(key)
+            if row and now - row["updated_at"] <= self.ttl_seconds:
+                return json.loads(row["state"])
+            return self.default_factory()
+        with self._guard:
+            self._evict(now)
+            entry = self._sessions.get(key)
+        return entry[1] if entry is not None else self.default_factory()
+
+    def _save(self, key: str, state: Dict[str, Any]) -> None:
+        now = time.time()
+        if self.backend == "sqlite":
+            db.upsert_session(key, json.dumps(state, default=str), now)
+            self._writes += 1
+            if self._writes % _SQLITE_SWEEP_EVERY == 0:
+                self.evicted += db.delete_sessions_before(now - self.ttl_seconds)
+            return
+        with self._guard:
+            self._sessions[key] = (now, state)
+            self._sessions.move_to_end(key)
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """Drop expired and over-capacity sessions; caller holds _guard"""
+        while self._sessions:
+            last_access, _ = next(iter(self._sessions.values()))
+            if now - last_access <= self.ttl_seconds and len(self._sessions) <= self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+
+def session_key(user_id: int, session_id: Optional[str] = None) -> str:
+    """Sessions default to one per user when the client sends no session id.
+
+    The user id is always part of the key, so a session id sent by another
+    user never reaches this user's state.
+    """
+    return f"user:{user_id}:session:{session_id}" if session_id else f"user:{user_id}"
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Predictive Alert Engine Benchmark
+Feeds interleaved 5-minute readings for many users through AlertEngine.observe
+on an in-memory database and reports readings per second.
+
+Usage: python benchmarks/bench_cgm_alerts.py [users] [readings_per_user]
+"""
+import math
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.services.cgm_alerts import AlertEngine  # noqa: E402
+
+
+def main(users: int, per_user: int) -> None:
+    con = sqlite3.connect(":memory:")
+    con.execute("CREATE TABLE cgm_logs(id INTEGER PRIMARY KEY, user_id INTEGER, glucose_level REAL, timestamp TEXT, quality TEXT)")
+    con.execute(
+        "CREATE TABLE cgm_alerts(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, kind TEXT, message TEXT, "
+        "glucose REAL, slope REAL, projected REAL, created_at TEXT, resolved_at TEXT)"
+    )
+    rng = random.Random(0)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    stamps = [(start + timedelta(minutes=5 * i)).isoformat() for i in range(per_user)]
+    phases = [rng.uniform(0, 2 * math.pi) for _ in range(users)]
+    engine = AlertEngine()
+    alerts = 0
+    started = time.perf_counter()
+    for i, ts in enumerate(stamps):
+        for user in range(users):
+            value = 140 + 70 * math.sin(i / 12 + phases[user]) + rng.gauss(0, 5)
+            alerts += len(engine.observe(con, user, value, ts))
+    elapsed = time.perf_counter() - started
+    total = users * per_user
+    print(f"⏱️  {total} readings ({users} users) in {elapsed:.2f} s: {total / elapsed:,.0f} readings/s, {alerts} alerts raised")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000, int(sys.argv[2]) if len(sys.argv) > 2 else 100)
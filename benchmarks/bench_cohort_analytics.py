@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Cohort Analytics Benchmark
+Times the vectorized AGP/cohort kernels on 10k users x 14 days of 5-minute
+CGM readings held in memory, then the end-to-end path (SQLite chunks ->
+process pool -> report) on a generated database.
+
+Usage: python benchmarks/bench_cohort_analytics.py [users] [days] [db_users]
+"""
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.services import analytics, db  # noqa: E402
+
+READINGS_PER_DAY = 288
+
+
+def synthetic(users: int, days: int, seed: int = 0):
+    """Column arrays for `users` x `days` of 5-minute readings"""
+    rng = np.random.default_rng(seed)
+    per_user = days * READINGS_PER_DAY
+    start = int(time.time()) - days * 86400
+    user_ids = np.repeat(np.arange(1, users + 1, dtype=np.int64), per_user)
+    seconds = np.tile(start + 300 * np.arange(per_user, dtype=np.int64), users)
+    daily = 30 * np.sin(2 * np.pi * ((seconds % 86400) / 86400.0))
+    glucose = rng.normal(140, 35, size=user_ids.size) + daily
+    return user_ids, seconds, glucose
+
+
+def bench_kernels(users: int, days: int) -> None:
+    user_ids, seconds, glucose = synthetic(users, days)
+    chunk = analytics.ANALYTICS_CHUNK_ROWS * 5
+    started = time.perf_counter()
+    chunks = ((user_ids[i:i + chunk], seconds[i:i + chunk], glucose[i:i + chunk]) for i in range(0, user_ids.size, chunk))
+    hist, moments = analytics.summarize(range(1, users + 1), chunks)
+    analytics.percentiles(hist)
+    elapsed = time.perf_counter() - started
+    print(f"⏱️  kernels: {users} users x {days} days = {user_ids.size / 1e6:.1f}M readings in {elapsed:.2f} s "
+          f"({user_ids.size / elapsed / 1e6:.1f}M readings/s)")
+
+
+def bench_database(users: int, days: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cohort.db"
+        con = sqlite3.connect(path)
+        con.execute("CREATE TABLE users(id INTEGER PRIMARY KEY, dietary_preference TEXT, medical_conditions TEXT)")
+        con.execute("CREATE TABLE cgm_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, glucose_level REAL, timestamp TEXT)")
+        con.executemany("INSERT INTO users VALUES(?, 'vegetarian', '[\"Type 2 Diabetes\"]')", [(u,) for u in range(1, users + 1)])
+        user_ids, seconds, glucose = synthetic(users, days, seed=1)
+        stamps = np.datetime_as_string(seconds.astype("datetime64[s]"))
+        con.executemany(
+            "INSERT INTO cgm_logs(user_id, glucose_level, timestamp) VALUES(?, ?, ? || '+00:00')",
+            zip(user_ids.tolist(), np.round(glucose, 1).tolist(), stamps.tolist()),
+        )
+        con.execute("CREATE INDEX idx_cgm_logs_user_ts ON cgm_logs(user_id, timestamp)")
+        con.commit()
+        con.close()
+
+        original = db.DB_PATH
+        db.DB_PATH = path
+        try:
+            started = time.perf_counter()
+            report = analytics.cohort_report(condition="diabetes", days=days + 1)
+            elapsed = time.perf_counter() - started
+        finally:
+            analytics.shutdown()
+            db.DB_PATH = original
+        print(f"⏱️  end to end: {report['users']} users, {report['readings'] / 1e6:.1f}M readings from SQLite in {elapsed:.2f} s "
+              f"with {analytics.ANALYTICS_WORKERS} worker process(es) ({report['readings'] / elapsed / 1e6:.2f}M readings/s)")
+
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 14
+    db_users = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    bench_kernels(users, days)
+    bench_database(db_users, days)
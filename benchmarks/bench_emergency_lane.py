@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Emergency Fast Lane Benchmark
+Measures /chat emergency latency with the LLM pool idle and with it
+saturated by slow (simulated) LLM calls, next to the queue wait an ordinary
+LLM-bound request sees at the same time. The fast lane should stay flat.
+
+Usage: python benchmarks/bench_emergency_lane.py [requests] [llm_seconds]
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.routers import flow  # noqa: E402
+from backend.services import bulkheads  # noqa: E402
+
+MESSAGES = ["I have chest pain", "call an ambulance", "help", "urgent: severe pain in my arm"]
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def emergency_latencies(requests: int):
+    samples = []
+    for i in range(requests):
+        chat = flow.ChatIn(user_id=1, message=MESSAGES[i % len(MESSAGES)])
+        started = time.perf_counter()
+        await flow.chat_endpoint(chat)
+        samples.append((time.perf_counter() - started) * 1e6)
+        await asyncio.sleep(0)
+    return samples
+
+
+async def main(requests: int, llm_seconds: float):
+    pool = bulkheads.BULKHEADS["llm"]
+    idle = await emergency_latencies(requests)
+
+    # Fill the LLM pool to one below capacity, then queue one ordinary LLM request
+    busy = [asyncio.ensure_future(bulkheads.run_llm(time.sleep, llm_seconds)) for _ in range(pool.capacity - 1)]
+    await asyncio.sleep(0.05)
+
+    async def probe():
+        started = time.perf_counter()
+        await bulkheads.run_llm(time.sleep, 0)
+        return time.perf_counter() - started
+
+    llm_probe = asyncio.ensure_future(probe())
+    await asyncio.sleep(0.01)
+    saturation = pool.stats()["saturation"]
+    saturated = await emergency_latencies(requests)
+    llm_wait = await llm_probe
+    await asyncio.gather(*busy)
+    bulkheads.shutdown()
+
+    print(f"⏱️  {requests} emergency messages per phase, LLM pool {pool.workers} workers + {pool.queue_limit} queue ({saturation:.0%} full)")
+    print(f"   idle LLM pool          : p50 {percentile(idle, 0.5):8.1f} µs   p99 {percentile(idle, 0.99):8.1f} µs")
+    print(f"   saturated LLM pool     : p50 {percentile(saturated, 0.5):8.1f} µs   p99 {percentile(saturated, 0.99):8.1f} µs")
+    print(f"   queued LLM request     : {llm_wait * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    llm_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    asyncio.run(main(requests, llm_seconds))
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Intent Router Micro-benchmark
+Compares the compiled single-pass intent engine against the chained
+`keyword in text` checks it replaced (orchestrator general-query check,
+route selection, interrupt emergency scan and query classification).
+
+Usage: python benchmarks/bench_intent_router.py [iterations]
+"""
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.services.intents import classify  # noqa: E402
+
+MESSAGES = [
+    "mood: happy",
+    "cgm: 132",
+    "my glucose is 180 after lunch",
+    "I ate idli and sambar with coconut chutney",
+    "generate my meal plan for tomorrow",
+    "what are the side effects of metformin?",
+    "tell me a joke about doctors",
+    "I have chest pain and feel dizzy",
+    "how much water should I drink every day when it is hot outside",
+    "food: poha with peanuts, a banana and a cup of chai",
+]
+
+EMERGENCY = ["emergency", "urgent", "help", "911", "ambulance", "chest pain", "heart attack",
+             "stroke", "bleeding", "unconscious", "severe pain", "difficulty breathing", "choking"]
+HEALTH = ["diabetes", "glucose", "insulin", "blood sugar", "medication", "doctor",
+          "symptoms", "side effects", "dosage", "prescription", "medical"]
+
+
+def _legacy_query_type(q: str) -> str:
+    if any(k in q for k in EMERGENCY):
+        return "emergency"
+    if any(k in q for k in HEALTH):
+        return "health_question"
+    if any(w in q for w in ["how", "what", "why", "when", "where"]):
+        return "information_request"
+    if any(w in q for w in ["help", "support", "assist"]):
+        return "help_request"
+    return "general_query"
+
+
+def _legacy_routing_suggestion(q: str) -> str:
+    if "mood" in q or "feeling" in q:
+        return "mood"
+    if "glucose" in q or "blood sugar" in q or "cgm" in q:
+        return "cgm"
+    if "food" in q or "meal" in q or "eat" in q:
+        return "food"
+    if "plan" in q or "diet" in q:
+        return "plan"
+    return "general"
+
+
+def legacy_classify(text: str):
+    """The keyword scans a message went through before the intent engine"""
+    t = text.lower()
+    general = not any(k in t for k in ["mood", "glucose", "cgm", "food", "meal", "plan", "blood", "sugar"])
+    if general:
+        # Interrupt agent: emergency scan, then query type and routing suggestion
+        q = t.strip()
+        if any(k in q for k in EMERGENCY):
+            return "emergency", None
+        _legacy_routing_suggestion(q)
+        return _legacy_query_type(q), None
+    if t.startswith("mood:") or "mood" in t:
+        return "mood", None
+    if t.startswith("cgm:") or any(w in t for w in ["glucose", "blood sugar"]):
+        numbers = re.findall(r"\d+", text)
+        return "cgm", float(numbers[0]) if numbers else 0
+    if t.startswith("food:") or any(w in t for w in ["ate", "eat", "meal", "snack"]):
+        return "food", None
+    if "plan" in t:
+        return "plan", None
+    return "general", None
+
+
+def compiled_classify(text: str):
+    intent = classify(text)
+    return (intent.kind if not intent.is_general else intent.query_type), intent.reading
+
+
+def bench(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for message in MESSAGES:
+            fn(message)
+    return (time.perf_counter() - start) / (iterations * len(MESSAGES)) * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"⏱️  {iterations} iterations x {len(MESSAGES)} messages")
+    legacy = bench(legacy_classify, iterations)
+    compiled = bench(compiled_classify, iterations)
+    print(f"   legacy keyword chains : {legacy:6.2f} µs/message")
+    print(f"   compiled intent engine: {compiled:6.2f} µs/message")
+    print(f"   ratio                 : {legacy / compiled:6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -452,6 +452,28 @@ const AssignmentDashboard: React.FC<AssignmentDashboardProps> = ({ userId }) =>
     }
   }, [refreshTrigger]);
 
+  // Live updates: readings, mood and alerts logged anywhere (chat, other devices) are pushed over SSE
+  React.useEffect(() => {
+    if (!userId) return;
+    const source = new EventSource(`http://localhost:8000/stream/${userId}?events=cgm,mood,alert`);
+    source.addEventListener('cgm', (e) => {
+      const reading = JSON.parse((e as MessageEvent).data);
+      setLatestCGM(reading.glucose_level);
+      setCgmData(prev => [...prev.slice(-6), { timestamp: reading.timestamp, reading: reading.glucose_level }]);
+    });
+    source.addEventListener('mood', (e) => {
+      const mood = JSON.parse((e as MessageEvent).data);
+      if (mood.score !== undefined) {
+        setLatestMood(mood.score);
+        setMoodData(prev => [...prev.slice(-6), { timestamp: mood.timestamp, score: mood.score }]);
+      }
+    });
+    source.addEventListener('alert', (e) => {
+      setCgmResponse(JSON.parse((e as MessageEvent).data).message);
+    });
+    return () => source.close();
+  }, [userId]);
+
   // Debug latest values changes
   React.useEffect(() => {
     console.log('Latest CGM changed to:', latestCGM);
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Admission Control Test
+Checks that backend/services/admission.py admits, degrades and rejects
+LLM-bound requests, and that DB-only and emergency chat messages skip it.
+"""
+import asyncio
+import threading
+
+from backend.services import deadlines, mood_lexicon
+from backend.services.admission import AdmissionController, Overloaded
+from backend.services.bulkheads import Bulkhead
+from backend.services.intents import needs_llm
+
+
+def test_degrades_then_rejects():
+    """Requests past degrade_at lose their LLM budget; past the limit they are rejected"""
+    controller = AdmissionController("test", max_in_flight=2, degrade_at=1)
+    with controller.admit() as first:
+        assert first is False and deadlines.llm_budget(30) == 30
+        with controller.admit() as second:
+            assert second is True and deadlines.llm_budget(30) == 0.0
+            try:
+                with controller.admit():
+                    pass
+            except Overloaded as e:
+                assert e.retry_after >= 1
+            else:
+                raise AssertionError("third request was admitted")
+    stats = controller.stats()
+    assert stats["in_flight"] == 0
+    assert (stats["admitted"], stats["degraded"], stats["rejected"]) == (1, 1, 1)
+    print("✅ Admission degrades, then rejects")
+
+
+def test_saturated_llm_pool_degrades():
+    """A full LLM pool sends new requests to their fallback"""
+    async def scenario():
+        controller = AdmissionController("test", max_in_flight=10, degrade_at=10)
+        controller.pool = Bulkhead("llm", workers=1, queue_limit=0, timeout=5)
+        release = threading.Event()
+        busy = asyncio.ensure_future(controller.pool.run(release.wait))
+        await asyncio.sleep(0.05)
+        with controller.admit() as degraded:
+            pass
+        release.set()
+        await busy
+        controller.pool.shutdown()
+        return degraded
+
+    assert asyncio.run(scenario()) is True
+    print("✅ Saturated LLM pool degrades new requests")
+
+
+def test_db_only_messages_skip_admission():
+    """Mood/CGM commands, greetings and emergencies never reach the LLM"""
+    for text in ("", "mood: happy", "cgm: 140", "mood: sad, cgm: 90", "call 911 chest pain"):
+        assert not needs_llm(text), text
+    for text in ("food: poha", "plan", "what is insulin?", "mood: happy, food: dosa"):
+        assert needs_llm(text), text
+    # Moods the lexicon cannot place ask the LLM, so they are admitted like any LLM call
+    for text in ("my mood is weird today", "mood: blah, cgm: 120"):
+        assert needs_llm(text) is mood_lexicon.MOOD_LLM_FALLBACK, text
+    print("✅ DB-only and emergency messages bypass admission")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Admission Control")
+    print("=" * 50)
+    test_degrades_then_rejects()
+    test_saturated_llm_pool_degrades()
+    test_db_only_messages_skip_admission()
+    print("✅ All admission checks passed")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Cohort Analytics Test
+Checks the AGP histogram percentiles and cohort distributions in
+backend/services/analytics.py against NumPy computed on the raw readings,
+with flagged sensor artifacts left out.
+"""
+import json
+import random
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from backend.services import analytics, db
+
+
+def _seed(path, users=12, days=3):
+    """Scratch database: users with alternating diets and readings every 15 minutes"""
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE users(id INTEGER PRIMARY KEY, dietary_preference TEXT, medical_conditions TEXT)")
+    con.execute(
+        "CREATE TABLE cgm_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, glucose_level REAL, timestamp TEXT, quality TEXT)"
+    )
+    rng = random.Random(3)
+    now = datetime.now(timezone.utc)
+    raw = {}
+    for user_id in range(1, users + 1):
+        diet = "vegetarian" if user_id % 2 else "non-vegetarian"
+        conditions = json.dumps(["Type 2 Diabetes"] if user_id % 3 == 0 else [])
+        con.execute("INSERT INTO users VALUES(?,?,?)", (user_id, diet, conditions))
+        rows = [(user_id, round(rng.gauss(140, 35)), (now - timedelta(minutes=15 * i)).isoformat()) for i in range(days * 96)]
+        con.executemany("INSERT INTO cgm_logs(user_id, glucose_level, timestamp) VALUES(?,?,?)", rows)
+        # A compression low the quality filter flagged is stored but left out of every statistic
+        con.execute("INSERT INTO cgm_logs(user_id, glucose_level, timestamp, quality) VALUES(?, 40, ?, 'compression')",
+                    (user_id, (now - timedelta(minutes=7)).isoformat()))
+        raw[user_id] = rows
+    con.commit()
+    con.close()
+    return raw
+
+
+def test_agp_matches_numpy_percentiles(tmp_path):
+    """Histogram percentiles equal nearest-rank percentiles of each time-of-day bin"""
+    original = db.DB_PATH
+    db.DB_PATH = tmp_path / "agp.db"
+    try:
+        raw = _seed(db.DB_PATH)
+        report = analytics.user_agp(1, days=7, bin_minutes=60)
+    finally:
+        db.DB_PATH = original
+
+    by_hour = {}
+    for _, glucose, ts in raw[1]:
+        local = datetime.fromisoformat(ts) + timedelta(minutes=analytics.LOCAL_UTC_OFFSET_MINUTES)
+        by_hour.setdefault(local.hour, []).append(min(max(glucose, 40), 400))
+    agp = report["agp"]
+    assert report["readings"] == len(raw[1]) and len(agp["p50"]) == 24
+    for hour, values in by_hour.items():
+        for q in analytics.PERCENTILES:
+            expected = np.percentile(values, q, method="inverted_cdf")
+            assert agp[f"p{q}"][hour] == expected, (hour, q)
+    print("✅ AGP curves match per-bin percentiles")
+
+
+def test_cohort_filters_and_process_pool(tmp_path):
+    """Cohort filters select users; the pooled path equals the inline path"""
+    original, chunk = db.DB_PATH, analytics.ANALYTICS_CHUNK_USERS
+    db.DB_PATH = tmp_path / "cohort.db"
+    try:
+        raw = _seed(db.DB_PATH)
+        assert analytics.cohort_user_ids(condition="type 2 diabetes") == [3, 6, 9, 12]
+        assert analytics.cohort_user_ids(diet="Vegetarian", condition="diabetes") == [3, 9]
+        inline = analytics.cohort_report(diet="vegetarian")
+        analytics.ANALYTICS_CHUNK_USERS = 2
+        pooled = analytics.cohort_report(diet="vegetarian")
+    finally:
+        analytics.shutdown()
+        db.DB_PATH, analytics.ANALYTICS_CHUNK_USERS = original, chunk
+
+    assert pooled == inline and inline["users"] == inline["users_with_readings"] == 6
+    means = [np.mean([g for _, g, _ in raw[u]]) for u in range(1, 13, 2)]
+    assert inline["distributions"]["mean"][2] == round(float(np.percentile(means, 50)), 1)
+    print(f"✅ Cohort of {inline['users']} users, median TIR {inline['distributions']['tir'][2]}%")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("🧪 Testing Cohort Analytics")
+    print("=" * 50)
+    with tempfile.TemporaryDirectory() as tmp:
+        test_agp_matches_numpy_percentiles(Path(tmp))
+        test_cohort_filters_and_process_pool(Path(tmp))
+    print("✅ All analytics checks passed")
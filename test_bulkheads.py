@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Bulkhead Pool Test
+Checks that backend/services/bulkheads.py bounds each pool, times out slow
+work and keeps one saturated pool from delaying another.
+"""
+import asyncio
+import threading
+import time
+
+from backend.services.bulkheads import Bulkhead, BulkheadFull, BulkheadTimeout
+
+
+def test_rejects_beyond_capacity():
+    """workers + queue_limit tasks are admitted; the next one is rejected"""
+    async def scenario():
+        pool = Bulkhead("test", workers=1, queue_limit=1, timeout=5)
+        release = threading.Event()
+        running = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        try:
+            await pool.run(time.sleep, 0)
+        except BulkheadFull:
+            pass
+        else:
+            raise AssertionError("third task was admitted")
+        stats = pool.stats()
+        release.set()
+        await asyncio.gather(*running)
+        pool.shutdown()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["active"] == 1 and stats["queued"] == 1 and stats["rejected"] == 1
+    assert stats["saturation"] == 1.0
+    print("✅ Pool rejects work beyond capacity")
+
+
+def test_timeout_keeps_slot_until_thread_finishes():
+    """A timed-out task stays counted until its thread actually returns"""
+    async def scenario():
+        pool = Bulkhead("test", workers=1, queue_limit=0, timeout=0.05)
+        try:
+            await pool.run(time.sleep, 0.3)
+        except BulkheadTimeout:
+            pass
+        else:
+            raise AssertionError("slow task did not time out")
+        during = pool.stats()
+        await asyncio.sleep(0.4)
+        after = pool.stats()
+        pool.shutdown()
+        return during, after
+
+    during, after = asyncio.run(scenario())
+    assert during["timeouts"] == 1 and during["active"] == 1
+    assert after["active"] == 0 and after["completed"] == 1
+    print("✅ Timeouts tracked without freeing busy workers")
+
+
+def test_saturated_pool_does_not_delay_another():
+    """DB work stays fast while the LLM pool is full of slow calls"""
+    async def scenario():
+        llm = Bulkhead("llm", workers=2, queue_limit=8, timeout=5)
+        dbp = Bulkhead("db", workers=2, queue_limit=8, timeout=5)
+        slow = [asyncio.ensure_future(llm.run(time.sleep, 0.3)) for _ in range(10)]
+        await asyncio.sleep(0.02)
+        started = time.perf_counter()
+        await dbp.run(time.sleep, 0.01)
+        elapsed = time.perf_counter() - started
+        await asyncio.gather(*slow)
+        llm.shutdown()
+        dbp.shutdown()
+        return elapsed
+
+    elapsed = asyncio.run(scenario())
+    assert elapsed < 0.2, elapsed
+    print(f"✅ DB call took {elapsed * 1000:.0f} ms with the LLM pool saturated")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Bulkhead Pools")
+    print("=" * 50)
+    test_rejects_beyond_capacity()
+    test_timeout_keeps_slot_until_thread_finishes()
+    test_saturated_pool_does_not_delay_another()
+    print("✅ All bulkhead checks passed")
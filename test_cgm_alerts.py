@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Predictive Alert Test
+Checks trend projection, hysteresis and deduplication in
+backend/services/cgm_alerts.py on synthetic glucose traces.
+"""
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+from backend.services.cgm_alerts import AlertEngine, TrendWindow
+
+
+def _connection():
+    con = sqlite3.connect(":memory:")
+    con.execute("CREATE TABLE cgm_logs(id INTEGER PRIMARY KEY, user_id INTEGER, glucose_level REAL, timestamp TEXT, quality TEXT)")
+    con.execute(
+        "CREATE TABLE cgm_alerts(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, kind TEXT, message TEXT, "
+        "glucose REAL, slope REAL, projected REAL, created_at TEXT, resolved_at TEXT)"
+    )
+    return con
+
+
+def _feed(engine, con, values, start, step_minutes=5):
+    raised = []
+    for i, value in enumerate(values):
+        ts = (start + timedelta(minutes=step_minutes * i)).isoformat()
+        raised.extend(engine.observe(con, 1, value, ts))
+    return raised
+
+
+def _open(con, kind):
+    return con.execute("SELECT COUNT(*) FROM cgm_alerts WHERE kind=? AND resolved_at IS NULL", (kind,)).fetchone()[0]
+
+
+def test_trend_window_slope():
+    """A straight line is recovered exactly; old points leave the window"""
+    window = TrendWindow(30)
+    for i in range(20):
+        window.add(i * 300.0, 200 - 3 * (5 * i))
+    fitted, slope = window.trend()
+    assert abs(slope + 3) < 1e-9 and abs(fitted - (200 - 15 * 19)) < 1e-6
+    assert len(window.points) == 7
+    print("✅ Trend window fits slope and slides")
+
+
+def test_predicted_low_raised_once_and_clears_with_hysteresis():
+    """A falling trace raises one predicted_low; it clears only well above the threshold"""
+    engine, con = AlertEngine(), _connection()
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    falling = [150, 140, 130, 120, 110, 100, 95, 92, 90, 88]
+    raised = _feed(engine, con, falling, start)
+    assert [a["kind"] for a in raised] == ["predicted_low"], raised
+    # Hovering around the threshold does not re-raise or clear
+    raised = _feed(engine, con, [80, 76, 77, 75, 76, 77, 76], start + timedelta(minutes=50))
+    assert raised == [] and _open(con, "predicted_low") == 1
+    # Recovering well above the threshold resolves it
+    _feed(engine, con, [100, 115, 125, 135, 140, 142, 143], start + timedelta(minutes=85))
+    assert _open(con, "predicted_low") == 0
+    print("✅ Predicted low raised once and cleared with hysteresis")
+
+
+def test_rapid_rise_and_cooldown():
+    """A steep rise alerts; a second rise inside the cooldown stays quiet"""
+    engine, con = AlertEngine(), _connection()
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    raised = _feed(engine, con, [100, 115, 130, 145, 160], start)
+    assert [a["kind"] for a in raised] == ["rapid_rise"]
+    _feed(engine, con, [160, 161, 160, 161, 160, 161, 160], start + timedelta(minutes=25))
+    raised = _feed(engine, con, [175, 190, 205], start + timedelta(minutes=60))
+    assert raised == [], raised
+    print("✅ Rapid rise alerted once, then cooled down")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Predictive Alerts")
+    print("=" * 50)
+    test_trend_window_slope()
+    test_predicted_low_raised_once_and_clears_with_hysteresis()
+    test_rapid_rise_and_cooldown()
+    print("✅ All predictive alert checks passed")
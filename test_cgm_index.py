@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+CGM Prefix-Sum Index Test
+Checks backend/services/cgm_index.py: the min/max sparse table after
+incremental splices, range statistics against a direct computation over
+arbitrary (partial-hour) ranges including back-filled readings, and the
+/history/cgm/summary route, and that a borrowed (pipeline) connection is
+never committed by the index nor caches rows that are later rolled back.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routers import history
+from backend.services import cgm_index, cgm_stats, db
+from backend.services.cgm_index import SparseExtremes
+
+
+def test_sparse_table_matches_brute_force():
+    """Appends, back-fills and rewrites of the tail all keep queries exact"""
+    rng = np.random.default_rng(5)
+    table = SparseExtremes()
+    hours, mins, maxs = np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+    for _ in range(60):
+        at = int(rng.integers(0, 400))
+        keep = hours < at
+        new_hours = np.unique(np.concatenate([hours[~keep], rng.integers(at, at + 20, 3)]))
+        new_mins = rng.uniform(40, 150, len(new_hours))
+        new_maxs = new_mins + rng.uniform(0, 100, len(new_hours))
+        table.splice(new_hours, new_mins, new_maxs)
+        hours = np.concatenate([hours[keep], new_hours])
+        mins = np.concatenate([mins[keep], new_mins])
+        maxs = np.concatenate([maxs[keep], new_maxs])
+        for _ in range(20):
+            lo, hi = sorted(rng.integers(-5, 430, 2))
+            inside = (hours >= lo) & (hours < hi)
+            expected = (float(mins[inside].min()), float(maxs[inside].max())) if inside.any() else (None, None)
+            assert table.query(int(lo), int(hi)) == expected, (lo, hi)
+    print("✅ Sparse table agrees with brute force after splices")
+
+
+def test_range_statistics_match_direct_computation(tmp_path):
+    """Any range, including partial hours and back-filled readings, equals numpy over the raw rows"""
+    original = db.DB_PATH
+    db.DB_PATH = tmp_path / "index.db"
+    try:
+        con = db.get_db()
+        con.execute(
+            "CREATE TABLE cgm_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, "
+            "glucose_level REAL, alert_level TEXT, timestamp TEXT, quality TEXT)"
+        )
+        base = datetime(2026, 2, 1, tzinfo=timezone.utc)
+        rng = random.Random(8)
+        # Readings that predate the index are picked up by the first query
+        old = [(round(rng.uniform(50, 280), 1), (base + timedelta(minutes=5 * i)).isoformat()) for i in range(300)]
+        con.executemany("INSERT INTO cgm_logs(user_id, glucose_level, timestamp) VALUES(1, ?, ?)", old)
+        con.commit(); con.close()
+        for ensure in (db.ensure_cgm_stats_tables, db.ensure_cgm_alert_table,
+                       db.ensure_cgm_quality_tables, db.ensure_cgm_forecast_table):
+            ensure()
+        first = cgm_index.get_range(1, base, base + timedelta(days=1))
+        assert first["readings"] == 288
+
+        readings = [(t, g) for g, t in old]
+        # Live readings follow, then a back-filled one lands in the middle of the history
+        for i in range(300, 700):
+            value = 100 + 60 * np.sin(i / 20) + rng.uniform(-3, 3)
+            ts = (base + timedelta(minutes=5 * i)).isoformat()
+            db.insert_cgm(1, round(value, 1), ts)
+            readings.append((ts, round(value, 1)))
+        backfill = (base + timedelta(hours=3, minutes=7)).isoformat()
+        db.insert_cgm(1, 60.0, backfill)
+        readings.append((backfill, 60.0))
+
+        # The first live reading is a jump from the random history and is left out
+        con = db.get_db()
+        flagged = {row[0] for row in con.execute("SELECT timestamp FROM cgm_logs WHERE quality NOT IN ('ok')")}
+        con.close()
+        assert len(flagged) == 1
+        readings = [(t, g) for t, g in readings if t not in flagged]
+        seconds = np.array([datetime.fromisoformat(t).timestamp() for t, _ in readings])
+        values = np.array([g for _, g in readings])
+        span = 700 * 300
+        for _ in range(40):
+            lo, hi = sorted(rng.uniform(-3600, span + 3600) for _ in range(2))
+            inside = values[(seconds >= base.timestamp() + lo) & (seconds < base.timestamp() + hi)]
+            got = cgm_index.get_range(1, base + timedelta(seconds=lo), base + timedelta(seconds=hi))
+            assert got["readings"] == len(inside)
+            if not len(inside):
+                continue
+            assert abs(got["mean"] - inside.mean()) < 0.051
+            if len(inside) > 1:
+                assert abs(got["sd"] - inside.std(ddof=1)) < 0.051
+            assert got["min"] == inside.min() and got["max"] == inside.max()
+            assert abs(got["tir"] - 100 * ((inside >= 70) & (inside <= 180)).mean()) < 0.051
+            assert abs(got["tbr"] - 100 * (inside < 70).mean()) < 0.051
+
+        app = FastAPI()
+        app.include_router(history.router)
+        client = TestClient(app)
+        params = {"from": base.isoformat(), "to": (base + timedelta(days=3)).isoformat()}
+        summary = client.get("/history/cgm/summary/1", params=params).json()
+        assert summary["readings"] == len(values) and summary["min"] == values.min()
+        reversed_range = {"from": params["to"], "to": params["from"]}
+        assert client.get("/history/cgm/summary/1", params=reversed_range).status_code == 400
+    finally:
+        db.DB_PATH = original
+    print("✅ Range statistics exact to the second")
+
+
+def test_borrowed_connection_is_not_committed(tmp_path):
+    """A CGM step inside someone else's transaction rolls back with it, index and all"""
+    from agno_agents.cgm_agent import CGMAgent
+
+    original = db.DB_PATH
+    db.DB_PATH = tmp_path / "borrowed.db"
+    try:
+        con = db.get_db()
+        con.execute(
+            "CREATE TABLE cgm_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, "
+            "glucose_level REAL, alert_level TEXT, timestamp TEXT, quality TEXT)"
+        )
+        base = datetime.now(timezone.utc) - timedelta(days=2)
+        con.executemany(
+            "INSERT INTO cgm_logs(user_id, glucose_level, timestamp) VALUES(1, ?, ?)",
+            [(120 + i % 7, (base + timedelta(minutes=5 * i)).isoformat()) for i in range(100)],
+        )
+        con.commit(); con.close()
+        for ensure in (db.ensure_cgm_stats_tables, db.ensure_cgm_alert_table,
+                       db.ensure_cgm_quality_tables, db.ensure_cgm_forecast_table):
+            ensure()
+        agent = CGMAgent()
+        agent.db_path = db.DB_PATH
+        con = db.get_db()
+        try:
+            with con:
+                con.execute("INSERT INTO cgm_logs(user_id, glucose_level, timestamp) VALUES(2, 99, ?)", (base.isoformat(),))
+                result = agent.log_reading(1, 125, conn=con)
+                assert result["success"] and result["average_reading"] > 0
+                # Nothing is committed yet, so the push events go back to the caller
+                assert [kind for kind, _ in result["push_events"]] == ["cgm"]
+                raise RuntimeError("a later pipeline step failed")
+        except RuntimeError:
+            pass
+        counts = con.execute(
+            "SELECT (SELECT COUNT(*) FROM cgm_logs), (SELECT COUNT(*) FROM cgm_prefix), (SELECT COUNT(*) FROM cgm_hourly)"
+        ).fetchone()
+        con.close()
+        assert tuple(counts) == (100, 0, 0)
+    finally:
+        db.DB_PATH = original
+    print("✅ Borrowed connections are left for the caller to commit")
+
+
+def test_rolled_back_extremes_are_not_cached(tmp_path):
+    """A low read back inside a transaction that rolls back never reaches the min/max cache"""
+    original = db.DB_PATH
+    db.DB_PATH = tmp_path / "rollback.db"
+    try:
+        con = db.get_db()
+        con.execute(
+            "CREATE TABLE cgm_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, "
+            "glucose_level REAL, alert_level TEXT, timestamp TEXT, quality TEXT)"
+        )
+        con.commit(); con.close()
+        for ensure in (db.ensure_cgm_stats_tables, db.ensure_cgm_alert_table,
+                       db.ensure_cgm_quality_tables, db.ensure_cgm_forecast_table):
+            ensure()
+        base = datetime(2026, 3, 1, tzinfo=timezone.utc)
+        for i in range(30):
+            db.insert_cgm(3, 120.0, (base + timedelta(minutes=5 * i)).isoformat())
+        start, end = base - timedelta(hours=1), base + timedelta(hours=6)
+        assert cgm_index.get_range(3, start, end)["min"] == 120
+
+        con = db.get_db()
+        ts = (base + timedelta(minutes=150)).isoformat()
+        con.execute("INSERT INTO cgm_logs(user_id, glucose_level, timestamp, quality) VALUES(3, 45, ?, 'ok')", (ts,))
+        cgm_stats.record_reading(con, 3, 45.0, ts)
+        cgm_index.record_reading(con, 3, 45.0, ts)
+        # The step reads its own write, then the pipeline rolls back
+        assert cgm_index.range_moments(con, 3, start.timestamp(), end.timestamp()).min == 45
+        con.rollback(); con.close()
+
+        db.insert_cgm(3, 130.0, (base + timedelta(minutes=155)).isoformat())
+        summary = cgm_index.get_range(3, start, end)
+        assert (summary["min"], summary["max"], summary["readings"]) == (120, 130, 31)
+    finally:
+        db.DB_PATH = original
+    print("✅ Rolled-back readings never reach the extremes cache")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("🧪 Testing CGM Prefix-Sum Index")
+    print("=" * 50)
+    test_sparse_table_matches_brute_force()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_range_statistics_match_direct_computation(Path(tmp))
+        test_borrowed_connection_is_not_committed(Path(tmp))
+        test_rolled_back_extremes_are_not_cached(Path(tmp))
+    print("🎉 All prefix-sum index tests passed!")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+CGM Quality Filter Test
+Checks the streaming classifier in backend/services/cgm_quality.py on
+synthetic sensor artifacts, that flagged readings stay out of the stats,
+and that a suspect low is never hidden from alerting.
+"""
+from datetime import datetime, timedelta, timezone
+
+from backend.services import cgm_alerts, cgm_quality, cgm_stats, db
+
+
+def _flags(values, step_minutes=5, start=0.0, state=None):
+    flags = []
+    for i, value in enumerate(values):
+        seconds = start + i * step_minutes * 60
+        if value is None:
+            continue
+        state, flag, _ = cgm_quality.classify(state, seconds, value)
+        flags.append(flag)
+    return flags, state
+
+
+def _settled(values, **kwargs):
+    """Flags after an hour-long steady lead-in, so the session is past warm-up"""
+    lead = [120.0] * 13
+    flags, _ = _flags(lead + values, **kwargs)
+    return flags[len(lead):]
+
+
+def test_spikes_and_compression_are_flagged():
+    """A lone spike is a jump; a sudden low is compression until it recovers"""
+    assert _settled([121, 190, 122, 124]) == ["ok", "jump", "ok", "ok"]
+    # A lasting step (e.g. after calibration) is accepted once a second reading confirms it
+    assert _settled([121, 180, 182, 183]) == ["ok", "jump", "ok", "ok"]
+    assert _settled([118, 62, 60, 65, 110, 115]) == ["ok", "compression", "compression", "compression", "ok", "ok"]
+    # A real low that persists is trusted after COMPRESSION_MAX_MINUTES
+    flags = _settled([118, 62] + [58] * 14)
+    assert flags[:2] == ["ok", "compression"] and flags[-1] == "ok"
+    assert flags.index("ok", 1) == 2 + int(cgm_quality.COMPRESSION_MAX_MINUTES // 5)
+    # Gradual falls and rises are left alone
+    assert set(_settled([120 - 3 * 5 * i for i in range(4)] + [70, 65, 66])) == {"ok"}
+    print("✅ Jumps and compression lows flagged, real changes trusted")
+
+
+def test_warmup_and_gaps():
+    """New sessions use a tighter limit; only a live stream going silent is a gap"""
+    # 12 mg/dL per 5 minutes: fine once settled, noise during warm-up
+    assert _flags([120, 132, 120, 121])[0] == ["ok", "warmup", "ok", "ok"]
+    assert _settled([132, 120]) == ["ok", "ok"]
+
+    state, gaps = None, []
+    for minute in (0, 5, 10, 15, 60, 65, 300, 540):
+        state, _, gap_start = cgm_quality.classify(state, minute * 60.0, 120.0)
+        gaps.append(gap_start)
+    # 15 -> 60 breaks a 5-minute stream; 65 -> 300 does too; 300 -> 540 is hand entry hours apart
+    assert gaps == [None, None, None, None, 15 * 60, None, 65 * 60, None]
+    assert state.session_start == 540 * 60
+    print("✅ Warm-up noise flagged and stream gaps detected")
+
+
+def test_flagged_readings_stay_out_of_stats(tmp_path):
+    """insert_cgm stores the flag; stats, alerts and the report respect it"""
+    original = db.DB_PATH
+    db.DB_PATH = tmp_path / "quality.db"
+    try:
+        con = db.get_db()
+        con.execute(
+            "CREATE TABLE cgm_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, "
+            "glucose_level REAL, alert_level TEXT, timestamp TEXT)"
+        )
+        con.commit(); con.close()
+        db.ensure_cgm_stats_tables()
+        db.ensure_cgm_alert_table()
+        db.ensure_cgm_quality_tables()
+        db.ensure_cgm_forecast_table()
+        start = datetime.now(timezone.utc).replace(second=0, microsecond=0) - timedelta(hours=3)
+        values = [110.0] * 20 + [300.0] + [112.0] * 10 + [None] * 6 + [115.0] * 5
+        for i, value in enumerate(values):
+            if value is not None:
+                db.insert_cgm(1, value, (start + timedelta(minutes=5 * i)).isoformat())
+
+        stats = cgm_stats.get_stats(1)["windows"]["24h"]
+        assert stats["readings"] == 35 and stats["max"] == 115
+        history = db.get_cgm_history(1, limit=100)
+        assert [r["quality"] for r in history if r["glucose_level"] == 300] == ["jump"]
+        report = cgm_quality.get_quality(1)
+        assert report["flags"]["jump"] == 1 and report["readings"] == 36
+        assert [g["minutes"] for g in report["gaps"]] == [35.0]
+    finally:
+        db.DB_PATH = original
+    print("✅ Flagged readings stored but excluded from statistics")
+
+
+def test_lows_are_never_hidden(tmp_path):
+    """Readings below 54 mg/dL are always trusted; flagged lows still raise an alert"""
+    assert _settled([118, 50, 48]) == ["ok", "ok", "ok"]
+    # A fast drop ends its compression window as soon as it goes below 54
+    assert _settled([118, 62, 52, 60]) == ["ok", "compression", "ok", "ok"]
+
+    original = db.DB_PATH
+    db.DB_PATH = tmp_path / "lows.db"
+    try:
+        con = db.get_db()
+        con.execute(
+            "CREATE TABLE cgm_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, "
+            "glucose_level REAL, alert_level TEXT, timestamp TEXT)"
+        )
+        con.commit(); con.close()
+        for ensure in (db.ensure_cgm_stats_tables, db.ensure_cgm_alert_table,
+                       db.ensure_cgm_quality_tables, db.ensure_cgm_forecast_table):
+            ensure()
+        cgm_alerts.ENGINE.forget(7)
+        start = datetime.now(timezone.utc).replace(second=0, microsecond=0) - timedelta(hours=2)
+        values = [118.0] * 13 + [62.0, 60.0, 61.0, 120.0]
+        for i, value in enumerate(values):
+            db.insert_cgm(7, value, (start + timedelta(minutes=5 * i)).isoformat())
+        alerts = cgm_alerts.get_alerts(7)
+        assert [a["kind"] for a in alerts] == ["possible_low"]
+        assert alerts[0]["glucose"] == 62.0 and alerts[0]["resolved_at"] is not None  # cleared by the 120
+        assert "⚠️ POSSIBLE LOW" in alerts[0]["message"]
+    finally:
+        cgm_alerts.ENGINE.forget(7)
+        db.DB_PATH = original
+    print("✅ Severe lows trusted, suspect lows still alerted")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("🧪 Testing CGM Quality Filter")
+    print("=" * 50)
+    test_spikes_and_compression_are_flagged()
+    test_warmup_and_gaps()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_flagged_readings_stay_out_of_stats(Path(tmp))
+        test_lows_are_never_hidden(Path(tmp))
+    print("🎉 All CGM quality tests passed!")
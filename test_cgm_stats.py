@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+CGM Statistics Test
+Checks the incremental aggregates in backend/services/cgm_stats.py against a
+direct computation over the raw readings.
+"""
+import random
+import sqlite3
+import statistics
+from datetime import datetime, timedelta, timezone
+
+from backend.services import cgm_stats, db
+from backend.services.cgm_stats import Moments
+
+
+def _database(path):
+    """Point the db module at a scratch database with the cgm_logs columns the agents use"""
+    db.DB_PATH = path
+    db.ensure_cgm_stats_tables()
+    con = db.get_db()
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS cgm_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, "
+        "glucose_level REAL, alert_level TEXT, timestamp TEXT, quality TEXT)"
+    )
+    con.commit()
+    return con
+
+
+def test_merge_and_remove_match_direct_moments():
+    """Chan merge and its inverse agree with statistics over the raw values"""
+    rng = random.Random(7)
+    values = [rng.uniform(50, 300) for _ in range(500)]
+    left, right, whole = Moments(), Moments(), Moments()
+    for x in values[:200]:
+        left.add(x)
+    for x in values[200:]:
+        right.add(x)
+    for x in values:
+        whole.add(x)
+    left.merge(right)
+    assert left.n == whole.n and abs(left.mean - statistics.mean(values)) < 1e-9
+    assert abs(left.sd - statistics.stdev(values)) < 1e-9
+    left.remove(right)
+    assert abs(left.sd - statistics.stdev(values[:200])) < 1e-9
+    assert left.in_range == sum(70 <= x <= 180 for x in values[:200])
+    print("✅ Welford/Chan moments match direct computation")
+
+
+def test_windows_follow_readings(tmp_path):
+    """Each window covers exactly the readings of its last N hours"""
+    original = db.DB_PATH
+    try:
+        con = _database(tmp_path / "stats.db")
+        rng = random.Random(1)
+        now = datetime.now(timezone.utc)
+        readings = []
+        for i in range(20 * 24 * 4):
+            ts = (now - timedelta(minutes=15 * i)).isoformat()
+            readings.append((rng.gauss(150, 45), ts))
+        con.executemany("INSERT INTO cgm_logs(user_id, glucose_level, timestamp) VALUES(1, ?, ?)", readings[1:])
+        con.commit()
+        # First access rebuilds from cgm_logs, the newest reading arrives incrementally
+        stats = cgm_stats.get_stats(1)
+        with con:
+            con.execute("INSERT INTO cgm_logs(user_id, glucose_level, timestamp) VALUES(1, ?, ?)", readings[0])
+            cgm_stats.record_reading(con, 1, *readings[0])
+        stats = cgm_stats.get_stats(1)
+
+        current = cgm_stats.epoch_hour(now.isoformat())
+        for name, hours in cgm_stats.WINDOWS.items():
+            values = [x for x, ts in readings if cgm_stats.epoch_hour(ts) > current - hours]
+            window = stats["windows"][name]
+            assert window["readings"] == len(values), name
+            assert abs(window["mean"] - statistics.mean(values)) < 0.06, name
+            assert abs(window["sd"] - statistics.stdev(values)) < 0.06, name
+            assert window["tir"] == round(100 * sum(70 <= x <= 180 for x in values) / len(values), 1), name
+            assert window["min"] == min(values) and window["max"] == max(values), name
+            assert window["mage"] is not None and window["mage"] > window["sd"], name
+        assert stats["revision"] == len(readings)
+        con.close()
+    finally:
+        db.DB_PATH = original
+    print(f"✅ Windowed stats match raw readings (24h TIR {stats['windows']['24h']['tir']}%)")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("🧪 Testing CGM Statistics")
+    print("=" * 50)
+    test_merge_and_remove_match_direct_moments()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_windows_follow_readings(Path(tmp))
+    print("✅ All CGM statistics checks passed")
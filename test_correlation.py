@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Correlation Engine Test
+Checks the grid kernels and the cached per-user report in
+backend/services/correlation.py on a series with a planted lag and on logs
+with category-specific meal responses.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from backend.services import cgm_stats, correlation, db
+
+
+def test_lagged_correlation_finds_planted_lag():
+    """y follows -x three cells later; r is about -1 at lag +3 only"""
+    rng = np.random.default_rng(4)
+    x = rng.normal(size=400)
+    y = np.concatenate([rng.normal(size=3), -x[:-3]])
+    y[::7] = np.nan
+    lags, r, pairs = correlation.lagged_correlation(x, y, 8)
+    best = int(np.nanargmax(np.abs(r)))
+    assert lags[best] == 3 and r[best] < -0.99
+    assert np.nanmax(np.abs(np.delete(r, best))) < 0.3
+    # Direct check of one lag
+    mask = ~np.isnan(y[8 + 3:400 - 8 + 3])
+    direct = np.corrcoef(x[8:392][mask], y[11:395][mask])[0, 1]
+    assert abs(r[best] - direct) < 1e-9 and pairs[best] == mask.sum()
+    print("✅ Lagged cross-correlation recovers the planted lag")
+
+
+def test_hold_and_excursions():
+    """Mood holds forward for a bounded time; excursions are peak minus baseline"""
+    held = correlation.hold(np.array([np.nan, 3.0, np.nan, np.nan, np.nan, 5.0, np.nan]), 2)
+    assert np.isnan(held[0]) and list(held[1:4]) == [3, 3, 3] and np.isnan(held[4]) and list(held[5:]) == [5, 5]
+    glucose = np.array([100, 100, 120, 160, 140, np.nan, 110, 100], dtype=float)
+    rise, to_peak = correlation.excursions(glucose, np.array([1, 6]), 4)
+    assert rise[0] == 60 and to_peak[0] == 2
+    # Baseline skips the missing cell before the meal; only one reading follows it
+    assert rise[1] == -10 and to_peak[1] == 1
+    print("✅ Mood hold and meal excursions computed on the grid")
+
+
+def test_report_is_cached_until_new_data(tmp_path):
+    """Carb-rich meals spike, protein-rich do not; the cache refreshes after a new log"""
+    original = db.DB_PATH
+    db.DB_PATH = tmp_path / "correlation.db"
+    try:
+        db.ensure_cgm_stats_tables()
+        con = db.get_db()
+        con.executescript("""
+            CREATE TABLE cgm_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, glucose_level REAL, alert_level TEXT, timestamp TEXT, quality TEXT);
+            CREATE TABLE mood_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, mood TEXT, score INTEGER, timestamp TEXT);
+            CREATE TABLE food_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, meal_description TEXT, nutrition_analysis TEXT, timestamp TEXT);
+        """)
+        now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        start = now - timedelta(days=10)
+        minutes = np.arange(0, 10 * 1440, 5)
+        glucose = np.full(len(minutes), 110.0)
+        meals = []
+        for day in range(10):
+            for hour, description, analysis, rise in ((8, "poha", "carb-rich", 80), (13, "grilled chicken", None, 10)):
+                at = day * 1440 + hour * 60
+                meals.append((description, json.dumps({"primary_macros": analysis}) if analysis else None, at))
+                after = (minutes > at) & (minutes <= at + 120)
+                glucose[after] += rise * np.sin(np.pi * (minutes[after] - at) / 240)
+        con.executemany(
+            "INSERT INTO cgm_logs(user_id, glucose_level, timestamp) VALUES(1, ?, ?)",
+            [(float(g), (start + timedelta(minutes=int(m))).isoformat()) for m, g in zip(minutes, glucose)],
+        )
+        con.executemany(
+            "INSERT INTO food_logs(user_id, meal_description, nutrition_analysis, timestamp) VALUES(1, ?, ?, ?)",
+            [(d, a, (start + timedelta(minutes=m)).isoformat()) for d, a, m in meals],
+        )
+        cgm_stats.rebuild(con, 1)
+        con.commit(); con.close()
+
+        report = correlation.user_correlation(1, days=11)
+        categories = report["food_categories"]
+        assert categories["carb-rich"]["meals"] == 10 and categories["protein-rich"]["meals"] == 10
+        assert categories["carb-rich"]["mean_excursion"] > 60 and categories["carb-rich"]["spike_rate"] == 1.0
+        assert categories["protein-rich"]["mean_excursion"] < 15
+        assert 90 <= categories["carb-rich"]["mean_minutes_to_peak"] <= 135
+        assert not report["cached"] and correlation.user_correlation(1, days=11)["cached"]
+
+        db.ensure_nutrition_tables()
+        db.insert_food(1, "dal rice", now.isoformat())
+        refreshed = correlation.user_correlation(1, days=11)
+        assert not refreshed["cached"] and refreshed["readings"]["meals"] == 21
+    finally:
+        db.DB_PATH = original
+    print("✅ Per-category excursions computed and cached until new data")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("🧪 Testing Correlation Engine")
+    print("=" * 50)
+    test_lagged_correlation_finds_planted_lag()
+    test_hold_and_excursions()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_report_is_cached_until_new_data(Path(tmp))
+    print("🎉 All correlation tests passed!")
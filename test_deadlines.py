@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Request Deadline Test
+Checks that backend/services/deadlines.py budgets tighten when nested, follow
+work into the bulkhead pools and interrupt long SQLite statements.
+"""
+import asyncio
+import sqlite3
+
+from backend.services import deadlines
+from backend.services.bulkheads import Bulkhead
+from backend.services.deadlines import DeadlineExceeded, deadline
+
+
+def test_nested_deadlines_only_tighten():
+    """An inner deadline cannot extend the outer one"""
+    assert deadlines.remaining() is None and deadlines.budget(5.0) == 5.0
+    with deadline(1.0):
+        with deadline(60.0):
+            assert deadlines.remaining() <= 1.0
+        with deadline(0):
+            assert deadlines.expired() and deadlines.budget(5.0) == 0.0
+            try:
+                deadlines.check("test stage")
+            except DeadlineExceeded as e:
+                assert e.stage == "test stage"
+            else:
+                raise AssertionError("expired deadline did not raise")
+        assert not deadlines.expired()
+    assert deadlines.remaining() is None
+    print("✅ Nested deadlines tighten and reset")
+
+
+def test_deadline_follows_work_into_pool():
+    """Pool threads see the caller's deadline and the wait is capped by it"""
+    async def scenario():
+        pool = Bulkhead("test", workers=1, queue_limit=0, timeout=30)
+        with deadline(5.0):
+            seen = await pool.run(deadlines.remaining)
+        pool.shutdown()
+        return seen
+
+    seen = asyncio.run(scenario())
+    assert seen is not None and 0 < seen <= 5.0
+    print("✅ Deadline carried into pool threads")
+
+
+def test_guard_interrupts_long_query():
+    """A statement still running past the deadline is interrupted"""
+    with deadline(0.05):
+        conn = deadlines.guard(sqlite3.connect(":memory:"))
+        try:
+            conn.execute(
+                "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT count(*) FROM n"
+            ).fetchone()
+        except sqlite3.OperationalError as e:
+            assert "interrupt" in str(e)
+        else:
+            raise AssertionError("query was not interrupted")
+        finally:
+            conn.close()
+    print("✅ Long query interrupted at the deadline")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Request Deadlines")
+    print("=" * 50)
+    test_nested_deadlines_only_tighten()
+    test_deadline_follows_work_into_pool()
+    test_guard_interrupts_long_query()
+    print("✅ All deadline checks passed")
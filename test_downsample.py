@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Chart Downsampling Test
+Checks LTTB and min/max bucketing in backend/services/downsample.py, and that
+series built from the hourly rollups agree with the raw readings, flagged
+readings left out of both.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from backend.services import cgm_stats, db, downsample
+
+
+def test_lttb_keeps_shape():
+    """Endpoints and an isolated spike survive; the result is ordered and sized"""
+    x = np.arange(5000, dtype=np.float64) * 300
+    y = 120 + 10 * np.sin(x / 20000)
+    y[3210] = 320
+    keep = downsample.lttb(x, y, 200)
+    assert len(keep) == 200 and keep[0] == 0 and keep[-1] == 4999
+    assert np.all(np.diff(keep) > 0) and 3210 in keep
+    assert list(downsample.lttb(x[:50], y[:50], 200)) == list(range(50))
+    print("✅ LTTB keeps endpoints and spikes")
+
+
+def test_minmax_buckets_never_hide_extremes():
+    """Bucket min/max/count match a direct computation per bucket"""
+    rng = np.random.default_rng(2)
+    x = np.sort(rng.uniform(0, 86400, 3000))
+    y = rng.normal(140, 40, 3000)
+    starts, counts, lows, highs, means = downsample.minmax(x, y, 0, 3600)
+    assert counts.sum() == 3000 and len(starts) <= 24
+    for start, count, low, high, mean in zip(starts, counts, lows, highs, means):
+        inside = y[(x >= start) & (x < start + 3600)]
+        assert count == len(inside) and low == inside.min() and high == inside.max()
+        assert abs(mean - inside.mean()) < 1e-9
+    print("✅ Min/max buckets match direct computation")
+
+
+def test_long_ranges_use_hourly_rollups(tmp_path):
+    """A 30-day chart comes from cgm_hourly and matches the raw readings it summarizes"""
+    original = db.DB_PATH
+    db.DB_PATH = tmp_path / "series.db"
+    try:
+        db.ensure_cgm_stats_tables()
+        con = db.get_db()
+        con.execute(
+            "CREATE TABLE cgm_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, "
+            "glucose_level REAL, alert_level TEXT, timestamp TEXT, quality TEXT)"
+        )
+        rng = random.Random(5)
+        now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        rows = [(round(rng.gauss(150, 40), 1), (now - timedelta(minutes=5 * i)).isoformat()) for i in range(1, 30 * 288)]
+        con.executemany("INSERT INTO cgm_logs(user_id, glucose_level, timestamp) VALUES(1, ?, ?)", rows)
+        # A flagged jump is left out of raw and hourly series alike
+        con.execute("INSERT INTO cgm_logs(user_id, glucose_level, timestamp, quality) VALUES(1, 399, ?, 'jump')",
+                    ((now - timedelta(minutes=7)).isoformat(),))
+        cgm_stats.rebuild(con, 1)
+        con.commit(); con.close()
+
+        start, end = now - timedelta(days=30), now
+        bands = downsample.cgm_series(1, start, end, max_points=120, method="minmax")
+        assert bands["source"] == "hourly" and len(bands["points"]) <= 120
+        values = [v for v, _ in rows]
+        assert bands["readings"] == len(rows)
+        assert min(p["min"] for p in bands["points"]) == min(values)
+        assert max(p["max"] for p in bands["points"]) == max(values)
+
+        line = downsample.cgm_series(1, start, end, max_points=300)
+        assert line["source"] == "hourly" and len(line["points"]) == 300
+
+        recent = downsample.cgm_series(1, end - timedelta(hours=6), end, max_points=500)
+        assert recent["source"] == "raw" and recent["readings"] == len(recent["points"]) == 72
+        assert max(p["glucose_level"] for p in recent["points"]) == max(v for v, _ in rows[:72])
+    finally:
+        db.DB_PATH = original
+    print("✅ Long ranges come from hourly rollups, short ones from raw readings")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("🧪 Testing Chart Downsampling")
+    print("=" * 50)
+    test_lttb_keeps_shape()
+    test_minmax_buckets_never_hide_extremes()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_long_ranges_use_hourly_rollups(Path(tmp))
+    print("🎉 All downsampling tests passed!")
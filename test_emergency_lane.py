@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Emergency Fast Lane Test
+Checks that backend/services/emergency.py answers emergencies without the
+database and leaves every other message to the normal flow.
+"""
+from backend.services import db, emergency
+
+
+def test_triage_answers_emergencies_only():
+    """Emergency and bare "help" messages get the fixed reply; others pass through"""
+    for text in ("I have chest pain", "call 911", "help"):
+        reply = emergency.triage(text)
+        assert reply is not None and reply["priority"] == "critical", text
+    for text in ("", "mood: happy", "cgm: 140", "food: poha", "what is insulin?", "help me plan meals"):
+        assert emergency.triage(text) is None, text
+    print("✅ Fast lane answers emergencies only")
+
+
+def test_triage_never_opens_the_database():
+    """The fast lane must work even when the database is unavailable"""
+    original = db.get_db
+
+    def unavailable():
+        raise AssertionError("fast lane opened a database connection")
+
+    db.get_db = unavailable
+    try:
+        assert emergency.triage("heart attack") is not None
+    finally:
+        db.get_db = original
+    stats = emergency.stats()
+    assert stats["emergencies"] >= 1 and stats["max_us"] >= stats["p50_us"] > 0
+    print(f"✅ Fast lane p50 {stats['p50_us']} µs without database access")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Emergency Fast Lane")
+    print("=" * 50)
+    test_triage_answers_emergencies_only()
+    test_triage_never_opens_the_database()
+    print("✅ All emergency lane checks passed")
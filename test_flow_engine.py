@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Flow Engine Test
+Checks that agno_workspace/agno.yaml compiles into the expected dispatch
+and transition tables, that agents are only created on first use and
+shared through one registry, and that a multi-command message commits all
+of its steps or none (alert engine state included) and publishes push
+events only after its commit.
+"""
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import yaml
+
+from agno_workspace.flow_engine import FlowEngine
+from agno_workspace.registry import AgentRegistry
+from backend.services import cgm_alerts, db, push
+from backend.services.intents import split_commands
+
+CONFIG = yaml.safe_load((Path(__file__).parent / "agno_workspace" / "agno.yaml").read_text())
+
+
+def test_transition_table():
+    """Flows compile to (flow, agent) -> next lookups"""
+    engine = FlowEngine(CONFIG)
+    assert engine.transitions[("health_tracking_flow", "greeting_agent")] == "mood_tracker_agent"
+    assert engine.transitions[("health_tracking_flow", "meal_planner_agent")] == "complete"
+    assert engine.transitions[("interrupt_flow", "interrupt_agent")] == "return_to_previous"
+    print("✅ Transition table compiled")
+
+
+def test_intent_routes():
+    """Every intent kind routes to exactly one declared agent"""
+    engine = FlowEngine(CONFIG)
+    routes = {kind: step.agent for kind, step in engine.routes.items()}
+    assert routes == {
+        "greeting": "greeting_agent",
+        "mood": "mood_tracker_agent",
+        "cgm": "cgm_agent",
+        "food": "food_intake_agent",
+        "plan": "meal_planner_agent",
+        "general": "interrupt_agent",
+        "emergency": "interrupt_agent",
+    }
+    print("✅ Intent routes compiled")
+
+
+def test_agents_are_lazy():
+    """No agent is constructed until a step needs it"""
+    engine = FlowEngine(CONFIG)
+    assert engine.loaded_agents() == []
+    agent = engine.agent("greeting_agent")
+    assert type(agent).__name__ == "GreetingAgent"
+    assert engine.agent("greeting_agent") is agent
+    assert engine.loaded_agents() == ["greeting_agent"]
+    print("✅ Agents load on first use")
+
+
+def test_registry_is_shared():
+    """Engines built on one registry share agent instances and its load stats"""
+    registry = AgentRegistry.from_config(CONFIG)
+    first, second = FlowEngine(CONFIG, registry), FlowEngine(CONFIG, registry)
+    assert first.agent("cgm_agent") is second.agent("cgm_agent")
+    stats = registry.stats()
+    assert stats["cgm_agent"]["loaded"] and stats["cgm_agent"]["load_ms"] >= 0
+    assert not stats["interrupt_agent"]["loaded"]
+    print("✅ Registry shared between engines")
+
+
+def test_invalid_config_rejected():
+    """Flows referencing undeclared agents fail at startup"""
+    config = {"agents": [], "flows": [{"name": "broken", "steps": [{"agent": "ghost_agent", "next": "complete"}]}]}
+    try:
+        FlowEngine(config)
+    except ValueError as e:
+        assert "ghost_agent" in str(e)
+    else:
+        raise AssertionError("undeclared agent was accepted")
+    print("✅ Invalid flow rejected")
+
+
+class _Writer:
+    """Stands in for a tracking agent: writes one row, then reports `outcome`"""
+
+    def __init__(self, table, outcome="ok"):
+        self.table, self.outcome = table, outcome
+
+    def log(self, user_id, conn=None, **kwargs):
+        conn.execute("INSERT INTO writes(agent, value) VALUES(?, ?)", (self.table, str(kwargs)))
+        if self.outcome == "raise":
+            raise RuntimeError("boom")
+        if self.outcome == "fail":
+            return {"success": False, "message": f"❌ Error in {self.table}"}
+        return {"success": True, "message": f"✅ {self.table} logged", "push_events": [(self.table, kwargs)]}
+
+
+def _pipeline_engine(outcomes):
+    engine = FlowEngine(CONFIG)
+    for name, outcome in zip(("mood_tracker_agent", "cgm_agent", "food_intake_agent"), outcomes):
+        engine.registry._agents[name] = _Writer(name, outcome)
+        engine.steps[name] = engine.steps[name]._replace(entrypoint="log", prepare=None)
+    engine.routes = {kind: engine.steps[step.agent] for kind, step in engine.routes.items()}
+    return engine
+
+
+def test_pipeline_commits_all_or_nothing(tmp_path):
+    """A failed or raising step rolls back every write and leaves the session in place"""
+    original = db.DB_PATH
+    db.DB_PATH = tmp_path / "pipeline.db"
+    try:
+        con = db.get_db()
+        con.execute("CREATE TABLE writes(agent TEXT, value TEXT)")
+        con.commit(); con.close()
+
+        def rows():
+            con = db.get_db()
+            try:
+                return [r[0] for r in con.execute("SELECT agent FROM writes")]
+            finally:
+                con.close()
+
+        fresh = {"current_flow": "health_tracking_flow", "current_step": "mood_tracker_agent", "user_context": {}}
+        commands = split_commands("mood: happy, cgm: 132, ate poha")
+        state = {**fresh, "user_context": {}}
+        result = _pipeline_engine(["ok", "ok", "ok"]).run_pipeline(commands, 1, state)
+        assert result.success and result.data["committed"]
+        assert rows() == ["mood_tracker_agent", "cgm_agent", "food_intake_agent"]
+        assert state["current_step"] == result.next_step == "meal_planner_agent"
+
+        for outcomes in (["ok", "fail", "ok"], ["ok", "ok", "raise"]):
+            state = {**fresh, "user_context": {}}
+            result = _pipeline_engine(outcomes).run_pipeline(commands, 2, state)
+            assert not result.success and not result.data["committed"]
+            assert [step["success"] for step in result.data["steps"]][-1] is False
+            assert "Nothing from this message was saved" in result.message
+            assert state == fresh and result.next_step == "mood_tracker_agent"
+        assert len(rows()) == 3
+
+        # An unusable command stops the message before any step runs
+        state = {**fresh, "user_context": {}}
+        result = _pipeline_engine(["ok", "ok", "ok"]).run_pipeline(split_commands("mood: happy; cgm: abc"), 3, state)
+        assert not result.success and [step["agent"] for step in result.data["steps"]] == ["cgm_agent"]
+        assert len(rows()) == 3 and state == fresh
+    finally:
+        db.DB_PATH = original
+    print("✅ Pipelines commit every step or none")
+
+
+def test_push_events_wait_for_commit(tmp_path):
+    """Events of a committed pipeline are published after the commit; a rolled-back one publishes none"""
+    original, publish = db.DB_PATH, push.publish
+    db.DB_PATH = tmp_path / "push.db"
+    published = []
+
+    def record(user_id, kind, data):
+        con = db.get_db()
+        try:
+            # Another connection must already see the write the event describes
+            visible = con.execute("SELECT COUNT(*) FROM writes WHERE agent=?", (kind,)).fetchone()[0]
+        finally:
+            con.close()
+        published.append((user_id, kind, visible))
+
+    push.publish = record
+    try:
+        con = db.get_db()
+        con.execute("CREATE TABLE writes(agent TEXT, value TEXT)")
+        con.commit(); con.close()
+        commands = split_commands("mood: happy, cgm: 132")
+        state = {"current_flow": "health_tracking_flow", "current_step": "mood_tracker_agent", "user_context": {}}
+        result = _pipeline_engine(["ok", "ok"]).run_pipeline(commands, 4, state)
+        assert result.success and published == [(4, "mood_tracker_agent", 1), (4, "cgm_agent", 1)]
+        assert all("push_events" not in step["result"] for step in result.data["steps"])
+        published.clear()
+        _pipeline_engine(["ok", "fail"]).run_pipeline(commands, 4, state)
+        assert published == []
+    finally:
+        push.publish = publish
+        db.DB_PATH = original
+    print("✅ Push events published only after the commit")
+
+
+def test_rolled_back_alert_is_raised_again(tmp_path):
+    """A predicted low rolled back with its pipeline is not remembered as active"""
+    from agno_agents.cgm_agent import CGMAgent
+
+    original = db.DB_PATH
+    db.DB_PATH = tmp_path / "alerts.db"
+    try:
+        con = db.get_db()
+        con.execute("CREATE TABLE writes(agent TEXT, value TEXT)")
+        con.execute(
+            "CREATE TABLE cgm_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, "
+            "glucose_level REAL, alert_level TEXT, timestamp TEXT, quality TEXT)"
+        )
+        now = datetime.now(timezone.utc)
+        con.executemany(
+            "INSERT INTO cgm_logs(user_id, glucose_level, timestamp, quality) VALUES(5, ?, ?, 'ok')",
+            [(140 - 10 * i, (now - timedelta(minutes=20 - 5 * i)).isoformat()) for i in range(4)],
+        )
+        con.commit(); con.close()
+        for ensure in (db.ensure_cgm_stats_tables, db.ensure_cgm_alert_table,
+                       db.ensure_cgm_quality_tables, db.ensure_cgm_forecast_table):
+            ensure()
+        cgm_alerts.forget(5)
+
+        # The mood step fails after the CGM step raised a predicted low
+        engine = _pipeline_engine(["fail"])
+        engine.agent("cgm_agent").db_path = db.DB_PATH
+        state = {"current_flow": "health_tracking_flow", "current_step": "mood_tracker_agent", "user_context": {}}
+        result = engine.run_pipeline(split_commands("cgm: 100, mood: qwzx"), 5, state)
+        cgm_step = result.data["steps"][0]["result"]
+        assert not result.data["committed"] and [a["kind"] for a in cgm_step["predicted_alerts"]] == ["predicted_low"]
+        assert cgm_alerts.get_alerts(5) == []
+
+        # The next real reading still falling raises it for good
+        agent = CGMAgent()
+        agent.db_path = db.DB_PATH
+        assert [a["kind"] for a in agent.log_reading(5, 95)["predicted_alerts"]] == ["predicted_low"]
+        assert [a["kind"] for a in cgm_alerts.get_alerts(5, active_only=True)] == ["predicted_low"]
+    finally:
+        cgm_alerts.forget(5)
+        db.DB_PATH = original
+    print("✅ Rolled-back alerts are raised again")
+
+
+def test_failed_result_does_not_advance():
+    """An agent reporting success=False keeps the session on its step"""
+    engine = _pipeline_engine(["fail"])
+    state = {"current_flow": "health_tracking_flow", "current_step": "mood_tracker_agent", "user_context": {}}
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE writes(agent TEXT, value TEXT)")
+    result = engine._call(engine.steps["mood_tracker_agent"], 1, {"mood": "happy", "conn": conn}, state)
+    conn.close()
+    assert not result.success and result.next_step == "mood_tracker_agent"
+    assert result.message == "❌ Error in mood_tracker_agent"
+    assert state["current_step"] == "mood_tracker_agent" and state["user_context"] == {}
+    print("✅ Failed steps do not advance the session")
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    print("🧪 Testing Flow Engine")
+    print("=" * 50)
+    test_transition_table()
+    test_intent_routes()
+    test_agents_are_lazy()
+    test_registry_is_shared()
+    test_invalid_config_rejected()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_pipeline_commits_all_or_nothing(Path(tmp))
+        test_push_events_wait_for_commit(Path(tmp))
+        test_rolled_back_alert_is_raised_again(Path(tmp))
+    test_failed_result_does_not_advance()
+    print("✅ All flow engine checks passed")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+History Pagination Test
+Checks keyset cursors and `since` deltas on the /history endpoints
+(backend/routers/history.py over backend/services/db.py).
+"""
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routers import history
+from backend.services import db
+
+
+def _client(path):
+    """History router over a scratch database whose readings share timestamps in pairs"""
+    db.DB_PATH = path
+    db.ensure_cgm_stats_tables()
+    db.ensure_cgm_alert_table()
+    con = db.get_db()
+    con.execute(
+        "CREATE TABLE cgm_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, "
+        "glucose_level REAL, alert_level TEXT, timestamp TEXT, quality TEXT)"
+    )
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    rows = [(user_id, 100 + i, (start + timedelta(minutes=5 * (i // 2))).isoformat()) for i in range(45) for user_id in (1, 2)]
+    con.executemany("INSERT INTO cgm_logs(user_id, glucose_level, timestamp) VALUES(?,?,?)", rows)
+    con.commit(); con.close()
+    db.ensure_cgm_quality_tables()
+    db.ensure_cgm_forecast_table()
+    db.ensure_history_indexes()
+    app = FastAPI()
+    app.include_router(history.router)
+    return TestClient(app)
+
+
+def test_cursor_pages_cover_every_row_once(tmp_path):
+    """Paging back with X-Next-Cursor visits all rows newest first, ties included"""
+    original = db.DB_PATH
+    try:
+        client = _client(tmp_path / "history.db")
+        seen, cursor = [], None
+        while True:
+            response = client.get("/history/cgm/1", params={"limit": 10, **({"cursor": cursor} if cursor else {})})
+            assert response.status_code == 200
+            seen.extend(response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        assert [r["glucose_level"] for r in seen] == list(range(144, 99, -1))
+        assert client.get("/history/cgm/1", params={"cursor": "not-a-cursor"}).status_code == 400
+    finally:
+        db.DB_PATH = original
+    print("✅ Cursor pages cover every row exactly once")
+
+
+def test_since_returns_only_new_rows(tmp_path):
+    """A refresh with X-Latest-Cursor transfers just the rows written after it, backfills included"""
+    original = db.DB_PATH
+    try:
+        client = _client(tmp_path / "history.db")
+        first = client.get("/history/cgm/1", params={"limit": 5})
+        latest = first.headers["X-Latest-Cursor"]
+        assert first.json()[0]["glucose_level"] == 144
+
+        empty = client.get("/history/cgm/1", params={"since": latest})
+        assert empty.json() == [] and empty.headers["X-Latest-Cursor"] == latest
+
+        last_ts = first.json()[0]["timestamp"]
+        db.insert_cgm(1, 150, last_ts)  # same timestamp as the newest row, later id
+        db.insert_cgm(1, 151, (datetime.fromisoformat(last_ts) + timedelta(minutes=5)).isoformat())
+        delta = client.get("/history/cgm/1", params={"since": latest})
+        assert [r["glucose_level"] for r in delta.json()] == [150, 151]
+        assert client.get("/history/cgm/1", params={"since": delta.headers["X-Latest-Cursor"]}).json() == []
+        # A bare timestamp excludes rows at exactly that time
+        assert [r["glucose_level"] for r in client.get("/history/cgm/1", params={"since": last_ts}).json()] == [151]
+
+        # A backfilled reading older than the cursor was still written after it
+        latest = delta.headers["X-Latest-Cursor"]
+        db.insert_cgm(1, 99, (datetime.fromisoformat(last_ts) - timedelta(hours=1)).isoformat())
+        backfill = client.get("/history/cgm/1", params={"since": latest})
+        assert [r["glucose_level"] for r in backfill.json()] == [99]
+        assert client.get("/history/cgm/1", params={"since": backfill.headers["X-Latest-Cursor"]}).json() == []
+    finally:
+        db.DB_PATH = original
+    print("✅ `since` returns only rows written after the last fetch")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("🧪 Testing History Pagination")
+    print("=" * 50)
+    with tempfile.TemporaryDirectory() as tmp:
+        test_cursor_pages_cover_every_row_once(Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_since_returns_only_new_rows(Path(tmp))
+    print("🎉 All history pagination tests passed!")
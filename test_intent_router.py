@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Intent Router Accuracy Test
+Checks the compiled intent engine (backend/services/intents.py) against a
+labelled set of chat messages: route, emergency flag, glucose number and
+interrupt-agent query type.
+"""
+
+from backend.services.intents import classify, split_commands
+
+# (message, expected route, expected reading)
+ROUTE_CASES = [
+    ("mood: happy", "mood", None),
+    ("Mood: tired", "mood", None),
+    ("my mood is great today", "mood", None),
+    ("cgm: 132", "cgm", 132.0),
+    ("CGM: 98.5", "cgm", 98.5),
+    ("cgm: 140 mg/dL", "cgm", 140.0),
+    ("my glucose is 180", "cgm", 180.0),
+    ("blood sugar 75 after walk", "cgm", 75.0),
+    ("food: poha with peanuts", "food", None),
+    ("I ate idli and sambar", "food", None),
+    ("had a snack of almonds", "food", None),
+    ("eating dal rice", "food", None),
+    ("generate my meal plan", "plan", None),
+    ("plan for tomorrow please", "plan", None),
+    ("diet plan", "plan", None),
+    # Tracking words inside other words must not match
+    ("tell me about planet mars", "general", None),
+    ("the sky looks moody today", "general", None),
+    ("I was late to the office", "general", None),
+    ("what a great day", "general", None),
+    ("thanks for the update", "general", None),
+    ("tell me a joke", "general", None),
+    ("what is the weather like", "general", None),
+    # Emergencies win over any tracking keyword
+    ("chest pain after my meal", "emergency", None),
+    ("call 911 my glucose is 40", "emergency", 40.0),
+    ("mood: having difficulty breathing", "emergency", None),
+    ("I think it's a heart attack", "emergency", None),
+    ("heart   attack", "emergency", None),
+]
+
+# (message, expected query type)
+QUERY_TYPE_CASES = [
+    ("help", "emergency"),
+    ("someone is unconscious", "emergency"),
+    ("what are insulin side effects?", "health_question"),
+    ("should I see a doctor", "health_question"),
+    ("how does sleep work", "information_request"),
+    ("why is the sky blue", "information_request"),
+    ("can you assist with something", "help_request"),
+    ("I need support", "help_request"),
+    ("tell me a joke", "general_query"),
+    ("whatever", "general_query"),
+]
+
+
+def test_routes():
+    """Every labelled message routes to its expected agent"""
+    failures = []
+    for text, kind, reading in ROUTE_CASES:
+        intent = classify(text)
+        if intent.kind != kind or (reading is not None and intent.reading != reading):
+            failures.append((text, kind, reading, intent.kind, intent.reading))
+    accuracy = 1 - len(failures) / len(ROUTE_CASES)
+    print(f"🎯 Route accuracy: {accuracy:.0%} ({len(ROUTE_CASES)} messages)")
+    assert not failures, failures
+
+
+def test_query_types():
+    """Interrupt-agent query types match the labelled set"""
+    failures = [
+        (text, expected, classify(text).query_type)
+        for text, expected in QUERY_TYPE_CASES
+        if classify(text).query_type != expected
+    ]
+    print(f"🎯 Query type accuracy: {1 - len(failures) / len(QUERY_TYPE_CASES):.0%}")
+    assert not failures, failures
+
+
+def test_command_arguments():
+    """Explicit commands keep the text after the first colon as the argument"""
+    assert classify("mood: happy").argument == "happy"
+    assert classify("food: rice, dal: extra").argument == "rice, dal: extra"
+    assert classify("my mood: excited").argument == "excited"
+    assert classify("cgm: abc").reading is None
+    assert classify("ate poha").argument == "ate poha"
+
+
+def test_split_commands():
+    """One message can carry several tracking commands"""
+    commands = split_commands("mood: happy, cgm: 132, ate poha")
+    assert [(c.kind, c.argument, c.reading) for c in commands] == [
+        ("mood", "happy", None), ("cgm", "132", 132.0), ("food", "ate poha", None)
+    ]
+    # Commas inside a meal description do not start new commands
+    commands = split_commands("food: poha with peanuts, a banana and a cup of chai")
+    assert [c.argument for c in commands] == ["poha with peanuts, a banana and a cup of chai"]
+    # Explicit prefixes start a command even when the value is invalid
+    assert [c.kind for c in split_commands("mood: sad; cgm: abc")] == ["mood", "cgm"]
+    assert [c.kind for c in split_commands("food: eggs, glucose friendly bread")] == ["food"]
+    assert split_commands("tell me a joke, please") == []
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Intent Router")
+    print("=" * 50)
+    test_routes()
+    test_query_types()
+    test_command_arguments()
+    test_split_commands()
+    print("✅ All intent router checks passed")
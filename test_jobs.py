@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Background Job Test
+Checks backend/services/jobs.py through the meal plan job routes: 202 on
+submit, long-polling until done, failed jobs, pruning, and that cancelled
+or abandoned jobs never stay queued/running while jobs that are only slow
+to start are left alone.
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routers import mealplan
+from backend.services import db, jobs
+from backend.services.jobs import JobRunner
+
+PLAN = {"success": True, "message": "plan", "latest_cgm": 120.0, "suggestions": []}
+
+
+def _client(tmp_path, func):
+    db.DB_PATH = tmp_path / "jobs.db"
+    db.ensure_job_tables()
+    runner = JobRunner("mealplan", func, workers=1, queue_limit=4)
+    app = FastAPI()
+    app.include_router(mealplan.router)
+    return TestClient(app), runner
+
+
+def test_submit_poll_and_fail(tmp_path):
+    """202 with a job id, long-poll until done; an exception becomes status failed"""
+    original, runner_before = db.DB_PATH, mealplan.mealplan_jobs
+    release = threading.Event()
+
+    def plan(user_id):
+        release.wait(5)
+        if user_id == 13:
+            raise RuntimeError("LLM unavailable")
+        return {**PLAN, "message": f"plan for {user_id}"}
+
+    try:
+        client, mealplan.mealplan_jobs = _client(tmp_path, plan)
+        response = client.post("/mealplan/jobs", json={"user_id": 1})
+        assert response.status_code == 202 and response.json()["status"] == "queued"
+        job_id = response.json()["job_id"]
+        started = time.monotonic()
+        assert client.get(f"/mealplan/jobs/{job_id}", params={"wait": 0.3}).json()["status"] in ("queued", "running")
+        assert time.monotonic() - started >= 0.3
+        threading.Timer(0.2, release.set).start()
+        done = client.get(f"/mealplan/jobs/{job_id}", params={"wait": 5}).json()
+        assert done["status"] == "done" and done["result"]["personalized_message"] == "plan for 1"
+        assert done["started_at"] and done["finished_at"]
+
+        failed_id = client.post("/mealplan/jobs", json={"user_id": 13}).json()["job_id"]
+        failed = client.get(f"/mealplan/jobs/{failed_id}", params={"wait": 5}).json()
+        assert failed["status"] == "failed" and failed["error"] == "LLM unavailable" and failed["result"] is None
+        assert client.get("/mealplan/jobs/nope").status_code == 404
+    finally:
+        release.set()
+        mealplan.mealplan_jobs.shutdown()
+        db.DB_PATH, mealplan.mealplan_jobs = original, runner_before
+    print("✅ Jobs submitted, long-polled, completed and failed")
+
+
+def test_queue_full_and_pruning(tmp_path):
+    """503 at capacity; old finished and abandoned jobs are cleaned up on submit"""
+    original, runner_before = db.DB_PATH, mealplan.mealplan_jobs
+    release = threading.Event()
+    try:
+        client, mealplan.mealplan_jobs = _client(tmp_path, lambda user_id: release.wait(5) and PLAN)
+        long_ago = (datetime.now(timezone.utc) - timedelta(hours=jobs.JOB_RETENTION_HOURS + 1)).isoformat()
+        db.insert_job("old-done", "mealplan", 1, long_ago)
+        db.update_job("old-done", "done", "finished_at", long_ago)
+        db.insert_job("abandoned", "mealplan", 1, long_ago)
+        db.update_job("abandoned", "running", "started_at", long_ago)
+
+        ids = [client.post("/mealplan/jobs", json={"user_id": 2}).json()["job_id"] for _ in range(5)]
+        full = client.post("/mealplan/jobs", json={"user_id": 2})
+        assert full.status_code == 503 and full.headers["Retry-After"]
+        assert db.get_job("old-done") == {}
+        abandoned = db.get_job("abandoned")
+        assert abandoned["status"] == "failed" and abandoned["error"].startswith("abandoned")
+        release.set()
+        assert client.get(f"/mealplan/jobs/{ids[-1]}", params={"wait": 5}).json()["status"] == "done"
+    finally:
+        release.set()
+        mealplan.mealplan_jobs.shutdown()
+        db.DB_PATH, mealplan.mealplan_jobs = original, runner_before
+    print("✅ Queue bound enforced and stale jobs pruned")
+
+
+def test_long_queued_jobs_are_not_abandoned(tmp_path):
+    """The stale sweep skips this runner's own queue and judges others by when they started"""
+    original = db.DB_PATH
+    release = threading.Event()
+    try:
+        _, runner = _client(tmp_path, lambda user_id: release.wait(5) and PLAN)
+        long_ago = (datetime.now(timezone.utc) - timedelta(minutes=jobs.JOB_STALE_MINUTES + 5)).isoformat()
+        running = runner.submit(1)["job_id"]
+        waiting = runner.submit(1)["job_id"]
+        time.sleep(0.1)
+        con = db.get_db()
+        # Both queued long ago; another process started its job only just now
+        con.execute("UPDATE background_jobs SET created_at=?", (long_ago,))
+        con.commit(); con.close()
+        db.insert_job("elsewhere", "mealplan", 1, long_ago)
+        db.update_job("elsewhere", "running", "started_at", datetime.now(timezone.utc).isoformat())
+        db.insert_job("dead", "mealplan", 1, long_ago)
+        db.update_job("dead", "running", "started_at", long_ago)
+
+        runner.submit(1)
+        assert db.get_job(running)["status"] == "running" and db.get_job(waiting)["status"] == "queued"
+        assert db.get_job("elsewhere")["status"] == "running" and db.get_job("dead")["status"] == "failed"
+        release.set()
+        deadline = time.monotonic() + 5
+        while runner.stats()["pending"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert db.get_job(waiting)["status"] == "done" and db.get_job(waiting)["error"] is None
+    finally:
+        release.set()
+        runner.shutdown()
+        db.DB_PATH = original
+    print("✅ Slow-to-start jobs are not marked abandoned")
+
+
+def test_shutdown_fails_cancelled_jobs(tmp_path):
+    """Jobs cancelled by shutdown are recorded as failed, not left queued"""
+    original = db.DB_PATH
+    release = threading.Event()
+    try:
+        _, runner = _client(tmp_path, lambda user_id: release.wait(5) and PLAN)
+        running = runner.submit(1)["job_id"]
+        queued = [runner.submit(1)["job_id"] for _ in range(3)]
+        time.sleep(0.1)
+        runner.shutdown()
+        for job_id in queued:
+            job = db.get_job(job_id)
+            assert job["status"] == "failed" and job["error"].startswith("cancelled") and job["finished_at"]
+        assert runner.stats()["pending"] == 1
+        release.set()
+        deadline = time.monotonic() + 5
+        while db.get_job(running)["status"] != "done" and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert db.get_job(running)["status"] == "done" and runner.stats()["pending"] == 0
+    finally:
+        release.set()
+        db.DB_PATH = original
+    print("✅ Shutdown records cancelled jobs as failed")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("🧪 Testing Background Jobs")
+    print("=" * 50)
+    for test in (test_submit_poll_and_fail, test_queue_full_and_pruning, test_long_queued_jobs_are_not_abandoned,
+                 test_shutdown_fails_cancelled_jobs):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("🎉 All background job tests passed!")
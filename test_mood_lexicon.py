@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Mood Lexicon Test
+Checks free-text mood recognition in backend/services/mood_lexicon.py:
+synonyms, typos, phrases and negation against a labelled set, the SymSpell
+lookup against a brute-force scan, that the LLM is asked last, and that
+only text the lexicon cannot place goes through admission control.
+"""
+import random
+import string
+
+from backend.services import mood_lexicon
+from backend.services.mood_lexicon import INDEX, _allowed_edits, edit_distance, recognize
+
+# (text, expected label or None)
+CASES = [
+    ("happy", "happy"),
+    ("Happy!!", "happy"),
+    ("exhausted", "tired"),
+    ("happyy", "happy"),
+    ("happyyyyyy", "happy"),
+    ("feeling kinda down", "down"),
+    ("I'm feeling a bit stresed today", "stressed"),
+    ("anxiuos", "anxious"),
+    ("clam", "calm"),
+    ("frustraited", "frustrated"),
+    ("wron out", "tired"),
+    ("worn out after work", "tired"),
+    ("under the weather", "low"),
+    ("so so", "neutral"),
+    ("pretty good", "good"),
+    ("not bad", "okay"),
+    ("not happy", "down"),
+    ("not at all calm", "down"),
+    ("I'm not doing well", "down"),
+    ("never sad", "okay"),
+    ("my mood is great today", "great"),
+    # Nothing to recognize, and short words are never stretched to a mood
+    ("am", None),
+    ("no", None),
+    ("the sky is purple", None),
+    ("", None),
+]
+
+
+def test_labelled_cases():
+    """Synonyms, typos, phrases and negation resolve to the expected label"""
+    for text, expected in CASES:
+        match = recognize(text)
+        assert (match.label if match else None) == expected, (text, match)
+    match = recognize("happyy")
+    assert match.method == "fuzzy" and match.distance == 1 and match.score == 5
+    assert recognize("exhausted").method == "synonym" and recognize("not happy").method == "negated"
+    print("✅ Free-text moods recognized")
+
+
+def test_symspell_matches_brute_force():
+    """The delete index finds exactly what a scan of the vocabulary would"""
+    rng = random.Random(4)
+    words = sorted(INDEX.words)
+    for _ in range(500):
+        word = list(rng.choice(words))
+        for _ in range(rng.randint(0, 3)):
+            i = rng.randrange(len(word) + 1)
+            op = rng.choice("ids")
+            if op == "i":
+                word.insert(i, rng.choice(string.ascii_lowercase))
+            elif op == "d" and i < len(word):
+                del word[i]
+            elif op == "s" and i < len(word):
+                word[i] = rng.choice(string.ascii_lowercase)
+        word = "".join(word)
+        if not word:
+            continue
+        limit = _allowed_edits(word)
+        distances = [(edit_distance(word, candidate), candidate) for candidate in words]
+        scored = sorted(
+            (d, candidate) for d, candidate in distances
+            if d == 0 or (limit and d <= min(limit, _allowed_edits(candidate)))
+        )
+        expected = (scored[0][1], scored[0][0]) if scored else (None, 0)
+        assert INDEX.correct(word) == expected, word
+    print("✅ SymSpell lookup agrees with a brute-force scan")
+
+
+def test_llm_is_last_resort():
+    """Recognized text never reaches the LLM; unrecognized text asks it once"""
+    calls = []
+
+    def fake_llm(text):
+        calls.append(text)
+        return mood_lexicon.MoodMatch("content", 4, text, "llm")
+
+    original = mood_lexicon._ask_llm
+    mood_lexicon._ask_llm = fake_llm
+    try:
+        assert mood_lexicon.resolve("feeling kinda down", use_llm=True).label == "down" and calls == []
+        assert mood_lexicon.resolve("at peace with things", use_llm=True).method == "llm"
+        assert calls == ["at peace with things"]
+        assert mood_lexicon.resolve("at peace with things", use_llm=False) is None
+    finally:
+        mood_lexicon._ask_llm = original
+    print("✅ LLM asked only for text the lexicon cannot place")
+
+
+def test_unplaced_moods_go_through_admission():
+    """POST /mood sends only unrecognized text through admission; the DB path never asks the LLM"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from backend.routers import mood
+
+    calls = []
+
+    class FakeAgent:
+        def log_mood(self, user_id, text, match=None, resolved=False):
+            calls.append((text, resolved, match.label if match else None))
+            return {"success": True, "message": "ok", "mood_logged": match.label if match else text, "mood_score": 3}
+
+    async def fake_admission(endpoint, func, *args, **kwargs):
+        calls.append(("admission", endpoint))
+        return func(*args, **kwargs)
+
+    app = FastAPI()
+    app.include_router(mood.router)
+    route = next(r for r in mood.router.routes if r.path == "/mood")
+    app.dependency_overrides[route.dependant.dependencies[0].call] = FakeAgent
+    original = mood.admission.run, mood_lexicon.MOOD_LLM_FALLBACK
+    mood.admission.run, mood_lexicon.MOOD_LLM_FALLBACK = fake_admission, True
+    try:
+        client = TestClient(app)
+        assert client.post("/mood", json={"user_id": 1, "mood": "feeling kinda down"}).json()["ok"]
+        assert calls == [("feeling kinda down", True, "down")]
+        calls.clear()
+        client.post("/mood", json={"user_id": 1, "mood": "at peace with things"})
+        assert calls == [("admission", "mood"), ("at peace with things", False, None)]
+    finally:
+        mood.admission.run, mood_lexicon.MOOD_LLM_FALLBACK = original
+    print("✅ Only unplaced moods are admitted to the LLM path")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Mood Lexicon")
+    print("=" * 50)
+    test_labelled_cases()
+    test_symspell_matches_brute_force()
+    test_llm_is_last_resort()
+    test_unplaced_moods_go_through_admission()
+    print("🎉 All mood lexicon tests passed!")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Mood Score Test
+Checks backend/services/mood_score.py: the merged 1-5 scale, the daily sums
+and EWMA maintained on insert against a direct computation, late entries,
+and the backfill of historical rows.
+"""
+from datetime import datetime, timedelta, timezone
+
+from backend.services import db, mood_score
+
+
+def _make_db(tmp_path, name):
+    db.DB_PATH = tmp_path / name
+    con = db.get_db()
+    con.execute("CREATE TABLE mood_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, mood TEXT, timestamp TEXT)")
+    con.commit(); con.close()
+
+
+def test_scale_merges_both_agents():
+    """Both agents now score on the same 1-5 scale"""
+    from agents.mood_agent import MoodAgent
+    from agno_agents.mood_agent import MoodTrackerAgent
+    assert MoodAgent.VALID_MOODS is MoodTrackerAgent.VALID_MOODS is mood_score.SCALE
+    assert mood_score.score(" Happy ") == mood_score.score("fantastic") == 5
+    assert mood_score.score("good") == 4 and mood_score.score("okay") == mood_score.score("neutral") == 3
+    assert mood_score.score("tired") == 2 and mood_score.score("frustrated") == 1
+    assert mood_score.score("meh") is None
+    print("✅ One 1-5 scale for every mood writer")
+
+
+def test_aggregates_maintained_on_insert(tmp_path):
+    """insert_mood keeps the daily sums and EWMA equal to a direct computation"""
+    original = db.DB_PATH
+    try:
+        _make_db(tmp_path, "mood.db")
+        db.ensure_mood_tables()
+        now = datetime.now(timezone.utc)
+        moods = ["happy", "sad", "calm", "angry", "good", "tired", "excited", "fine"] * 3
+        entries = [(moods[i], now - timedelta(hours=9 * (len(moods) - i))) for i in range(len(moods))]
+        # One entry arrives late, after newer ones
+        entries.insert(len(entries) - 2, ("awful", now - timedelta(days=5)))
+        for mood, at in entries:
+            trend = db.insert_mood(1, mood, at.isoformat())
+        db.insert_mood(1, "meh", now.isoformat())  # stored, but not scored
+
+        half_life = mood_score.MOOD_EWMA_HALF_LIFE_HOURS * 3600
+        newest = max(at for _, at in entries)
+        weights = [0.5 ** ((newest - at).total_seconds() / half_life) for _, at in entries]
+        scores = [mood_score.SCALE[mood] for mood, _ in entries]
+        expected_ewma = sum(w * s for w, s in zip(weights, scores)) / sum(weights)
+        today = now.timestamp() // 86400
+        recent = [s for s, (_, at) in zip(scores, entries) if at.timestamp() // 86400 >= today - 7]
+
+        summary = mood_score.get_summary(1)
+        assert abs(summary["ewma"] - expected_ewma) < 0.006
+        assert summary["entries"] == len(recent) and abs(summary["average"] - sum(recent) / len(recent)) < 0.006
+        assert trend == {key: value for key, value in summary.items() if key != "user_id"}
+        assert mood_score.get_summary(2) == {"user_id": 2, "ewma": None, "days": 7, "entries": 0,
+                                             "average": None, "trend": "steady"}
+    finally:
+        db.DB_PATH = original
+    print("✅ Daily sums and EWMA match a direct computation")
+
+
+def test_backfill_rescores_history(tmp_path):
+    """Rows from before the score column get unified scores and aggregates once"""
+    original = db.DB_PATH
+    try:
+        _make_db(tmp_path, "legacy.db")
+        con = db.get_db()
+        start = datetime.now(timezone.utc) - timedelta(days=3)
+        con.executemany(
+            "INSERT INTO mood_logs(user_id, mood, timestamp) VALUES(?, ?, ?)",
+            [(1, "great", start.isoformat()), (1, "sad", (start + timedelta(days=2, hours=22)).isoformat()),
+             (2, "Calm", start.isoformat()), (2, "unknown", start.isoformat())],
+        )
+        con.commit(); con.close()
+        db.ensure_mood_tables()
+        con = db.get_db()
+        assert [tuple(r) for r in con.execute("SELECT mood, score FROM mood_logs ORDER BY id")] == [
+            ("great", 5), ("sad", 2), ("Calm", 4), ("unknown", None)]
+        assert mood_score.backfill(con) == 0  # nothing left to do on the next start
+        state = mood_score.summary(con, 1)
+        con.close()
+        assert state["entries"] == 2 and state["average"] == 3.5 and state["ewma"] < 3.5
+        assert state["trend"] == "declining"
+    finally:
+        db.DB_PATH = original
+    print("✅ Historical moods backfilled on the unified scale")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("🧪 Testing Mood Score")
+    print("=" * 50)
+    test_scale_merges_both_agents()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_aggregates_maintained_on_insert(Path(tmp))
+        test_backfill_rescores_history(Path(tmp))
+    print("🎉 All mood score tests passed!")
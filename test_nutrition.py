@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Nutrition Rollup Test
+Checks backend/services/nutrition.py: numeric macros from both food agents'
+analyses, the backfill of existing food_logs, the daily rollup maintained on
+insert against direct sums, per-macro counts of meals without a value, and
+the /food/nutrition route.
+"""
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routers import food
+from backend.services import db, nutrition
+
+
+def test_extract_from_both_agents():
+    """Structured strings, free text and numeric fields give the same columns"""
+    structured = {"calories": "300-500", "carbs": "30-60g", "protein": "25g", "fat": "10-25g"}
+    assert nutrition.extract(structured) == {"carbs_g": 45.0, "protein_g": 25.0, "fat_g": 17.5, "calories": 400.0}
+    text = {
+        "analysis": "1. Primary macronutrients (carbs, protein, fat): mostly carbs\n"
+                    "Carbohydrates: approximately 50-60g\nabout 8 g of protein\n2. Estimated calorie range: 300-350 calories\n"
+                    "Totals: carbs 55g, protein 8g, fat 11g, 320 calories",
+        "estimated_calories": "300-350", "primary_macros": "carb-rich",
+    }
+    assert nutrition.extract(json.dumps(text)) == {"carbs_g": 55.0, "protein_g": 8.0, "fat_g": 11.0, "calories": 320.0}
+    # Older free text without a totals line; percentages are not grams
+    older = {"analysis": "Roughly 60% carbs. Protein: 12 g. 450 kcal", "estimated_calories": "300-500"}
+    assert nutrition.extract(older) == {"carbs_g": None, "protein_g": 12.0, "fat_g": None, "calories": 450.0}
+    # Placeholders of a failed analysis and unparseable blobs give nothing
+    failed = {**structured, "error": "quota"}
+    assert set(nutrition.extract(failed).values()) == {None} == set(nutrition.extract("not json").values())
+    print("✅ Macros extracted from every analysis format")
+
+
+def test_rollup_backfilled_and_maintained(tmp_path):
+    """Existing blobs are parsed once; inserts keep the rollup equal to direct sums"""
+    original = db.DB_PATH
+    db.DB_PATH = tmp_path / "nutrition.db"
+    try:
+        con = db.get_db()
+        con.execute(
+            "CREATE TABLE food_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, "
+            "meal_description TEXT, nutrition_analysis TEXT, timestamp TEXT)"
+        )
+        today = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0)
+        rng = random.Random(6)
+        legacy = []
+        for i in range(30):
+            at = today - timedelta(days=rng.randrange(0, 20), hours=rng.randrange(0, 10))
+            carbs, protein = rng.randrange(10, 90), rng.randrange(5, 40)
+            blob = {"carbs": f"{carbs}g", "protein": f"{protein}g", "fat": "10g", "calories": str(carbs * 4 + protein * 4 + 90)}
+            legacy.append((f"meal {i}", json.dumps(blob), at.isoformat()))
+        legacy.append(("water", None, today.isoformat()))
+        con.executemany("INSERT INTO food_logs(user_id, meal_description, nutrition_analysis, timestamp) VALUES(1, ?, ?, ?)", legacy)
+        con.commit(); con.close()
+
+        db.ensure_nutrition_tables()
+        for i in range(10):
+            at = today - timedelta(days=i % 4, hours=i)
+            db.insert_food(1, f"new {i}", at.isoformat(), {"carbs_g": 20 + i, "protein_g": 10, "fat_g": 5, "calories": 200})
+        db.insert_food(2, "poha", today.isoformat())
+        db.insert_food(1, "snack", today.isoformat(), {"analysis": "roughly 250 calories"})
+        db.ensure_nutrition_tables()  # a restart parses nothing twice
+
+        def daily_today(user_id):
+            return nutrition.get_totals(user_id, 1, end=today.date())["totals"][0]
+
+        con = db.get_db()
+        rows = con.execute("SELECT timestamp, carbs_g, protein_g, fat_g, calories FROM food_logs WHERE user_id=1").fetchall()
+        con.close()
+        assert sum(1 for row in rows if row[1] is None) == 2  # the meal without an analysis and the calories-only snack
+        assert daily_today(1)["unmeasured"] == {"carbs_g": 2, "protein_g": 2, "fat_g": 2, "calories": 1}
+
+        app = FastAPI()
+        app.include_router(food.router)
+        client = TestClient(app)
+        daily = client.get("/food/nutrition/1", params={"days": 14}).json()
+        assert len(daily["totals"]) == 14 and daily["to"] == today.date().isoformat()
+        for bucket in daily["totals"]:
+            same_day = [row for row in rows if row[0][:10] == bucket["date"]]
+            assert bucket["meals"] == len(same_day)
+            assert bucket["carbs_g"] == round(sum(row[1] or 0 for row in same_day), 1)
+            assert bucket["calories"] == round(sum(row[4] or 0 for row in same_day), 1)
+            assert bucket["unmeasured_meals"] == sum(1 for row in same_day if all(v is None for v in row[1:]))
+            assert bucket["unmeasured"] == {
+                column: sum(1 for row in same_day if row[i] is None) for i, column in enumerate(nutrition.MACROS, 1)}
+
+        weekly = client.get("/food/nutrition/1", params={"days": 14, "period": "weekly"}).json()
+        first = datetime.fromisoformat(weekly["totals"][0]["date"]).date()
+        assert first.weekday() == 0 and first <= today.date() - timedelta(days=13)
+        in_range = [row for row in rows if first.isoformat() <= row[0][:10] <= today.date().isoformat()]
+        assert sum(week["meals"] for week in weekly["totals"]) == len(in_range)
+        assert abs(sum(week["protein_g"] for week in weekly["totals"]) - sum(row[2] or 0 for row in in_range)) < 0.5
+        assert client.get("/food/nutrition/1", params={"period": "monthly"}).status_code == 422
+        other = client.get("/food/nutrition/2", params={"days": 1}).json()["totals"]
+        assert other == [{"date": today.date().isoformat(), "meals": 1, "carbs_g": 0.0, "protein_g": 0.0,
+                          "fat_g": 0.0, "calories": 0.0, "unmeasured_meals": 1,
+                          "unmeasured": dict.fromkeys(nutrition.MACROS, 1)}]
+
+        # Rollups written before the per-macro counts are rebuilt when the columns are added
+        con = db.get_db()
+        con.executescript(f"""
+            ALTER TABLE nutrition_daily RENAME TO current;
+            CREATE TABLE nutrition_daily(user_id INTEGER, day INTEGER, meals INTEGER, carbs_g REAL, protein_g REAL,
+                                         fat_g REAL, calories REAL, unmeasured INTEGER, PRIMARY KEY(user_id, day));
+            INSERT INTO nutrition_daily SELECT user_id, day, meals, {nutrition._COLUMNS}, unmeasured FROM current;
+            DROP TABLE current;
+        """)
+        con.close()
+        db.ensure_nutrition_tables()
+        assert daily_today(1)["unmeasured"] == {"carbs_g": 2, "protein_g": 2, "fat_g": 2, "calories": 1}
+    finally:
+        db.DB_PATH = original
+    print("✅ Daily rollup backfilled and maintained on insert")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("🧪 Testing Nutrition Rollups")
+    print("=" * 50)
+    test_extract_from_both_agents()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_rollup_backfilled_and_maintained(Path(tmp))
+    print("🎉 All nutrition tests passed!")
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Postprandial Response Test
+Checks the batched as-of join in backend/services/postprandial.py against a
+per-meal loop, the stored table, meals recomputed when CGM readings sync
+late (flagged readings left out), and the meal planner's use of the ranking.
+"""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from agno_agents.meal_planner_agent import MealPlannerAgent
+from backend.services import db, postprandial
+
+
+def _naive(meal_user, meal_second, users, seconds, glucose, window=180 * 60, tolerance=30 * 60):
+    """One meal at a time, the way per-meal SQL would do it"""
+    mine = users == meal_user
+    t, g = seconds[mine], glucose[mine]
+    before = t <= meal_second
+    baseline = g[before][-1] if before.any() and meal_second - t[before][-1] <= tolerance else np.nan
+    inside = (t > meal_second) & (t <= meal_second + window)
+    if inside.sum() < postprandial.MIN_WINDOW_READINGS:
+        return baseline, np.nan, np.nan
+    minutes = np.concatenate([[0.0], (t[inside] - meal_second) / 60.0])
+    above = np.clip(np.concatenate([[baseline], g[inside]]) - baseline, 0, None)
+    return baseline, g[inside].max(), float(np.sum(0.5 * (above[1:] + above[:-1]) * np.diff(minutes)))
+
+
+def test_batch_join_matches_per_meal_loop():
+    """Baseline, peak and iAUC agree with a per-meal computation across users"""
+    rng = np.random.default_rng(8)
+    users, seconds, glucose = [], [], []
+    for user in (3, 9, 12):
+        t = np.cumsum(rng.integers(180, 600, 600))
+        users.append(np.full(len(t), user)); seconds.append(t); glucose.append(rng.normal(140, 30, len(t)))
+    users, seconds, glucose = (np.concatenate(c) for c in (users, seconds, glucose))
+    meal_users = rng.choice([3, 9, 12, 40], 200)
+    meal_seconds = rng.integers(0, int(seconds.max()), 200)
+
+    cgm_keys = postprandial.keys(users, seconds)
+    order = np.argsort(cgm_keys)
+    result = postprandial.responses(postprandial.keys(meal_users, meal_seconds), cgm_keys[order], glucose[order])
+    for i in range(200):
+        baseline, peak, iauc = _naive(meal_users[i], meal_seconds[i], users, seconds, glucose)
+        assert np.allclose([result["baseline"][i], result["peak"][i], result["iauc"][i]], [baseline, peak, iauc], equal_nan=True), i
+    assert np.all(np.isnan(result["peak"][meal_users == 40]))
+    print("✅ Batched as-of join matches the per-meal loop")
+
+
+def test_refresh_stores_and_ranks_meals(tmp_path):
+    """Closed meal windows are stored once; the planner swaps in the steady meal"""
+    original = db.DB_PATH
+    db.DB_PATH = tmp_path / "postprandial.db"
+    try:
+        db.ensure_postprandial_table()
+        con = db.get_db()
+        con.executescript("""
+            CREATE TABLE cgm_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, glucose_level REAL, alert_level TEXT, timestamp TEXT, quality TEXT);
+            CREATE TABLE food_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, meal_description TEXT, nutrition_analysis TEXT, timestamp TEXT);
+        """)
+        now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+        day = now - timedelta(days=1)
+        breakfast = day.replace(hour=2, minute=30)  # 08:00 IST
+        lunch = day.replace(hour=7, minute=30)      # 13:00 IST
+        curve = {breakfast: 10, lunch: 90}
+        readings = []
+        for minute in range(0, 24 * 60, 5):
+            ts = day.replace(hour=0, minute=0) + timedelta(minutes=minute)
+            value = 100.0
+            for meal, rise in curve.items():
+                since = (ts - meal).total_seconds() / 60
+                if 0 < since <= 180:
+                    value += rise * np.sin(np.pi * since / 180)
+            readings.append((value, ts.isoformat()))
+        con.executemany("INSERT INTO cgm_logs(user_id, glucose_level, timestamp) VALUES(1, ?, ?)", readings)
+        con.executemany(
+            "INSERT INTO food_logs(user_id, meal_description, timestamp) VALUES(1, ?, ?)",
+            [("Vegetable upma", breakfast.isoformat()), ("White rice and potato curry", lunch.isoformat()),
+             ("Just logged", now.isoformat())],
+        )
+        con.commit(); con.close()
+
+        report = postprandial.get_responses(1)
+        stored = {m["meal_description"]: m for m in report["meals"]}
+        assert "Just logged" not in stored  # window still open
+        assert stored["Vegetable upma"]["rise"] < 15 and 80 < stored["White rice and potato curry"]["rise"] < 95
+        assert 85 <= stored["White rice and potato curry"]["minutes_to_peak"] <= 95
+        con = db.get_db()
+        assert postprandial.refresh(con, [1]) == 0
+        con.close()
+
+        ranking = report["ranking"]
+        assert [m["meal"] for m in ranking["steady"]] == ["Vegetable upma"]
+        assert [m["meal"] for m in ranking["spiky"]] == ["White rice and potato curry"]
+        agent = MealPlannerAgent()
+        meals = agent._prefer_proven_meals(agent._get_personalized_meals("vegetarian", []), ranking)
+        assert meals[0]["meal"] == "Vegetable upma" and meals[1]["meal"] != "White rice and potato curry"
+    finally:
+        db.DB_PATH = original
+    print("✅ Meal responses stored once and steady meals preferred by the planner")
+
+
+def test_late_readings_fill_incomplete_meals(tmp_path):
+    """A meal stored before its CGM data synced is recomputed once the readings arrive"""
+    original = db.DB_PATH
+    db.DB_PATH = tmp_path / "late.db"
+    try:
+        db.ensure_postprandial_table()
+        con = db.get_db()
+        con.executescript("""
+            CREATE TABLE cgm_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, glucose_level REAL, alert_level TEXT, timestamp TEXT, quality TEXT);
+            CREATE TABLE food_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, meal_description TEXT, nutrition_analysis TEXT, timestamp TEXT);
+        """)
+        now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+        meal = now - timedelta(hours=6)
+        old_meal = now - timedelta(hours=postprandial.POSTPRANDIAL_RECHECK_HOURS + 6)
+        con.executemany("INSERT INTO food_logs(user_id, meal_description, timestamp) VALUES(1, ?, ?)",
+                        [("Poha", meal.isoformat()), ("Dosa", old_meal.isoformat())])
+        with con:
+            assert postprandial.refresh(con, [1], now) == 2
+        assert [tuple(r) for r in con.execute("SELECT readings, rise FROM postprandial ORDER BY food_log_id")] == [
+            (0, None), (0, None)]
+
+        # The sensor syncs hours later, for both meals
+        readings = [(110.0 + (40 if 0 < m <= 120 else 0), (start + timedelta(minutes=m)).isoformat())
+                    for start in (meal, old_meal) for m in range(-10, 181, 5)]
+        con.executemany("INSERT INTO cgm_logs(user_id, glucose_level, timestamp) VALUES(1, ?, ?)", readings)
+        # Flagged readings are neither a baseline nor a peak
+        con.executemany("INSERT INTO cgm_logs(user_id, glucose_level, timestamp, quality) VALUES(1, ?, ?, ?)",
+                        [(45.0, (meal - timedelta(minutes=2)).isoformat(), "compression"),
+                         (260.0, (meal + timedelta(minutes=62)).isoformat(), "jump")])
+        with con:
+            assert postprandial.refresh(con, [1], now) == 1  # the old meal is past its recheck window
+        rows = {r[0]: tuple(r[1:]) for r in con.execute(
+            "SELECT f.meal_description, p.readings, p.rise FROM postprandial p JOIN food_logs f ON f.id = p.food_log_id")}
+        assert rows["Poha"] == (36, 40.0) and rows["Dosa"] == (0, None)
+        with con:
+            assert postprandial.refresh(con, [1], now) == 0  # complete meals are not recomputed
+        con.close()
+    finally:
+        db.DB_PATH = original
+    print("✅ Late CGM readings fill in incomplete meals")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("🧪 Testing Postprandial Responses")
+    print("=" * 50)
+    test_batch_join_matches_per_meal_loop()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_refresh_stores_and_ranks_meals(Path(tmp))
+        test_late_readings_fill_incomplete_meals(Path(tmp))
+    print("🎉 All postprandial tests passed!")
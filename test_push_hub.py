@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Push Hub Test
+Checks fan-out, thread-safe publishing, Last-Event-ID replay and slow-consumer
+disconnects in backend/services/push.py.
+"""
+import asyncio
+import threading
+
+from backend.services import push
+
+
+def test_fan_out_and_filters():
+    """Every subscriber of a user gets the event; other users and filtered kinds do not"""
+    async def scenario():
+        hub = push.PushHub(queue_size=8)
+        first, second = hub.subscribe(1), hub.subscribe(1)
+        alerts_only = hub.subscribe(1, kinds=["alert"])
+        other = hub.subscribe(2)
+        # Published from a pool thread, as the agents do
+        worker = threading.Thread(target=hub.publish, args=(1, "cgm", {"glucose_level": 120}))
+        worker.start(); worker.join()
+        hub.publish(1, "alert", {"kind": "predicted_low"})
+        await asyncio.sleep(0.01)
+        for sub in (first, second):
+            assert [sub.queue.get_nowait()["event"] for _ in range(2)] == ["cgm", "alert"]
+        assert alerts_only.queue.get_nowait()["event"] == "alert" and alerts_only.queue.empty()
+        assert other.queue.empty()
+        assert hub.stats()["delivered"] == 5
+    asyncio.run(scenario())
+    print("✅ Events fan out per user and per event type")
+
+
+def test_slow_consumer_is_disconnected():
+    """A client whose buffer fills is closed instead of growing without bound"""
+    async def scenario():
+        hub = push.PushHub(queue_size=4)
+        slow, fast = hub.subscribe(7), hub.subscribe(7)
+        reader = asyncio.ensure_future(_drain(hub, fast))
+        for i in range(10):
+            hub.publish(7, "cgm", {"glucose_level": 100 + i})
+            # The fast reader keeps up; the slow one never reads
+            await asyncio.sleep(0.005)
+        assert slow.closed == "slow_consumer"
+        frames = [frame async for frame in hub.stream(slow, heartbeat=1)]
+        assert frames[-1].startswith("event: disconnect") and len(frames) == 2
+        hub.close_all()
+        received = await reader
+        assert received == 10, received
+        stats = hub.stats()
+        assert stats["slow_disconnects"] == 1 and stats["subscribers"] == 0
+    asyncio.run(scenario())
+    print("✅ Slow consumer disconnected, other subscribers unaffected")
+
+
+async def _drain(hub, sub):
+    count = 0
+    async for frame in hub.stream(sub, heartbeat=1):
+        count += frame.startswith("id:")
+    return count
+
+
+def test_reconnect_replays_missed_events():
+    """Last-Event-ID resumes after the events a client already saw"""
+    async def scenario():
+        hub = push.PushHub(queue_size=8, replay=4)
+        for i in range(6):
+            hub.publish(3, "mood", {"mood": f"m{i}"})
+        sub = hub.subscribe(3)
+        assert sub.queue.empty()
+        resumed = hub.subscribe(3, last_event_id=4)
+        ids = [resumed.queue.get_nowait()["id"] for _ in range(2)]
+        assert ids == [5, 6] and resumed.queue.empty()
+        frame = push.format_sse(hub._recent[3][-1])
+        assert frame.startswith("id: 6\nevent: mood\ndata: ") and '"mood": "m5"' in frame
+    asyncio.run(scenario())
+    print("✅ Reconnect replays events after Last-Event-ID")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing Push Hub")
+    print("=" * 50)
+    test_fan_out_and_filters()
+    test_slow_consumer_is_disconnected()
+    test_reconnect_replays_missed_events()
+    print("🎉 All push hub tests passed!")
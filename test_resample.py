@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+CGM Resampling Test
+Checks the 5-minute grid in backend/services/resample.py against a direct
+per-point computation, its per-day cache, and the /history/cgm/resampled route.
+"""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routers import history
+from backend.services import db, resample
+
+
+def test_grid_interpolates_only_short_gaps():
+    """Duplicates average, short gaps interpolate, long gaps and edges stay missing"""
+    seconds = np.array([600, 600, 1200, 1500, 4500, 4800])
+    glucose = np.array([100, 110, 135, 150, 90, 96])
+    values = resample.resample(seconds, glucose, 0, 18, step=300, max_gap=1200)
+    assert np.isnan(values[:2]).all()                       # before the first reading
+    assert values[2] == 105 and values[3] == 120 and values[4] == 135 and values[5] == 150
+    assert np.isnan(values[6:15]).all()                     # 1500 -> 4500 is longer than max_gap
+    assert values[15] == 90 and values[16] == 96 and np.isnan(values[17])
+
+    rng = np.random.default_rng(2)
+    t = np.sort(rng.uniform(0, 86400, 300)).round()
+    g = rng.uniform(60, 250, 300)
+    fast = resample.resample(t, g, 0, 288, 300, 1200)
+    for i in range(288):
+        point = i * 300.0
+        if point in t:
+            expected = g[t == point].mean()
+        else:
+            before, after = t[t < point], t[t > point]
+            if not len(before) or not len(after) or after[0] - before[-1] > 1200:
+                assert np.isnan(fast[i]), i
+                continue
+            lo, hi = g[t == before[-1]].mean(), g[t == after[0]].mean()
+            expected = lo + (point - before[-1]) / (after[0] - before[-1]) * (hi - lo)
+        assert abs(fast[i] - expected) < 1e-9, i
+    print("✅ Grid interpolation bounded by the gap horizon")
+
+
+def test_days_cached_until_their_readings_change(tmp_path):
+    """A second request is served from cache; a back-filled reading refreshes its day"""
+    original = db.DB_PATH
+    db.DB_PATH = tmp_path / "resample.db"
+    try:
+        con = db.get_db()
+        con.execute(
+            "CREATE TABLE cgm_logs(id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, "
+            "glucose_level REAL, alert_level TEXT, timestamp TEXT, quality TEXT)"
+        )
+        day = datetime(2026, 3, 2, tzinfo=timezone.utc)
+        rows = [(120 + i % 7, (day + timedelta(minutes=7 * i)).isoformat(), None) for i in range(400)]
+        rows.append((400, (day + timedelta(minutes=30)).isoformat(), "jump"))
+        con.executemany("INSERT INTO cgm_logs(user_id, glucose_level, timestamp, quality) VALUES(1, ?, ?, ?)", rows)
+        con.commit(); con.close()
+        db.ensure_history_indexes()
+        app = FastAPI()
+        app.include_router(history.router)
+        client = TestClient(app)
+        params = {"from": day.isoformat(), "to": (day + timedelta(days=2)).isoformat()}
+
+        before = resample.cache_stats()
+        first = client.get("/history/cgm/resampled/1", params=params).json()
+        assert first["points"] == 576 and first["start"] == day.isoformat()
+        assert max(v for v in first["values"] if v is not None) < 130  # the flagged spike is left out
+        # 400 readings 7 minutes apart end on day two; the rest of it is missing
+        assert first["values"][-1] is None and first["missing"] == 576 - (399 * 7 // 5 + 1)
+        second = client.get("/history/cgm/resampled/1", params=params).json()
+        assert second == first and resample.cache_stats()["hits"] - before["hits"] == 2
+
+        con = db.get_db()
+        con.execute("INSERT INTO cgm_logs(user_id, glucose_level, timestamp) VALUES(1, 200, ?)",
+                    ((day + timedelta(hours=1)).isoformat(),))
+        con.commit(); con.close()
+        third = client.get("/history/cgm/resampled/1", params=params).json()
+        assert third["values"][12] == 200 and third["values"][300:] == first["values"][300:]
+
+        too_long = {"from": day.isoformat(), "to": (day + timedelta(days=40)).isoformat()}
+        assert client.get("/history/cgm/resampled/1", params=too_long).status_code == 400
+    finally:
+        db.DB_PATH = original
+    print("✅ Resampled days cached and refreshed after back-fills")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("🧪 Testing CGM Resampling")
+    print("=" * 50)
+    test_grid_interpolates_only_short_gaps()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_days_cached_until_their_readings_change(Path(tmp))
+    print("🎉 All resampling tests passed!")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Session Store Test
+Checks backend/services/sessions.py: idle TTL, LRU eviction, per-key
+locking, the SQLite backend, and that two users sending the same session id
+never share state.
+"""
+import threading
+import time
+
+from backend.services import db
+from backend.services.sessions import SessionStore, session_key
+
+
+def test_ttl_expiry():
+    """Idle sessions come back fresh after the TTL"""
+    store = SessionStore(ttl_seconds=0.05, backend="memory")
+    with store.session("a") as state:
+        state["step"] = 1
+    assert store.peek("a") == {"step": 1}
+    time.sleep(0.08)
+    assert store.peek("a") is None
+    with store.session("a") as state:
+        assert state == {}
+    print("✅ Idle sessions expire")
+
+
+def test_lru_eviction():
+    """Beyond max_sessions the least recently used session is dropped"""
+    store = SessionStore(max_sessions=2, backend="memory")
+    for key in ("a", "b"):
+        with store.session(key) as state:
+            state["key"] = key
+    with store.session("a"):
+        pass  # a is now the most recent
+    with store.session("c") as state:
+        state["key"] = "c"
+    assert store.peek("b") is None and store.peek("a") == {"key": "a"} and store.peek("c") == {"key": "c"}
+    assert store.stats()["evicted"] == 1 and store.stats()["sessions"] == 2
+    print("✅ Least recently used session evicted")
+
+
+def test_per_key_locking():
+    """Concurrent updates of one key never lose writes; other keys are not blocked"""
+    store = SessionStore(default_factory=lambda: {"count": 0}, backend="memory")
+
+    def bump():
+        for _ in range(200):
+            with store.session("shared") as state:
+                count = state["count"]
+                time.sleep(0)
+                state["count"] = count + 1
+
+    threads = [threading.Thread(target=bump) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.peek("shared") == {"count": 800}
+
+    entered = threading.Event()
+
+    def use_other():
+        with store.session("other"):
+            entered.set()
+
+    with store.session("held"):
+        worker = threading.Thread(target=use_other)
+        worker.start()
+        assert entered.wait(1)  # a different key does not wait for "held"
+        worker.join()
+    assert store.stats()["active_keys"] == 0
+    print("✅ Per-key locks serialize one key only")
+
+
+def test_sqlite_backend(tmp_path):
+    """State survives across store instances (workers) and expires by TTL"""
+    original = db.DB_PATH
+    db.DB_PATH = tmp_path / "sessions.db"
+    try:
+        first = SessionStore(backend="sqlite")
+        with first.session("user:1") as state:
+            state["current_step"] = "mood"
+        second = SessionStore(backend="sqlite")
+        assert second.peek("user:1") == {"current_step": "mood"}
+        with second.session("user:1") as state:
+            state["current_step"] = "cgm"
+        assert first.peek("user:1") == {"current_step": "cgm"}
+        second.clear("user:1")
+        assert first.peek("user:1") is None
+        stale = SessionStore(ttl_seconds=0, backend="sqlite")
+        with stale.session("user:2") as state:
+            state["x"] = 1
+        time.sleep(0.01)
+        assert stale.peek("user:2") is None
+    finally:
+        db.DB_PATH = original
+    print("✅ SQLite backend shares state between workers")
+
+
+def test_users_sharing_a_session_id_are_isolated():
+    """The same client session id under two users maps to two sessions"""
+    assert session_key(1, "abc") != session_key(2, "abc")
+    assert session_key(1) == "user:1" != session_key(1, "abc")
+    store = SessionStore(backend="memory")
+    with store.session(session_key(1, "abc")) as state:
+        state["user_context"] = {"mood": "happy"}
+    assert store.peek(session_key(2, "abc")) is None
+    with store.session(session_key(2, "abc")) as state:
+        assert state == {}
+        state["user_context"] = {"mood": "sad"}
+    assert store.peek(session_key(1, "abc")) == {"user_context": {"mood": "happy"}}
+    print("✅ Session ids never cross users")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    print("🧪 Testing Session Store")
+    print("=" * 50)
+    test_ttl_expiry()
+    test_lru_eviction()
+    test_per_key_locking()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_sqlite_backend(Path(tmp))
+    test_users_sharing_a_session_id_are_isolated()
+    print("🎉 All session store tests passed!")